@@ -0,0 +1,100 @@
+"""Deliver price alerts from the ``price_alerts`` table to local sinks.
+
+Alerts are always stored in SQLite by ``storage.alerts``; with
+``"alerts": {"jsonl": "data/alerts.jsonl", "webhook": "http://..."}`` in
+config.json each ingest batch also appends them to a JSON Lines file and/or
+POSTs them as a JSON list to a webhook (``benchmarks/webhook_receiver.py``
+is a local stand-in). Delivery is tracked per sink: a failing webhook gets
+the alerts again on the next attempt while the JSON Lines file does not get
+them twice. An alert is marked delivered once every sink accepted it.
+
+Sinks do blocking I/O. The crawl pipeline runs ``deliver_pending_at`` in a
+thread, with its own database connection, so a slow webhook never stalls
+the reactor.
+"""
+import json
+import logging
+import sqlite3
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+from config_utils import load_alert_sinks
+from storage.alerts import count_pending, mark_delivered, mark_sent, pending_alerts
+from storage.database import connect
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = Path(__file__).resolve().parent
+WEBHOOK_TIMEOUT = 5.0
+
+
+class JsonlSink:
+    def __init__(self, path: Path | str) -> None:
+        path = Path(path)
+        self.path = path if path.is_absolute() else PROJECT_DIR / path
+        self.name = f"jsonl:{self.path}"
+
+    def send(self, alerts: Sequence[Mapping[str, object]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as handle:
+            for alert in alerts:
+                handle.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    def __init__(self, url: str, timeout: float = WEBHOOK_TIMEOUT) -> None:
+        self.url = url
+        self.timeout = timeout
+        self.name = f"webhook:{url}"
+
+    def send(self, alerts: Sequence[Mapping[str, object]]) -> None:
+        body = json.dumps(list(alerts), ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(
+            self.url, data=body, method="POST", headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def load_sinks(config: Optional[Dict[str, str]] = None) -> List[object]:
+    config = load_alert_sinks() if config is None else config
+    sinks: List[object] = []
+    if config.get("jsonl"):
+        sinks.append(JsonlSink(config["jsonl"]))
+    if config.get("webhook"):
+        sinks.append(WebhookSink(config["webhook"]))
+    return sinks
+
+
+def deliver_pending(connection: sqlite3.Connection, sinks: Sequence[object], batch_size: int = 500) -> int:
+    """Send each sink the undelivered alerts it has not accepted yet; returns how many became delivered."""
+    if not sinks:
+        return 0
+    for sink in sinks:
+        while True:
+            alerts = pending_alerts(connection, sink.name, limit=batch_size)
+            if not alerts:
+                break
+            try:
+                sink.send(alerts)
+            except Exception as exc:
+                logger.warning("Could not send %d alerts to %s: %s", len(alerts), sink.name, exc)
+                break
+            mark_sent(connection, [alert["id"] for alert in alerts], sink.name, _now())
+    return mark_delivered(connection, [sink.name for sink in sinks], _now())
+
+
+def deliver_pending_at(db_path: Path | str, sinks: Sequence[object], batch_size: int = 500) -> int:
+    """``deliver_pending`` on a connection of its own (safe in a worker thread); returns alerts still pending."""
+    connection = connect(db_path)
+    try:
+        deliver_pending(connection, sinks, batch_size)
+        return count_pending(connection)
+    finally:
+        connection.close()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
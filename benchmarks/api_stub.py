@@ -0,0 +1,118 @@
+"""Local stand-in for the MercadoLibre public API.
+
+Usage::
+
+    python -m benchmarks.api_stub --port 8089 --latency 0.05 --error-rate 0.05
+    MERCADOLIBRE_API_BASE=http://127.0.0.1:8089 streamlit run dashboard/dashboard.py
+
+Serves deterministic fake payloads for the endpoints used in ``services/``,
+with configurable latency and a share of 429/503 answers to exercise retries.
+Responses carry an ``ETag`` and honour ``If-None-Match`` with a 304.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+
+from aiohttp import web
+
+
+def _category_attributes(category_id: str) -> list:
+    return [
+        {"id": f"ATTR_{index}", "name": f"Atributo {index} de {category_id}", "value_type": "string"}
+        for index in range(5)
+    ]
+
+
+def _domain_discovery(query: str, limit: int) -> list:
+    return [
+        {
+            "domain_id": f"MLA-DOMAIN_{index}",
+            "domain_name": f"Dominio {index}",
+            "category_id": f"MLA{1000 + index}",
+            "category_name": f"Categoría {index} para {query}",
+            "attributes": [],
+        }
+        for index in range(limit)
+    ]
+
+
+def _item(item_id: str) -> dict:
+    number = int(hashlib.sha1(item_id.encode("utf-8")).hexdigest()[:8], 16)
+    return {
+        "id": item_id,
+        "category_id": f"{item_id[:3]}{1000 + number % 5}",
+        "sold_quantity": number % 500,
+        "condition": "new" if number % 4 else "used",
+        "shipping": {"free_shipping": bool(number % 2), "logistic_type": "fulfillment"},
+        "attributes": [{"id": "BRAND", "name": "Marca", "value_name": f"Marca {number % 7}"}],
+    }
+
+
+def _items(ids: str) -> list:
+    return [
+        {"code": 200, "body": _item(item_id)} if item_id[:3].isalpha() else {"code": 404, "body": {"id": item_id}}
+        for item_id in ids.split(",")
+        if item_id
+    ]
+
+
+def _json_with_etag(request: web.Request, payload) -> web.Response:
+    body = json.dumps(payload, ensure_ascii=False)
+    etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304, headers={"ETag": etag})
+    return web.Response(text=body, content_type="application/json", headers={"ETag": etag})
+
+
+def build_app(latency: float = 0.0, error_rate: float = 0.0) -> web.Application:
+    app = web.Application()
+    app["stats"] = {"requests": 0, "errors": 0}
+
+    async def category_attributes(request: web.Request) -> web.Response:
+        failure = await _maybe_fail(request)
+        if failure is not None:
+            return failure
+        return _json_with_etag(request, _category_attributes(request.match_info["category_id"]))
+
+    async def domain_discovery(request: web.Request) -> web.Response:
+        failure = await _maybe_fail(request)
+        if failure is not None:
+            return failure
+        limit = int(request.query.get("limit", 5))
+        return _json_with_etag(request, _domain_discovery(request.query.get("q", ""), limit))
+
+    async def items(request: web.Request) -> web.Response:
+        failure = await _maybe_fail(request)
+        if failure is not None:
+            return failure
+        return _json_with_etag(request, _items(request.query.get("ids", "")))
+
+    async def _maybe_fail(request: web.Request):
+        app["stats"]["requests"] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if error_rate and random.random() < error_rate:
+            app["stats"]["errors"] += 1
+            return web.Response(status=random.choice([429, 503]))
+        return None
+
+    app.router.add_get("/categories/{category_id}/attributes", category_attributes)
+    app.router.add_get("/sites/{site}/domain_discovery/search", domain_discovery)
+    app.router.add_get("/items", items)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    web.run_app(build_app(args.latency, args.error_rate), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
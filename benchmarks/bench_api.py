@@ -0,0 +1,64 @@
+"""API client benchmark against the local stub server.
+
+Usage::
+
+    python -m benchmarks.bench_api [--categories 500] [--latency 0.05] [--error-rate 0.02]
+
+Starts ``benchmarks.api_stub`` in-process and times
+``fetch_many_categories_attributes`` for N category ids.
+"""
+import argparse
+import asyncio
+import time
+
+from aiohttp import web
+
+from benchmarks.api_stub import build_app
+from services.category_attributes import fetch_category_attributes_async
+from services.api_client import MercadoLibreClient
+
+
+async def _run(args: argparse.Namespace) -> None:
+    app = build_app(latency=args.latency, error_rate=args.error_rate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    category_ids = [f"MLA{1000 + index}" for index in range(args.categories)]
+
+    try:
+        start = time.perf_counter()
+        async with MercadoLibreClient(
+            base_url=f"http://127.0.0.1:{port}",
+            max_concurrency=args.concurrency,
+            rate_per_sec=args.rate,
+        ) as client:
+            results = await client.map(
+                lambda cid: fetch_category_attributes_async(client, cid),
+                category_ids,
+            )
+        elapsed = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+
+    ok = sum(1 for attributes in results.values() if attributes)
+    print(f"categories:  {len(category_ids)} ({ok} with attributes)")
+    print(f"requests:    {app['stats']['requests']} ({app['stats']['errors']} injected errors)")
+    print(f"elapsed:     {elapsed:.2f} s ({len(category_ids) / elapsed:,.1f} categories/s)")
+    serial = len(category_ids) * (args.latency + 0.25)
+    print(f"serial est.: {serial:.1f} s (one call at a time + 0.25 s sleep)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=100.0)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
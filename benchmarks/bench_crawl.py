@@ -0,0 +1,169 @@
+"""Deterministic crawl benchmark served from a recorded response archive.
+
+Usage::
+
+    # record live listing pages for the queries in config.json
+    python -m benchmarks.bench_crawl record --archive data/listings.zip
+
+    # or build an archive from the saved HTML fixtures (no network needed)
+    python -m benchmarks.bench_crawl fixtures --archive data/listings.zip --queries 20 --pages 10
+
+    # replay it with fake latency and report throughput
+    python -m benchmarks.bench_crawl run --archive data/listings.zip --latency 0.2 -s CONCURRENT_REQUESTS=64
+
+``run`` crawls into a throwaway SQLite database and reports pages/s, items/s
+and p50/p99 parse time per listing page.
+"""
+import argparse
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+
+from config_utils import SearchQuery, load_search_queries
+from extraction.replay import ResponseArchive, replay_settings
+from extraction.spiders.mercadolivre import (
+    MercadoLivreSpider,
+    listing_page_url,
+    query_download_slots,
+)
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+ITEM_ID_BYTES_RE = re.compile(rb"MLA-(\d+)")
+
+
+class TimedSpider(MercadoLivreSpider):
+    """Records the wall time spent parsing each listing page."""
+
+    name = "mercadolivre_bench"
+    parse_times: list[float] = []
+
+    def parse(self, response):
+        start = time.perf_counter()
+        results = list(super().parse(response))
+        TimedSpider.parse_times.append(time.perf_counter() - start)
+        yield from results
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _parse_overrides(pairs: list[str]) -> dict:
+    overrides = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        overrides[key] = value
+    return overrides
+
+
+def build_fixture_archive(archive_path: Path, queries: int, pages: int) -> None:
+    bodies = [path.read_bytes() for path in sorted(FIXTURES_DIR.glob("listing_*.html"))]
+    archive = ResponseArchive(archive_path, mode="w")
+    try:
+        for query_index in range(queries):
+            query = f"bench-query-{query_index}"
+            for page in range(1, pages + 1):
+                url = listing_page_url(query, page)
+                # Shift item ids so every page holds distinct listings.
+                shift = (query_index * pages + page) * 10_000_000_000
+                body = ITEM_ID_BYTES_RE.sub(
+                    lambda match: b"MLA-%d" % (int(match.group(1)) + shift),
+                    bodies[(query_index + page) % len(bodies)],
+                )
+                archive.add(url, 200, {"Content-Type": "text/html; charset=utf-8"}, body, search_query=query)
+    finally:
+        archive.close()
+    print(f"Wrote {queries * pages} pages to {archive_path}")
+
+
+def record(archive_path: Path, overrides: dict) -> None:
+    queries = load_search_queries()
+    process = CrawlerProcess(settings={
+        **get_project_settings(),
+        "DOWNLOAD_SLOTS": query_download_slots(queries),
+        "RECORD_ARCHIVE": str(archive_path),
+        **overrides,
+    })
+    process.crawl(MercadoLivreSpider, queries=queries)
+    process.start()
+
+
+def run(archive_path: Path, latency: float, jitter: float, pagination: str, overrides: dict) -> None:
+    archive = ResponseArchive(archive_path)
+    try:
+        max_pages: dict[str, int] = {}
+        for entry in archive.entries():
+            query = entry.get("search_query")
+            if query:
+                max_pages[query] = max_pages.get(query, 0) + 1
+    finally:
+        archive.close()
+    queries = [SearchQuery(query, pages) for query, pages in max_pages.items()]
+    if not queries:
+        raise SystemExit(f"No recorded listing pages in {archive_path}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        process = CrawlerProcess(settings={
+            **get_project_settings(),
+            **replay_settings(archive_path, latency=latency, jitter=jitter),
+            "DOWNLOAD_SLOTS": query_download_slots(queries),
+            "SQLITE_DB_PATH": str(Path(tmp_dir) / "bench.db"),
+            "LOG_LEVEL": "WARNING",
+            **overrides,
+        })
+        crawler = process.create_crawler(TimedSpider)
+        process.crawl(crawler, queries=queries, pagination=pagination, stop_early=False)
+        process.start()
+
+    stats = crawler.stats.get_stats()
+    elapsed = (stats["finish_time"] - stats["start_time"]).total_seconds()
+    pages = stats.get("response_received_count", 0)
+    items = stats.get("item_scraped_count", 0)
+    parse_times = TimedSpider.parse_times
+    print(f"queries:     {len(queries)}")
+    print(f"pages:       {pages} ({pages / elapsed:,.1f} pages/s)")
+    print(f"items:       {items} ({items / elapsed:,.1f} items/s)")
+    print(f"elapsed:     {elapsed:.2f} s")
+    print(f"parse p50:   {_percentile(parse_times, 0.50) * 1000:.2f} ms")
+    print(f"parse p99:   {_percentile(parse_times, 0.99) * 1000:.2f} ms")
+    missing = stats.get("replay/missing", 0)
+    if missing:
+        print(f"missing:     {missing} requests were not in the archive")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="crawl the live site and archive listing pages")
+    fixtures_parser = subparsers.add_parser("fixtures", help="build an archive from benchmarks/fixtures")
+    run_parser = subparsers.add_parser("run", help="replay an archive and report throughput")
+    for sub in (record_parser, fixtures_parser, run_parser):
+        sub.add_argument("--archive", type=Path, default=Path("data/listings.zip"))
+    for sub in (record_parser, run_parser):
+        sub.add_argument("-s", dest="settings", action="append", default=[], help="Scrapy setting NAME=VALUE")
+    fixtures_parser.add_argument("--queries", type=int, default=20)
+    fixtures_parser.add_argument("--pages", type=int, default=10)
+    run_parser.add_argument("--latency", type=float, default=0.2, help="fake response latency in seconds")
+    run_parser.add_argument("--jitter", type=float, default=0.05)
+    run_parser.add_argument("--pagination", choices=["follow", "offset"], default="offset")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.archive, _parse_overrides(args.settings))
+    elif args.command == "fixtures":
+        build_fixture_archive(args.archive, args.queries, args.pages)
+    else:
+        run(args.archive, args.latency, args.jitter, args.pagination, _parse_overrides(args.settings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Item representation benchmark: dict with a string price vs ``ListingItem``.
+
+Usage::
+
+    python -m benchmarks.bench_items [--items 100000] [--repeat 5]
+
+Builds ``--items`` listings both ways from the same field strings: the
+previous per-card dict with a ``"1234,56"`` price, and the slotted
+``ListingItem`` with integer cents. For each it reports the memory held per
+item (tracemalloc, the shared strings excluded), the time to create the
+items and tag them with their query as the spider does, to export them with
+Scrapy's JSON Lines exporter, and to normalize them into the rows the SQLite
+pipeline writes (best of ``--repeat`` runs, alternating the two), and checks
+both give the same rows.
+"""
+import argparse
+import gc
+import io
+import random
+import time
+import tracemalloc
+
+from scrapy.exporters import JsonLinesItemExporter
+
+from extraction.items import ListingItem, register_adapters
+from transforms.data_transformation import normalize_record
+
+SEARCH_QUERY = "jarra-de-vidrio"
+SITE = "MLA"
+SOURCE = "https://listado.mercadolibre.com.ar/jarra-de-vidrio"
+SCRAPED_AT = "2025-01-01T00:00:00+00:00"
+
+
+def card_fields(count: int, seed: int = 7) -> list[tuple]:
+    """What the parser reads from each card: strings, plus the price parts."""
+    rng = random.Random(seed)
+    fields = []
+    for index in range(count):
+        ml_item_id = f"MLA{1_000_000_000 + index}"
+        fields.append((
+            ml_item_id,
+            f"Jarra de vidrio modelo {rng.randrange(20_000)}",
+            f"Vendedor {rng.randrange(2_000)}",
+            rng.randrange(1, 2_000_000),
+            rng.randrange(100),
+            f"https://articulo.mercadolibre.com.ar/{ml_item_id}",
+            rng.random() < 0.1,
+        ))
+    return fields
+
+
+def build_dicts(fields: list[tuple]) -> list[dict]:
+    items = []
+    for ml_item_id, name, seller, fraction, cents, permalink, is_ad in fields:
+        item = {
+            "ml_item_id": ml_item_id,
+            "name": name,
+            "seller": seller,
+            "price": f"{fraction},{cents:02d}",
+            "permalink": permalink,
+            "is_ad": is_ad,
+        }
+        item["_search_query"] = SEARCH_QUERY
+        item["_site"] = SITE
+        item["_source"] = SOURCE
+        items.append(item)
+    return items
+
+
+def build_listing_items(fields: list[tuple]) -> list[ListingItem]:
+    items = []
+    for ml_item_id, name, seller, fraction, cents, permalink, is_ad in fields:
+        item = ListingItem(ml_item_id, name, seller, fraction * 100 + cents, permalink, is_ad)
+        item._search_query = SEARCH_QUERY
+        item._site = SITE
+        item._source = SOURCE
+        items.append(item)
+    return items
+
+
+def export(items: list) -> int:
+    buffer = io.BytesIO()
+    exporter = JsonLinesItemExporter(buffer)
+    exporter.start_exporting()
+    for item in items:
+        exporter.export_item(item)
+    exporter.finish_exporting()
+    return buffer.tell()
+
+
+def normalize(items: list) -> list[dict]:
+    if items and isinstance(items[0], ListingItem):
+        return [item.to_record(SCRAPED_AT, SEARCH_QUERY) for item in items]
+    return [normalize_record(item, SCRAPED_AT, SEARCH_QUERY) for item in items]
+
+
+def _held_bytes(build, fields: list[tuple]) -> tuple[list, int]:
+    gc.collect()
+    tracemalloc.start()
+    items = build(fields)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return items, held
+
+
+def _best(func, items, repeat: int) -> tuple[object, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func(items)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    # As the spider does before the feed exporters see any item.
+    register_adapters()
+
+    fields = card_fields(args.items)
+    builders = {"dict": build_dicts, "ListingItem": build_listing_items}
+    held = {}
+    items = {}
+    for label, build in builders.items():
+        items[label], held[label] = _held_bytes(build, fields)
+
+    timings = {label: {"build": [], "export": [], "normalize": []} for label in builders}
+    rows = {}
+    for _ in range(args.repeat):
+        for label, build in builders.items():
+            _, seconds = _best(build, fields, 1)
+            timings[label]["build"].append(seconds)
+            size, seconds = _best(export, items[label], 1)
+            timings[label]["export"].append(seconds)
+            rows[label], seconds = _best(normalize, items[label], 1)
+            timings[label]["normalize"].append(seconds)
+
+    for label in builders:
+        best = {stage: min(values) * 1000 for stage, values in timings[label].items()}
+        print(
+            f"{label:<12} {held[label] / args.items:>6.0f} B/item  build={best['build']:>6.0f} ms  "
+            f"export={best['export']:>6.0f} ms  normalize={best['normalize']:>6.0f} ms"
+        )
+
+    status = "ok" if rows["dict"] == rows["ListingItem"] else "MISMATCH"
+    print(f"rows: [{status}]")
+
+
+if __name__ == "__main__":
+    main()
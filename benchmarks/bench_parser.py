@@ -0,0 +1,133 @@
+"""Listing parser benchmark on the saved HTML fixtures.
+
+Usage::
+
+    python -m benchmarks.bench_parser [--repeat 200]
+
+Reports items/s for the precompiled ``extraction.parsers`` layer and for the
+previous per-card parsel CSS approach, and checks both extract the same items.
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+from parsel import Selector
+
+from extraction.parsers import detect_layout, parse_listing
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+BASE_URL = "https://listado.mercadolibre.com.ar/jarra-de-vidrio"
+
+
+def _urljoin(link: str) -> str:
+    return link if link.startswith("http") else BASE_URL + link
+
+
+def parsel_baseline(selector: Selector) -> list[dict]:
+    """The selector chain ``MercadoLivreSpider.parse`` used before the parser layer.
+
+    Plus the poly "Promocionado" badge, which the parser now reads as an ad
+    marker, so the parity check covers every other field unchanged.
+    """
+    products = selector.css("li.ui-search-layout__item")
+    if not products:
+        products = selector.css("div.ui-search-result__wrapper, [data-testid='item']")
+
+    items = []
+    for product in products:
+        link = product.css(
+            "a.ui-search-item__group__element::attr(href), "
+            "a.ui-search-link::attr(href), "
+            "a.poly-component__link::attr(href), "
+            "a::attr(href)"
+        ).get()
+        ml_item_id = None
+        if link:
+            match = re.search(r"/MLA-?(\d+)", link)
+            if match:
+                ml_item_id = f"MLA{match.group(1)}"
+        name = product.css(
+            "h2.ui-search-item__title::text, "
+            "h2.ui-search-item__title span::text, "
+            "a.poly-component__title::text, "
+            "[data-testid='item-title']::text"
+        ).get()
+        seller_texts = product.css(
+            "[data-testid='seller-info'] ::text, "
+            "span.poly-component__seller::text, "
+            "span.ui-search-official-store-label__text::text"
+        ).getall()
+        seller = "".join(seller_texts).strip() if seller_texts else None
+        if seller and seller.lower().startswith("por "):
+            seller = seller[4:].strip()
+        fraction = product.css("span.andes-money-amount__fraction::text").get()
+        cents = product.css("span.andes-money-amount__cents::text").get()
+        price_value = None
+        if fraction:
+            cents_value = cents.strip() if cents else "00"
+            price_value = f"{fraction.replace('.', '')},{cents_value.zfill(2)}"
+        ad_markers = product.css(
+            "[data-testid*='advertising'], "
+            "[data-testid*='sponsored'], "
+            "[data-testid='listing-type-highlight']::text, "
+            "[data-testid='listing-highlight-label']::text, "
+            ".ui-search-item__ad-badge::text, "
+            "span.poly-component__ads-promotions::text"
+        ).getall()
+        items.append({
+            "ml_item_id": ml_item_id,
+            "name": name.strip() if name else None,
+            "seller": seller or None,
+            "price": price_value,
+            "permalink": _urljoin(link) if link else None,
+            "is_ad": any(marker.strip() for marker in ad_markers),
+        })
+    return items
+
+
+def _legacy_form(item) -> dict:
+    """A ``ListingItem`` in the dict/string-price shape the baseline produces."""
+    cents = item.price_cents
+    return {
+        "ml_item_id": item.ml_item_id,
+        "name": item.name,
+        "seller": item.seller,
+        "price": None if cents is None else f"{cents // 100},{cents % 100:02d}",
+        "permalink": item.permalink,
+        "is_ad": item.is_ad,
+    }
+
+
+def _items_per_second(func, repeat: int) -> tuple[float, int]:
+    count = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        count += len(func())
+    elapsed = time.perf_counter() - start
+    return count / elapsed, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for fixture in sorted(FIXTURES_DIR.glob("listing_*.html")):
+        selector = Selector(text=fixture.read_text(encoding="utf-8"))
+        root = selector.root
+        layout, items = parse_listing(root, _urljoin)
+        baseline = parsel_baseline(selector)
+        status = "ok" if [_legacy_form(item) for item in items] == baseline else "MISMATCH"
+
+        fast, _ = _items_per_second(lambda: parse_listing(root, _urljoin)[1], args.repeat)
+        slow, _ = _items_per_second(lambda: parsel_baseline(selector), args.repeat)
+        print(
+            f"{fixture.name:<22} layout={detect_layout(root):<6} items={len(items):<3} "
+            f"compiled={fast:>9,.0f} items/s  parsel={slow:>9,.0f} items/s  "
+            f"speedup={fast / slow:4.1f}x  [{status}]"
+        )
+
+
+if __name__ == "__main__":
+    main()
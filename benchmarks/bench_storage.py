@@ -0,0 +1,123 @@
+"""History load benchmark: JSON feed vs the partitioned Parquet store.
+
+Usage::
+
+    python -m benchmarks.bench_storage [--rows 1000000] [--days 365] [--queries 5]
+
+Writes the same synthetic year of normalized listings as one JSON array and
+as ``storage.parquet_store`` partitions under a temporary directory, then
+loads each in a fresh process and reports time, peak RSS and frame size. The Parquet
+store is also read with a one-query/one-month filter to show pruning.
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+
+def synthetic_records(rows: int, days: int, queries: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    query_names = [f"busqueda-{index}" for index in range(queries)]
+    sellers = [f"Vendedor {index}" for index in range(200)]
+    records = []
+    for index in range(rows):
+        day = start + timedelta(days=index % days)
+        query = query_names[index % queries]
+        records.append({
+            "ml_item_id": f"MLA{100000000 + index % (rows // 4 or 1)}",
+            "name": f"Producto {index % 5000} de {query}",
+            "seller": rng.choice(sellers),
+            "price": round(rng.lognormvariate(9, 0.6), 2),
+            "permalink": f"https://articulo.mercadolibre.com.ar/MLA-{100000000 + index}",
+            "is_ad": rng.random() < 0.1,
+            "_source": f"https://listado.mercadolibre.com.ar/{query}",
+            "_search_query": query,
+            "_scraped_at": f"{day.isoformat()}T12:00:00+00:00",
+        })
+    return records
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _load(kind: str, path: str, result: "multiprocessing.Queue") -> None:
+    import pandas as pd
+
+    from storage.parquet_store import read_history
+
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    if kind == "json":
+        frame = pd.read_json(path)
+    elif kind == "parquet":
+        frame = read_history(path)
+    else:
+        frame = read_history(path, search_queries=["busqueda-0"], since="2024-03-01", until="2024-03-31")
+    elapsed = time.perf_counter() - start
+    memory = frame.memory_usage(deep=True).sum() / 2**20
+    result.put((len(frame), elapsed, baseline, _peak_rss_mb(), memory))
+
+
+def _prepare(json_path: str, parquet_root: str, rows: int, days: int, queries: int) -> None:
+    from storage.parquet_store import write_run
+
+    records = synthetic_records(rows, days, queries)
+    Path(json_path).write_text(json.dumps(records), encoding="utf-8")
+    write_run(records, parquet_root)
+
+
+def _in_child(target, *args) -> None:
+    # Linux keeps ru_maxrss across fork/exec, so keep the parent process small
+    # and do every step in a fresh spawned child.
+    process = multiprocessing.get_context("spawn").Process(target=target, args=args)
+    process.start()
+    process.join()
+
+
+def _measure(kind: str, path: Path) -> tuple:
+    context = multiprocessing.get_context("spawn")
+    result = context.Queue()
+    process = context.Process(target=_load, args=(kind, str(path), result))
+    process.start()
+    measurement = result.get()
+    process.join()
+    return measurement
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--queries", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = Path(tmp) / "history.json"
+        parquet_root = Path(tmp) / "parquet"
+        _in_child(_prepare, str(json_path), str(parquet_root), args.rows, args.days, args.queries)
+
+        parquet_bytes = sum(path.stat().st_size for path in parquet_root.rglob("*.parquet"))
+        print(f"rows:    {args.rows:,} over {args.days} days, {args.queries} queries")
+        print(f"on disk: json {json_path.stat().st_size / 2**20:,.1f} MiB  parquet {parquet_bytes / 2**20:,.1f} MiB")
+        for label, kind, path in (
+            ("json", "json", json_path),
+            ("parquet", "parquet", parquet_root),
+            ("parquet 1 query/1 month", "filtered", parquet_root),
+        ):
+            rows, elapsed, baseline, peak, frame_mb = _measure(kind, path)
+            print(
+                f"{label:<24} rows={rows:>10,}  load={elapsed:6.2f} s  "
+                f"peak rss {peak:8,.1f} MiB (after imports {baseline:,.1f})  frame {frame_mb:8,.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Transform benchmark: step-by-step pandas chain vs ``transform_frame``.
+
+Usage::
+
+    python -m benchmarks.bench_transform [--rows 5000000] [--chunk-size 250000]
+
+Builds a synthetic raw feed (string prices such as ``"1.234,56"``, mixed
+``is_ad`` values, some missing fields) and normalizes it with the previous
+step-by-step pandas chain and with the single-pass engine, each in a fresh
+process. Reports rows/s and peak RSS above the input frame (the engine drops
+each chunk after it is produced, as ``transform_data`` does once the chunk is
+stored), checks both produce the same prices and ad flags on a sample, and
+checks ``parse_prices`` and ``transform_frame`` agree with the per-item
+``parse_price`` and ``normalize_record`` on edge cases.
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+
+SEARCH_QUERY = "jarra-de-vidrio"
+SCRAPED_AT = "2025-01-01T00:00:00+00:00"
+
+
+def synthetic_feed(rows: int, seed: int = 11) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # Small pools of distinct values, like a real feed with repeated sellers.
+    fractions = rng.integers(1, 2_000_000, 50_000)
+    cents = rng.integers(0, 100, 50_000)
+    prices = np.array([f"{value:,}".replace(",", ".") + f",{cent:02d}" for value, cent in zip(fractions, cents)], dtype=object)
+    prices[:500] = None
+    names = np.array([f"Jarra de vidrio modelo {index}" for index in range(20_000)], dtype=object)
+    sellers = np.array([f"Vendedor {index}" for index in range(2_000)] + [None], dtype=object)
+    ad_values = np.array([True, False, False, False, None, "true", "False"], dtype=object)
+
+    ids = np.char.add("MLA", np.arange(100_000_000, 100_000_000 + rows).astype(str)).astype(object)
+    return pd.DataFrame({
+        "ml_item_id": ids,
+        "name": names[rng.integers(0, len(names), rows)],
+        "seller": sellers[rng.integers(0, len(sellers), rows)],
+        "price": prices[rng.integers(0, len(prices), rows)],
+        "permalink": "https://articulo.mercadolibre.com.ar/" + pd.Series(ids),
+        "is_ad": ad_values[rng.integers(0, len(ad_values), rows)],
+    })
+
+
+def legacy_chain(df: pd.DataFrame) -> pd.DataFrame:
+    """The step-by-step chain ``transform_data`` ran before ``transform_frame``."""
+    from sites import DEFAULT_SITE, get_site
+    from transforms.data_transformation import TRUTHY_VALUES
+
+    for name, default in (("_search_query", SEARCH_QUERY), ("_site", DEFAULT_SITE)):
+        df[name] = df[name].fillna(default) if name in df.columns else default
+    base_urls = df["_site"].map(lambda site: get_site(site).listing_base_url)
+    default_source = base_urls + "/" + df["_search_query"]
+    df["_source"] = df["_source"].fillna(default_source) if "_source" in df.columns else default_source
+    df["_scraped_at"] = SCRAPED_AT
+    df["scrap_date"] = SCRAPED_AT
+    df["price"] = df["price"].fillna("0")
+    df["is_ad"] = df["is_ad"].fillna(0).astype(str).str.lower().isin(TRUTHY_VALUES).astype(int)
+    df["price"] = df["price"].astype(str).str.replace(".", "", regex=False)
+    df["price"] = pd.to_numeric(df["price"].str.replace(",", ".", regex=False), errors="coerce")
+    return df
+
+
+def engine(df: pd.DataFrame, chunk_size: int) -> pd.DataFrame:
+    from transforms.data_transformation import iter_chunks, transform_frame
+
+    chunks = [transform_frame(chunk, SEARCH_QUERY, SCRAPED_AT) for chunk in iter_chunks(df, chunk_size)]
+    return pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+
+
+def engine_rows(df: pd.DataFrame, chunk_size: int) -> int:
+    """What ``transform_data`` does: each chunk is normalized, stored and dropped."""
+    from transforms.data_transformation import iter_chunks, transform_frame
+
+    return sum(len(transform_frame(chunk, SEARCH_QUERY, SCRAPED_AT)) for chunk in iter_chunks(df, chunk_size))
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run(kind: str, rows: int, chunk_size: int, result: "multiprocessing.Queue") -> None:
+    df = synthetic_feed(rows)
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    rows = len(legacy_chain(df)) if kind == "legacy" else engine_rows(df, chunk_size)
+    elapsed = time.perf_counter() - start
+    result.put((rows, elapsed, _peak_rss_mb() - baseline))
+
+
+def _measure(kind: str, rows: int, chunk_size: int) -> tuple:
+    context = multiprocessing.get_context("spawn")
+    result = context.Queue()
+    process = context.Process(target=_run, args=(kind, rows, chunk_size, result))
+    process.start()
+    measurement = result.get()
+    process.join()
+    return measurement
+
+
+def _check(sample_rows: int = 20_000) -> str:
+    df = synthetic_feed(sample_rows)
+    old = legacy_chain(df.copy())
+    new = engine(df.copy(), chunk_size=7_000)
+    same_price = np.allclose(old["price"].to_numpy(), new["price"].to_numpy(), equal_nan=True)
+    same_ads = (old["is_ad"].astype(bool).to_numpy() == new["is_ad"].to_numpy()).all()
+    return "ok" if same_price and same_ads else "MISMATCH"
+
+
+# Accepted and rejected price spellings, parsed both ways by _price_parity.
+PRICE_CASES = (
+    "1.234,56", "1234", "12,", "-3,5", " 12 ", "12\n", "1.234.567,8", "0,05",
+    "1e5", "inf", "nan", "+5", ",5", "", "abc", "1_000", "12,5,6", "\u0661\u0662", "\u00a012",
+    None, True, 7, 7.5,
+)
+
+
+def _price_parity() -> str:
+    from transforms.data_transformation import parse_price, parse_prices
+
+    def scalar(value):
+        price = 0.0 if value is None else parse_price(value)
+        return np.nan if price is None else price
+
+    strings = [case for case in PRICE_CASES if case is None or isinstance(case, str)]
+    for cases in (strings, list(PRICE_CASES)):
+        # Text-only columns take the Arrow path, mixed ones the per-value one.
+        expected = np.array([scalar(case) for case in cases], dtype="float64")
+        actual = parse_prices(pd.Series(cases, dtype=object)).to_numpy(dtype="float64")
+        if not np.array_equal(expected, actual, equal_nan=True):
+            return "MISMATCH"
+    return "ok"
+
+
+# Rows whose query/site/source need filling or normalizing, for _record_parity.
+RECORD_CASES = (
+    {"ml_item_id": "MLA1", "price": "1.234,5", "is_ad": "true", "_search_query": "", "_site": "mlb", "_source": ""},
+    {"ml_item_id": "MLA2", "price": None, "is_ad": None, "_search_query": None, "_site": "XX", "_source": None},
+    {"ml_item_id": "MLA3", "price": "7", "is_ad": 1, "_search_query": "q", "_site": " mlm ", "_source": "s"},
+)
+
+
+def _record_parity() -> str:
+    """Whether ``transform_frame`` writes the rows ``normalize_record`` builds for the same items."""
+    from transforms.data_transformation import frame_records, normalize_record, transform_frame
+
+    expected = [normalize_record(case, SCRAPED_AT, SEARCH_QUERY) for case in RECORD_CASES]
+    actual = frame_records(transform_frame(pd.DataFrame(list(RECORD_CASES)), SEARCH_QUERY, SCRAPED_AT))
+    for row in actual:
+        row["is_ad"] = int(row["is_ad"])
+    return "ok" if expected == actual else "MISMATCH"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--chunk-size", type=int, default=250_000)
+    args = parser.parse_args()
+
+    print(
+        f"rows: {args.rows:,}  chunk size: {args.chunk_size:,}  "
+        f"sample check: {_check()}  price parity: {_price_parity()}  record parity: {_record_parity()}"
+    )
+    results = {}
+    for kind in ("legacy", "engine"):
+        rows, elapsed, peak = _measure(kind, args.rows, args.chunk_size)
+        results[kind] = elapsed
+        print(f"{kind:<7} {elapsed:6.2f} s  {rows / elapsed:>12,.0f} rows/s  peak rss +{peak:8,.1f} MiB")
+    print(f"speedup: {results['legacy'] / results['engine']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Local stand-in for an alert webhook.
+
+Usage::
+
+    python -m benchmarks.webhook_receiver --port 8090
+    # config.json: "alerts": {"webhook": "http://127.0.0.1:8090/alerts"}
+
+Accepts the JSON lists POSTed by ``alert_sinks.WebhookSink``, prints one
+line per alert and, with ``--output``, appends them to a JSON Lines file.
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+
+def build_handler(output: Optional[Path] = None):
+    class AlertHandler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                alerts = json.loads(self.rfile.read(length) or b"[]")
+            except json.JSONDecodeError:
+                self.send_response(400)
+                self.end_headers()
+                return
+            for alert in alerts:
+                print(
+                    f"{alert.get('kind'):<13} {alert.get('ml_item_id')}  "
+                    f"{alert.get('price'):>12,.2f} (base {alert.get('baseline'):,.2f})  {alert.get('name') or ''}"
+                )
+            if output is not None:
+                with output.open("a", encoding="utf-8") as handle:
+                    for alert in alerts:
+                        handle.write(json.dumps(alert, ensure_ascii=False) + "\n")
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return AlertHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--output", type=Path, help="append received alerts to this JSON Lines file")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), build_handler(args.output))
+    print(f"Escuchando alertas en http://{args.host}:{args.port}/alerts")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
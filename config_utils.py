@@ -1,11 +1,30 @@
 import json
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
+
+from sites import DEFAULT_SITE, normalize_site
 
 DEFAULT_SEARCH_QUERY = "tu-busqueda"
 DEFAULT_MAX_PAGES = 5
 MIN_MAX_PAGES = 1
 MAX_MAX_PAGES = 20
+DEFAULT_QUERY_CONCURRENCY = 2
+MIN_QUERY_CONCURRENCY = 1
+MAX_QUERY_CONCURRENCY = 8
+DEFAULT_INTERVAL_MINUTES = 60
+MIN_INTERVAL_MINUTES = 5
+PAGINATION_FOLLOW = "follow"
+PAGINATION_OFFSET = "offset"
+PAGINATION_MODES = (PAGINATION_FOLLOW, PAGINATION_OFFSET)
+DEFAULT_PAGINATION_MODE = PAGINATION_FOLLOW
+OUTPUT_SQLITE = "sqlite"
+OUTPUT_JSON = "json"
+OUTPUT_JSONL = "jsonl"
+OUTPUT_MODES = (OUTPUT_SQLITE, OUTPUT_JSON, OUTPUT_JSONL)
+FEED_COMPRESSION_ZSTD = "zstd"
+FEED_COMPRESSIONS = (FEED_COMPRESSION_ZSTD,)
+DEFAULT_OUTPUT_MODE = OUTPUT_SQLITE
 
 CONFIG_PATH = Path(__file__).resolve().parent / "config.json"
 
@@ -29,6 +48,15 @@ def _write_config_data(data: Dict[str, object]) -> None:
     )
 
 
+@dataclass(frozen=True)
+class SearchQuery:
+    query: str
+    max_pages: int = DEFAULT_MAX_PAGES
+    concurrency: int = DEFAULT_QUERY_CONCURRENCY
+    interval_minutes: int = DEFAULT_INTERVAL_MINUTES
+    site: str = DEFAULT_SITE
+
+
 def format_search_query(raw_query: str) -> str:
     sanitized = raw_query.strip()
     sanitized = sanitized.replace(' ', '-')
@@ -43,6 +71,77 @@ def _normalize_max_pages(value: object) -> int:
     return max(MIN_MAX_PAGES, min(MAX_MAX_PAGES, numeric))
 
 
+def _normalize_concurrency(value: object) -> int:
+    try:
+        numeric = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_QUERY_CONCURRENCY
+    return max(MIN_QUERY_CONCURRENCY, min(MAX_QUERY_CONCURRENCY, numeric))
+
+
+def _normalize_interval(value: object) -> int:
+    try:
+        numeric = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_INTERVAL_MINUTES
+    return max(MIN_INTERVAL_MINUTES, numeric)
+
+
+def _parse_search_query(
+    entry: object,
+    default_max_pages: object,
+    default_interval: object = DEFAULT_INTERVAL_MINUTES,
+    default_site: object = DEFAULT_SITE,
+) -> SearchQuery | None:
+    if isinstance(entry, str):
+        entry = {"query": entry}
+    if not isinstance(entry, dict):
+        return None
+    query = entry.get("query")
+    if not isinstance(query, str) or not query.strip():
+        return None
+    return SearchQuery(
+        query=format_search_query(query),
+        max_pages=_normalize_max_pages(entry.get("max_pages", default_max_pages)),
+        concurrency=_normalize_concurrency(entry.get("concurrency", DEFAULT_QUERY_CONCURRENCY)),
+        interval_minutes=_normalize_interval(entry.get("interval_minutes", default_interval)),
+        site=normalize_site(entry.get("site", default_site)),
+    )
+
+
+def load_search_queries() -> List[SearchQuery]:
+    """Return every tracked query: the primary ``query`` plus the ``queries`` list."""
+    data = _load_config_data()
+    default_max_pages = data.get("max_pages", DEFAULT_MAX_PAGES)
+    default_interval = data.get("interval_minutes", DEFAULT_INTERVAL_MINUTES)
+    default_site = data.get("site", DEFAULT_SITE)
+
+    entries: List[object] = []
+    if isinstance(data.get("query"), str) and data["query"].strip():
+        entries.append({"query": data["query"], "max_pages": default_max_pages})
+    extra = data.get("queries", [])
+    if isinstance(extra, list):
+        entries.extend(extra)
+
+    queries: List[SearchQuery] = []
+    seen = set()
+    for entry in entries:
+        parsed = _parse_search_query(entry, default_max_pages, default_interval, default_site)
+        if parsed is None or (parsed.site, parsed.query) in seen:
+            continue
+        seen.add((parsed.site, parsed.query))
+        queries.append(parsed)
+
+    return queries or [
+        SearchQuery(
+            DEFAULT_SEARCH_QUERY,
+            _normalize_max_pages(default_max_pages),
+            interval_minutes=_normalize_interval(default_interval),
+            site=normalize_site(default_site),
+        )
+    ]
+
+
 def load_search_query() -> str:
     data = _load_config_data()
     query = data.get("query", DEFAULT_SEARCH_QUERY)
@@ -57,6 +156,58 @@ def load_max_pages() -> int:
     return _normalize_max_pages(value)
 
 
+def load_pagination_mode() -> str:
+    data = _load_config_data()
+    mode = data.get("pagination", DEFAULT_PAGINATION_MODE)
+    if isinstance(mode, str) and mode.strip().lower() in PAGINATION_MODES:
+        return mode.strip().lower()
+    return DEFAULT_PAGINATION_MODE
+
+
+def load_output_mode() -> str:
+    data = _load_config_data()
+    mode = data.get("output", DEFAULT_OUTPUT_MODE)
+    if isinstance(mode, str) and mode.strip().lower() in OUTPUT_MODES:
+        return mode.strip().lower()
+    return DEFAULT_OUTPUT_MODE
+
+
+def load_feed_compression() -> str | None:
+    data = _load_config_data()
+    compression = data.get("feed_compression")
+    if isinstance(compression, str) and compression.strip().lower() in FEED_COMPRESSIONS:
+        return compression.strip().lower()
+    return None
+
+
+def load_stop_early() -> bool:
+    data = _load_config_data()
+    return bool(data.get("stop_early", False))
+
+
+def load_parquet_export() -> bool:
+    data = _load_config_data()
+    return bool(data.get("parquet", False))
+
+
+def load_enrich() -> bool:
+    data = _load_config_data()
+    return bool(data.get("enrich", False))
+
+
+def load_alert_sinks() -> Dict[str, str]:
+    """Alert destinations from ``"alerts": {"jsonl": <path>, "webhook": <url>}``."""
+    data = _load_config_data()
+    sinks = data.get("alerts")
+    if not isinstance(sinks, dict):
+        return {}
+    return {
+        name: value.strip()
+        for name, value in sinks.items()
+        if name in ("jsonl", "webhook") and isinstance(value, str) and value.strip()
+    }
+
+
 def save_search_query(raw_query: str) -> str:
     query = format_search_query(raw_query)
     data = _load_config_data()
@@ -69,5 +220,8 @@ def save_search_query(raw_query: str) -> str:
 def save_search_preferences(raw_query: str, max_pages: object) -> Tuple[str, int]:
     query = format_search_query(raw_query)
     pages = _normalize_max_pages(max_pages)
-    _write_config_data({"query": query, "max_pages": pages})
+    data = _load_config_data()
+    data["query"] = query
+    data["max_pages"] = pages
+    _write_config_data(data)
     return query, pages
\ No newline at end of file
@@ -1,6 +1,11 @@
+import argparse
 import datetime
 from pathlib import Path
 
+import scheduler
+
+from config_utils import OUTPUT_JSON, OUTPUT_JSONL, load_feed_compression, load_output_mode
+from extraction.feeds import feed_path
 from extraction.spiders.mercadolivre import MercadoLivreSpider
 from transforms.data_transformation import transform_data
 
@@ -8,18 +13,44 @@ BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
 
 
-def main():
-    # Check if data.json exists
-    data_path = DATA_DIR / "data.json"
+def crawl_once():
+    output = load_output_mode()
+    if output not in (OUTPUT_JSON, OUTPUT_JSONL):
+        # Items are normalized and written to SQLite by the item pipeline.
+        MercadoLivreSpider.run_spider(output=output)
+        return
+
+    # Check if the previous feed exists
+    data_path = feed_path(DATA_DIR, output, load_feed_compression())
 
     if data_path.exists():
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        new_name = DATA_DIR / f"data_{timestamp}.json"
+        stem, _, suffix = data_path.name.partition(".")
+        new_name = DATA_DIR / f"{stem}_{timestamp}.{suffix}"
         data_path.rename(new_name)
-        print(f"Renamed existing data.json to data_{timestamp}.json")
+        print(f"Renamed existing {data_path.name} to {new_name.name}")
     
-    MercadoLivreSpider.run_spider()
-    transform_data(DATA_DIR / "data.json")
+    MercadoLivreSpider.run_spider(output=output)
+    transform_data(data_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rastrea las búsquedas de config.json")
+    parser.add_argument(
+        "--schedule",
+        action="store_true",
+        help="no terminar: volver a rastrear cada búsqueda según su intervalo (scheduler.py run)",
+    )
+    parser.add_argument("--parallel", type=int, default=scheduler.DEFAULT_PARALLEL, help="rastreos simultáneos")
+    parser.add_argument(
+        "--poll", type=float, default=scheduler.DEFAULT_POLL_INTERVAL_S, help="segundos entre revisiones"
+    )
+    args = parser.parse_args(argv)
+
+    if args.schedule:
+        scheduler.run(args.parallel, args.poll)
+        return
+    crawl_once()
 
 
 if __name__ == "__main__":
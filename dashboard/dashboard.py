@@ -1,34 +1,24 @@
 """Streamlit dashboard for Mercado Libre scraping results."""
 from __future__ import annotations
 
-import sqlite3
+import math
 from pathlib import Path
 
 import pandas as pd
 import streamlit as st
 
 from config_utils import load_search_query
+from sites import DEFAULT_SITE, SITES, get_site
+from services.cache import get_default_cache
 from services.domain_discovery import fetch_domain_discovery
+from storage.parquet_store import PARQUET_DIR, latest_mtime_ns, read_history
+from storage.queries import SEARCHABLE_COLUMNS, ItemFilters, ItemsRepository, ItemsSummary
 
 DB_PATH = Path("data/database.db")
 JSON_FALLBACK_PATH = Path("data/data.json")
-
-
-def load_from_sqlite(db_path: Path) -> pd.DataFrame:
-    """Load data from SQLite database, returning an empty DataFrame on failure."""
-    if not db_path.exists():
-        return pd.DataFrame()
-
-    connection: sqlite3.Connection | None = None
-    try:
-        connection = sqlite3.connect(db_path)
-        return pd.read_sql_query("SELECT * FROM mercadolivre_items", connection)
-    except Exception as exc:  # pragma: no cover - surface error to UI
-        st.warning(f"No se pudo leer la base de datos SQLite: {exc}")
-        return pd.DataFrame()
-    finally:
-        if connection is not None:
-            connection.close()
+PAGE_SIZES = [50, 100, 250, 500]
+NEW_ITEMS_REFRESH_SECONDS = 15
+SEARCH_LABEL = "Buscar por título, vendedor o búsqueda:"
 
 
 def load_from_json(json_path: Path) -> pd.DataFrame:
@@ -62,7 +52,11 @@ def filter_by_search_term(df: pd.DataFrame, search_term: str) -> pd.DataFrame:
     if not search_term:
         return df
 
-    contains_mask = df.astype(str).apply(lambda col: col.str.contains(search_term, case=False, na=False))
+    # Same columns as the database search (storage.queries.SEARCHABLE_COLUMNS).
+    columns = [column for column in SEARCHABLE_COLUMNS if column in df.columns] or list(df.columns)
+    contains_mask = df[columns].astype(str).apply(
+        lambda col: col.str.contains(search_term, case=False, na=False, regex=False)
+    )
     return df[contains_mask.any(axis=1)]
 
 
@@ -74,31 +68,177 @@ def apply_price_filters(df: pd.DataFrame, min_price: float, max_price: float) ->
     return df[(price_series >= min_price) & (price_series <= max_price)]
 
 
-def render_dashboard(df: pd.DataFrame) -> None:
+class FrameSource:
+    """In-memory stand-in for ``ItemsRepository`` used with the JSON fallback."""
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.df = df
+        self.columns = list(df.columns)
+
+    def is_empty(self) -> bool:
+        return self.df.empty
+
+    def sites(self) -> list[str]:
+        if "_site" not in self.df.columns:
+            return []
+        return sorted(self.df["_site"].dropna().astype(str).unique().tolist())
+
+    def price_bounds(self) -> tuple[float, float]:
+        if "price" in self.df.columns and self.df["price"].notna().any():
+            return float(self.df["price"].min()), float(self.df["price"].max())
+        return 0.0, 0.0
+
+    def _filtered(self, filters: ItemFilters) -> pd.DataFrame:
+        df = self.df
+        if filters.category_id and "category_id" in df.columns:
+            df = df[df["category_id"] == filters.category_id]
+        if filters.site and "_site" in df.columns:
+            df = df[df["_site"] == filters.site]
+        df = filter_by_search_term(df, filters.search_term)
+        if filters.min_price is not None or filters.max_price is not None:
+            low, high = self.price_bounds()
+            df = apply_price_filters(
+                df,
+                low if filters.min_price is None else filters.min_price,
+                high if filters.max_price is None else filters.max_price,
+            )
+        return df
+
+    def summary(self, filters: ItemFilters = ItemFilters()) -> ItemsSummary:
+        df = self._filtered(filters)
+        has_price = "price" in df.columns and df["price"].notna().any()
+        return ItemsSummary(
+            count=df.shape[0],
+            mean_price=float(df["price"].mean()) if has_price else None,
+            min_price=float(df["price"].min()) if has_price else None,
+            max_price=float(df["price"].max()) if has_price else None,
+        )
+
+    def page(self, filters: ItemFilters, limit: int, offset: int = 0) -> pd.DataFrame:
+        return self._filtered(filters).iloc[offset:offset + limit]
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_json_frame(json_path: str, mtime_ns: int) -> pd.DataFrame:
+    """Read and normalize the JSON fallback once per file version (``mtime_ns`` is the cache key)."""
+    return normalize_prices(load_from_json(Path(json_path)))
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_parquet_frame(root: str, mtime_ns: int) -> pd.DataFrame:
+    """Latest observation of each listing in the Parquet history (``mtime_ns`` is the cache key)."""
+    history = read_history(root)
+    if history.empty or "ml_item_id" not in history.columns:
+        return history
+    return (
+        history.sort_values("_scraped_at")
+        .drop_duplicates(subset=["ml_item_id"], keep="last")
+        .reset_index(drop=True)
+    )
+
+
+class RepositoryUnavailable(Exception):
+    """The database or its items table does not exist yet."""
+
+
+@st.cache_resource(show_spinner=False)
+def _open_repository(db_path: str) -> ItemsRepository:
+    repository = ItemsRepository.open(db_path)
+    if repository is None:
+        # Raising keeps st.cache_resource from caching the miss.
+        raise RepositoryUnavailable(db_path)
+    return repository
+
+
+def get_repository(db_path: str) -> ItemsRepository | None:
+    """One pooled repository per server process, shared by every session.
+
+    Until the crawler creates the database this returns None and the next
+    rerun tries again.
+    """
+    try:
+        return _open_repository(db_path)
+    except RepositoryUnavailable:
+        return None
+
+
+@st.fragment(run_every=NEW_ITEMS_REFRESH_SECONDS)
+def render_new_items(repository: ItemsRepository) -> None:
+    """Show listings inserted since this session first loaded the data.
+
+    Runs on its own timer, so a crawl writing to the database shows up here
+    without rerunning the rest of the page; only rows past the session's
+    rowid watermark are read.
+    """
+    if "seen_rowid" not in st.session_state:
+        st.session_state["seen_rowid"] = repository.last_rowid()
+
+    new_items = repository.rows_since(st.session_state["seen_rowid"])
+    if new_items.empty:
+        return
+
+    with st.expander(f"🆕 Novedades: {len(new_items)} publicaciones nuevas", expanded=False):
+        st.dataframe(new_items, use_container_width=True, hide_index=True)
+        if st.button("Marcar como vistas"):
+            st.session_state["seen_rowid"] = repository.last_rowid()
+            st.rerun()
+
+
+def render_price_trend(repository: ItemsRepository, site_filter: str | None = None) -> None:
+    """Daily price trend read from the precomputed rollups, one site (currency) at a time."""
+    if not repository.trend_queries():
+        return
+
+    st.markdown("### Tendencia de precios")
+    sites = repository.sites()
+    site = site_filter if site_filter in sites else (sites[0] if sites else None)
+    query_col = st
+    if len(sites) > 1:
+        site_col, query_col = st.columns([1, 3])
+        site = site_col.selectbox("Sitio", sites, index=sites.index(site), key="trend_site")
+    queries = repository.trend_queries(site)
+    choice = query_col.selectbox("Búsqueda", ["(todas)"] + queries, key="trend_query")
+    trend = repository.trend(None if choice == "(todas)" else choice, site=site)
+    if trend.empty:
+        st.caption("Todavía no hay historial para esta búsqueda.")
+        return
+
+    trend = trend.set_index("day")
+    price_col, ads_col = st.columns([3, 1])
+    price_col.line_chart(
+        trend[["p10", "p50", "p90", "mean_price"]].rename(
+            columns={"p10": "P10", "p50": "Mediana", "p90": "P90", "mean_price": "Promedio"}
+        )
+    )
+    ads_col.bar_chart(trend[["ad_share"]].rename(columns={"ad_share": "Proporción de anuncios"}))
+
+
+def render_dashboard(source: ItemsRepository | FrameSource) -> None:
     st.set_page_config(page_title="Mercado Libre Dashboard", layout="wide")
 
     st.title("📊 Mercado Libre – Dashboard")
 
-    if df.empty:
+    if source.is_empty():
         st.info(
             "No hay datos para mostrar en este momento. Genera una nueva búsqueda desde la aplicación o "
             "verifica las fuentes de datos disponibles."
         )
         return
 
-    if "price" in df.columns and df["price"].notna().any():
-        min_available = float(df["price"].min())
-        max_available = float(df["price"].max())
-    else:
-        min_available = 0.0
-        max_available = 0.0
+    min_available, max_available = source.price_bounds()
 
     search_term = ""
     min_price = min_available
     max_price = max_available
+    category_id = None
+    site_filter = None
 
     with st.sidebar:
         st.header("Filtros")
+        available_sites = source.sites()
+        if len(available_sites) > 1:
+            choice = st.selectbox("Sitio", ["(todos)"] + available_sites)
+            site_filter = None if choice == "(todos)" else choice
         with st.sidebar.expander("🧰 Filtros", expanded=True):
             # Si ya tenés tabs para Básicos/Avanzados, mantenelos y solo agrega la de Domain Discovery.
             try:
@@ -112,18 +252,26 @@ def render_dashboard(df: pd.DataFrame) -> None:
                 st.caption(f"Búsqueda actual: **{q}**")
 
                 dd_limit = st.slider("Límite del llamado", 1, 20, 5, key="dd_limit")
-                site = st.selectbox("Site", ["MLA"], index=0, help="Dejalo en MLA salvo que necesites otro")
-
-                @st.cache_data(show_spinner=False, ttl=60*60)
-                def _cached_domain_discovery(query: str, limit: int, site_code: str):
-                    return fetch_domain_discovery(query=query, limit=limit, site=site_code)
+                site_options = list(SITES)
+                site = st.selectbox(
+                    "Site",
+                    site_options,
+                    index=site_options.index(DEFAULT_SITE),
+                    help=f"Dejalo en {DEFAULT_SITE} salvo que necesites otro",
+                )
 
+                # Las respuestas se guardan en la caché en disco de services/ (compartida entre procesos).
                 col1, col2 = st.columns(2)
                 with col1:
-                    if st.button("Refrescar"):
-                        _cached_domain_discovery.clear()
+                    refresh = st.button("Refrescar")
 
-                raw = _cached_domain_discovery(q, dd_limit, site)
+                raw = fetch_domain_discovery(query=q, limit=dd_limit, site=site, refresh=refresh)
+                cache_stats = get_default_cache().stats().get("domain_discovery")
+                if cache_stats:
+                    col2.caption(
+                        f"Caché: {cache_stats['hits']} aciertos · {cache_stats['misses']} fallos · "
+                        f"{cache_stats['revalidations']} revalidaciones"
+                    )
 
                 st.markdown("**Respuesta (JSON crudo):**")
                 st.json(raw, expanded=False)
@@ -144,9 +292,9 @@ def render_dashboard(df: pd.DataFrame) -> None:
                 )
                 st.code(f"GET {url_example}", language="bash")
 
-                # (Opcional) Filtrar dataset principal por categoría sugerida si df existe en este scope:
+                # (Opcional) Filtrar dataset principal por categoría sugerida:
                 try:
-                    if isinstance(raw, list) and len(raw) > 0 and "category_id" in df.columns:
+                    if isinstance(raw, list) and len(raw) > 0 and "category_id" in source.columns:
                         sugeridas = pd.DataFrame(raw)
                         if "category_id" in sugeridas.columns:
                             opciones = (
@@ -156,52 +304,104 @@ def render_dashboard(df: pd.DataFrame) -> None:
                             ).dropna().drop_duplicates().tolist()
                             choice = st.selectbox("Filtrar dataset por categoría sugerida", ["(ninguna)"] + opciones)
                             if choice != "(ninguna)":
-                                cat_elegida = choice.split("(")[-1].rstrip(")")
-                                df = df[df["category_id"] == cat_elegida]
-                    elif isinstance(raw, list) and len(raw) > 0 and "category_id" not in (df.columns if 'df' in locals() else []):
+                                category_id = choice.split("(")[-1].rstrip(")")
+                    elif isinstance(raw, list) and len(raw) > 0:
                         st.warning("Tu dataset no incluye 'category_id'. Extraelo en el spider y guardalo para poder filtrar por categoría.")
                 except Exception:
                     pass
 
             if "tab_basicos" in locals():
                 with tab_basicos:
-                    search_term = st.text_input("Buscar en todos los campos:")
+                    search_term = st.text_input(SEARCH_LABEL)
                     min_price = st.number_input("Precio mínimo", value=min_available, step=100.0)
                     max_price = st.number_input("Precio máximo", value=max_available, step=100.0)
             else:
-                search_term = st.text_input("Buscar en todos los campos:")
+                search_term = st.text_input(SEARCH_LABEL)
                 min_price = st.number_input("Precio mínimo", value=min_available, step=100.0)
                 max_price = st.number_input("Precio máximo", value=max_available, step=100.0)
 
-    total_items = df.shape[0]
-    col1, col2 = st.columns(2)
-    col1.metric("Total de ítems", total_items)
-    if "price" in df.columns and df["price"].notna().any():
-        col2.metric("Precio promedio (ARS)", f"{df['price'].mean():,.2f}")
-    else:
-        col2.metric("Precio promedio (ARS)", "—")
+    if isinstance(source, ItemsRepository):
+        render_new_items(source)
 
-    filtered_df = filter_by_search_term(df, search_term)
-    filtered_df = apply_price_filters(filtered_df, min_price, max_price)
+    summary = source.summary(ItemFilters(category_id=category_id, site=site_filter))
+    if summary.products is not None:
+        col1, col_products, col2, col_product_price = st.columns(4)
+    else:
+        col1, col2 = st.columns(2)
+    col1.metric("Total de ítems", summary.count)
+    if summary.products is not None:
+        col_products.metric(
+            "Productos distintos",
+            summary.products,
+            help="Publicaciones del mismo producto (títulos casi iguales) agrupadas entre vendedores y búsquedas",
+        )
+    # Averaging prices across sites would mix currencies.
+    if len(available_sites) > 1 and site_filter is None:
+        col2.metric("Precio promedio", "—", help="Elige un sitio para ver el promedio en su moneda")
+        if summary.products is not None:
+            col_product_price.metric("Precio promedio por producto", "—")
+    else:
+        currency = get_site(site_filter or (available_sites[0] if available_sites else DEFAULT_SITE)).currency
+        price_text = f"{summary.mean_price:,.2f}" if summary.mean_price is not None else "—"
+        col2.metric(f"Precio promedio ({currency})", price_text)
+        if summary.products is not None:
+            product_price = summary.product_mean_price
+            col_product_price.metric(
+                f"Precio promedio por producto ({currency})",
+                f"{product_price:,.2f}" if product_price is not None else "—",
+                help="Cada producto cuenta una vez, aunque lo publiquen muchos vendedores",
+            )
+
+    if isinstance(source, ItemsRepository):
+        render_price_trend(source, site_filter)
+
+    filters = ItemFilters(
+        search_term=search_term,
+        min_price=min_price,
+        max_price=max_price,
+        category_id=category_id,
+        site=site_filter,
+    )
+    total_results = source.summary(filters).count
 
     st.markdown("### Resultados")
-    st.dataframe(filtered_df.reset_index(drop=True), use_container_width=True)
+    page_col, size_col = st.columns([3, 1])
+    page_size = size_col.selectbox("Filas por página", PAGE_SIZES, index=0)
+    total_pages = max(1, math.ceil(total_results / page_size))
+    # Keyed on the filters so the page resets to 1 whenever they change.
+    page_number = page_col.number_input(
+        "Página",
+        min_value=1,
+        max_value=total_pages,
+        value=1,
+        step=1,
+        key=f"page_{hash(filters)}_{page_size}",
+    )
+    st.caption(f"{total_results} resultados · página {page_number} de {total_pages}")
+
+    page_df = source.page(filters, limit=page_size, offset=(int(page_number) - 1) * page_size)
+    st.dataframe(page_df.reset_index(drop=True), use_container_width=True)
 
 
 def main() -> None:
-    data_frame = load_from_sqlite(DB_PATH)
-    fallback_used = False
-    if data_frame.empty:
-        fallback_used = True
-        data_frame = load_from_json(JSON_FALLBACK_PATH)
+    repository = get_repository(str(DB_PATH))
+    if repository is not None and not repository.is_empty():
+        render_dashboard(repository)
+        return
 
-    if fallback_used and data_frame.empty:
+    parquet_mtime_ns = latest_mtime_ns(PARQUET_DIR)
+    if parquet_mtime_ns:
+        render_dashboard(FrameSource(load_parquet_frame(str(PARQUET_DIR), parquet_mtime_ns)))
+        return
+
+    mtime_ns = JSON_FALLBACK_PATH.stat().st_mtime_ns if JSON_FALLBACK_PATH.exists() else 0
+    data_frame = load_json_frame(str(JSON_FALLBACK_PATH), mtime_ns)
+    if data_frame.empty:
         st.warning(
-            "No fue posible obtener datos desde la base SQLite ni desde el archivo JSON de respaldo."
+            "No fue posible obtener datos desde la base SQLite, el histórico Parquet ni el archivo JSON de respaldo."
         )
 
-    normalized_df = normalize_prices(data_frame)
-    render_dashboard(normalized_df)
+    render_dashboard(FrameSource(data_frame))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,421 @@
+"""Distributed crawl mode: several workers share one request queue.
+
+Every worker runs ``MercadoLivreSpider`` with ``DistributedScheduler`` in place
+of Scrapy's in-memory scheduler. Requests are serialized into a shared
+backend, deduplicated there by request fingerprint (so each listing page is
+fetched once across all workers, start requests included) and handed to
+whichever worker asks first. Fingerprints only deduplicate within one crawl:
+the first worker to open on an idle queue (nothing pending or claimed) forgets
+the previous crawl's finished requests. A claimed request that is not acknowledged within
+``DISTRIBUTED_LEASE`` seconds (its worker died) goes back to the queue, at
+most ``DISTRIBUTED_MAX_ATTEMPTS`` times before it is marked failed.
+``DistributedAckMiddleware`` acknowledges a request once the downloader is
+done with it either way: response, download error or a middleware dropping
+it; a retried or redirected copy acknowledges the original when queued.
+``SharedRateLimitMiddleware`` reserves send times per domain in the same
+backend, so ``DISTRIBUTED_DOMAIN_RATES`` holds for all workers combined.
+Items still go through the regular pipelines into the shared SQLite database
+or Parquet store.
+
+The backend is pluggable through ``DISTRIBUTED_QUEUE_BACKEND``;
+``SQLiteRequestQueue`` needs no external service and works for workers on one
+machine (or a filesystem with working SQLite locks).
+
+Usage::
+
+    python -m extraction.distributed worker --queue data/queue.db   # once per worker
+    python -m extraction.distributed status --queue data/queue.db
+    python -m extraction.distributed reset --queue data/queue.db
+"""
+import argparse
+import os
+import pickle
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from scrapy import signals
+from scrapy.core.scheduler import BaseScheduler
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.misc import load_object
+from scrapy.utils.request import request_from_dict
+from twisted.internet.task import deferLater
+
+QUEUE_ID_META = "distributed_queue_id"
+DEFAULT_QUEUE_PATH = Path(__file__).resolve().parents[1] / "data" / "queue.db"
+
+STATE_PENDING = "pending"
+STATE_CLAIMED = "claimed"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT UNIQUE,
+    priority INTEGER NOT NULL DEFAULT 0,
+    payload BLOB NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    claimed_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_requests_state ON requests (state, priority DESC, id);
+CREATE TABLE IF NOT EXISTS domain_rates (
+    domain TEXT PRIMARY KEY,
+    next_at REAL NOT NULL
+);
+"""
+
+
+class RequestQueueBackend:
+    """Shared state of a distributed crawl; subclass it to add a backend."""
+
+    @classmethod
+    def from_settings(cls, settings) -> "RequestQueueBackend":
+        raise NotImplementedError
+
+    def start_crawl(self) -> bool:
+        """Called when a worker opens; start a new crawl if the queue is idle.
+
+        Returns True when the previous crawl's finished requests were dropped,
+        so their fingerprints no longer dedup; False when the worker joins a
+        crawl other workers are still running.
+        """
+        raise NotImplementedError
+
+    def push(self, fingerprint: Optional[str], priority: int, payload: bytes) -> bool:
+        """Queue ``payload`` unless ``fingerprint`` was queued in this crawl (``None`` never dedups)."""
+        raise NotImplementedError
+
+    def pop(self, worker: str) -> Optional[Tuple[int, bytes]]:
+        """Claim the highest-priority pending request for ``worker``."""
+        raise NotImplementedError
+
+    def ack(self, request_id: int) -> None:
+        raise NotImplementedError
+
+    def has_pending(self) -> bool:
+        """True while any request is pending or claimed by some worker."""
+        raise NotImplementedError
+
+    def reserve(self, domain: str, interval: float) -> float:
+        """Book the next send slot for ``domain``; returns how long to wait for it."""
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteRequestQueue(RequestQueueBackend):
+    def __init__(self, path: Path | str = DEFAULT_QUEUE_PATH, lease: float = 300.0, max_attempts: int = 3) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease = lease
+        self.max_attempts = max(1, max_attempts)
+        # Autocommit; claims and reservations take the write lock explicitly.
+        self.connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    @classmethod
+    def from_settings(cls, settings) -> "SQLiteRequestQueue":
+        return cls(
+            settings.get("DISTRIBUTED_QUEUE_PATH") or DEFAULT_QUEUE_PATH,
+            lease=settings.getfloat("DISTRIBUTED_LEASE", 300.0),
+            max_attempts=settings.getint("DISTRIBUTED_MAX_ATTEMPTS", 3),
+        )
+
+    def start_crawl(self) -> bool:
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            idle = not self.has_pending()
+            if idle:
+                self.connection.execute("DELETE FROM requests WHERE state IN (?, ?)", (STATE_DONE, STATE_FAILED))
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        return idle
+
+    def push(self, fingerprint: Optional[str], priority: int, payload: bytes) -> bool:
+        cursor = self.connection.execute(
+            "INSERT OR IGNORE INTO requests (fingerprint, priority, payload) VALUES (?, ?, ?)",
+            (fingerprint, priority, payload),
+        )
+        return cursor.rowcount > 0
+
+    def pop(self, worker: str) -> Optional[Tuple[int, bytes]]:
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired leases go back to the queue, or fail once they used up their attempts.
+            self.connection.execute(
+                "UPDATE requests SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL "
+                "WHERE state = ? AND claimed_at < ?",
+                (self.max_attempts, STATE_FAILED, STATE_PENDING, STATE_CLAIMED, now - self.lease),
+            )
+            row = self.connection.execute(
+                "SELECT id, payload FROM requests WHERE state = ? ORDER BY priority DESC, id LIMIT 1",
+                (STATE_PENDING,),
+            ).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    "UPDATE requests SET state = ?, worker = ?, claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (STATE_CLAIMED, worker, now, row[0]),
+                )
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        return (row[0], row[1]) if row is not None else None
+
+    def ack(self, request_id: int) -> None:
+        self.connection.execute(
+            "UPDATE requests SET state = ?, payload = x'' WHERE id = ? AND state = ?",
+            (STATE_DONE, request_id, STATE_CLAIMED),
+        )
+
+    def has_pending(self) -> bool:
+        row = self.connection.execute(
+            "SELECT EXISTS (SELECT 1 FROM requests WHERE state IN (?, ?))", (STATE_PENDING, STATE_CLAIMED)
+        ).fetchone()
+        return bool(row[0])
+
+    def reserve(self, domain: str, interval: float) -> float:
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.connection.execute("SELECT next_at FROM domain_rates WHERE domain = ?", (domain,)).fetchone()
+            send_at = max(now, row[0]) if row is not None else now
+            self.connection.execute(
+                "INSERT OR REPLACE INTO domain_rates (domain, next_at) VALUES (?, ?)", (domain, send_at + interval)
+            )
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        return send_at - now
+
+    def counts(self) -> Dict[str, int]:
+        rows = self.connection.execute("SELECT state, COUNT(*) FROM requests GROUP BY state")
+        return {state: count for state, count in rows}
+
+    def reset(self) -> None:
+        self.connection.execute("DELETE FROM requests")
+        self.connection.execute("DELETE FROM domain_rates")
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def open_backend(settings) -> RequestQueueBackend:
+    backend_cls = load_object(settings.get("DISTRIBUTED_QUEUE_BACKEND") or SQLiteRequestQueue)
+    return backend_cls.from_settings(settings)
+
+
+class DistributedScheduler(BaseScheduler):
+    """Scrapy scheduler backed by a shared ``RequestQueueBackend``.
+
+    When the shared queue runs dry the worker stays open for
+    ``DISTRIBUTED_IDLE_TIMEOUT`` seconds, since another worker may still be
+    parsing a page that schedules more requests.
+    """
+
+    def __init__(self, crawler, queue: RequestQueueBackend, idle_timeout: float = 15.0) -> None:
+        self.crawler = crawler
+        self.queue = queue
+        self.idle_timeout = idle_timeout
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.spider = None
+        self._idle_since: Optional[float] = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        scheduler = cls(
+            crawler,
+            open_backend(crawler.settings),
+            idle_timeout=crawler.settings.getfloat("DISTRIBUTED_IDLE_TIMEOUT", 15.0),
+        )
+        crawler.signals.connect(scheduler._request_left_downloader, signal=signals.request_left_downloader)
+        return scheduler
+
+    def open(self, spider):
+        self.spider = spider
+        if self.queue.start_crawl():
+            self.crawler.stats.set_value("distributed/new_crawl", True)
+
+    def close(self, reason):
+        self.queue.close()
+
+    def enqueue_request(self, request) -> bool:
+        fingerprint = None
+        if not request.dont_filter:
+            fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        data = request.to_dict(spider=self.spider)
+        # A retried copy must not carry the id of the request it replaces.
+        data["meta"].pop(QUEUE_ID_META, None)
+        added = self.queue.push(fingerprint, request.priority, pickle.dumps(data, protocol=4))
+        self.crawler.stats.inc_value("distributed/enqueued" if added else "distributed/duplicates")
+        replaced_id = request.meta.get(QUEUE_ID_META)
+        if replaced_id is not None:
+            # A retried or redirected copy of a claimed request: the copy is queued, the original is done.
+            self.queue.ack(replaced_id)
+        return added
+
+    def next_request(self):
+        popped = self.queue.pop(self.worker)
+        if popped is None:
+            return None
+        request_id, payload = popped
+        request = request_from_dict(pickle.loads(payload), spider=self.spider)
+        request.meta[QUEUE_ID_META] = request_id
+        self.crawler.stats.inc_value("distributed/dequeued")
+        return request
+
+    def has_pending_requests(self) -> bool:
+        if self.queue.has_pending():
+            self._idle_since = None
+            return True
+        now = time.monotonic()
+        if self._idle_since is None:
+            self._idle_since = now
+        return now - self._idle_since < self.idle_timeout
+
+    def _request_left_downloader(self, request, spider):
+        request_id = request.meta.get(QUEUE_ID_META)
+        if request_id is not None:
+            self.queue.ack(request_id)
+
+
+class DistributedAckMiddleware:
+    """Acknowledge claimed requests once the downloader is done with them.
+
+    Sits closest to the downloader, so its ``process_response`` and
+    ``process_exception`` run before any other middleware can turn the
+    outcome into a retry; ``process_exception`` also sees requests that an
+    earlier middleware dropped in ``process_request`` (e.g. the offsite
+    middleware's ``IgnoreRequest``), which never reach a downloader slot.
+    """
+
+    def __init__(self, queue: RequestQueueBackend) -> None:
+        self.queue = queue
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.get("DISTRIBUTED_QUEUE_PATH"):
+            raise NotConfigured("DISTRIBUTED_QUEUE_PATH is not set")
+        middleware = cls(open_backend(crawler.settings))
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_closed(self, spider):
+        self.queue.close()
+
+    def _ack(self, request) -> None:
+        request_id = request.meta.get(QUEUE_ID_META)
+        if request_id is not None:
+            self.queue.ack(request_id)
+
+    def process_response(self, request, response, spider):
+        self._ack(request)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._ack(request)
+        return None
+
+
+class SharedRateLimitMiddleware:
+    """Space requests to each domain in ``DISTRIBUTED_DOMAIN_RATES`` (requests/s) across workers."""
+
+    def __init__(self, queue: RequestQueueBackend, rates: Dict[str, float], stats=None) -> None:
+        self.queue = queue
+        self.intervals = {domain: 1.0 / float(rate) for domain, rate in rates.items() if float(rate) > 0}
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get("DISTRIBUTED_QUEUE_PATH"):
+            raise NotConfigured("DISTRIBUTED_QUEUE_PATH is not set")
+        rates = settings.getdict("DISTRIBUTED_DOMAIN_RATES")
+        if not rates:
+            raise NotConfigured("DISTRIBUTED_DOMAIN_RATES is empty")
+        middleware = cls(open_backend(settings), rates, stats=crawler.stats)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_closed(self, spider):
+        self.queue.close()
+
+    async def process_request(self, request, spider):
+        from twisted.internet import reactor
+
+        domain = urlparse_cached(request).hostname or ""
+        interval = self.intervals.get(domain)
+        if interval is None:
+            return None
+        wait = self.queue.reserve(domain, interval)
+        if wait > 0:
+            if self.stats is not None:
+                self.stats.inc_value("distributed/rate_limit_wait", wait)
+            await maybe_deferred_to_future(deferLater(reactor, wait, lambda: None))
+        return None
+
+
+def distributed_settings(queue_path: Path | str) -> dict:
+    """Settings overrides that turn a crawl into a worker on the queue at ``queue_path``."""
+    return {
+        "SCHEDULER": "extraction.distributed.DistributedScheduler",
+        "DISTRIBUTED_QUEUE_PATH": str(queue_path),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rastreo distribuido con una cola compartida")
+    parser.add_argument("command", choices=("worker", "status", "reset"))
+    parser.add_argument("--queue", type=Path, default=DEFAULT_QUEUE_PATH)
+    parser.add_argument("--reset", action="store_true", help="vaciar la cola antes de arrancar el worker")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        from scrapy.crawler import CrawlerProcess
+
+        from config_utils import load_search_queries
+        from extraction.spiders.mercadolivre import MercadoLivreSpider, crawl_settings
+
+        if args.reset:
+            queue = SQLiteRequestQueue(args.queue)
+            queue.reset()
+            queue.close()
+        queries = load_search_queries()
+        process = CrawlerProcess(settings={**crawl_settings(queries), **distributed_settings(args.queue)})
+        process.crawl(MercadoLivreSpider, queries=queries)
+        process.start()
+        return
+
+    queue = SQLiteRequestQueue(args.queue)
+    try:
+        if args.command == "reset":
+            queue.reset()
+        else:
+            counts = queue.counts()
+            for state in (STATE_PENDING, STATE_CLAIMED, STATE_DONE, STATE_FAILED):
+                print(f"{state:<8} {counts.get(state, 0)}")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
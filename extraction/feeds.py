@@ -0,0 +1,69 @@
+"""Feed locations and the zstd feed post-processing plugin.
+
+``"output": "jsonl"`` makes the spider write one JSON object per line, so a
+crawl that dies half-way still leaves every complete line readable, and
+``transforms.data_transformation`` can stream the file in bounded chunks.
+With ``"feed_compression": "zstd"`` the lines go through ``ZstdPlugin``
+(requires the optional ``zstandard`` package).
+"""
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+from config_utils import FEED_COMPRESSION_ZSTD, OUTPUT_JSON, OUTPUT_JSONL
+
+FEED_FORMATS = {OUTPUT_JSON: "json", OUTPUT_JSONL: "jsonlines"}
+FEED_SUFFIXES = {OUTPUT_JSON: ".json", OUTPUT_JSONL: ".jsonl"}
+COMPRESSION_SUFFIXES = {FEED_COMPRESSION_ZSTD: ".zst"}
+
+
+def feed_path(data_dir: Path, output: str, compression: Optional[str] = None) -> Path:
+    """``data/data.json``, ``data/data.jsonl`` or ``data/data.jsonl.zst``."""
+    suffix = FEED_SUFFIXES[output]
+    if output == OUTPUT_JSONL and compression:
+        suffix += COMPRESSION_SUFFIXES[compression]
+    return data_dir / f"data{suffix}"
+
+
+def feed_settings(path: Path, output: str, compression: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Value for the ``FEEDS`` setting that writes the raw items to ``path``."""
+    options: Dict[str, Any] = {"format": FEED_FORMATS[output], "overwrite": True}
+    if output == OUTPUT_JSONL and compression == FEED_COMPRESSION_ZSTD:
+        options["postprocessing"] = [ZstdPlugin]
+    return {str(path): options}
+
+
+class ZstdPlugin:
+    """Compress the feed with zstd, flushing a block every ``zstd_flush_items`` items.
+
+    Accepted ``feed_options`` parameters:
+
+    - ``zstd_level`` (default 3)
+    - ``zstd_flush_items`` (default 100): block flushes keep a killed crawl's
+      file readable up to the last flush.
+    """
+
+    def __init__(self, file: BinaryIO, feed_options: Dict[str, Any]) -> None:
+        if zstandard is None:
+            raise RuntimeError('"feed_compression": "zstd" requires the zstandard package (pip install zstandard)')
+        self.file = file
+        self.flush_items = max(1, int(feed_options.get("zstd_flush_items", 100)))
+        compressor = zstandard.ZstdCompressor(level=int(feed_options.get("zstd_level", 3)))
+        self.writer = compressor.stream_writer(file, closefd=False)
+        self.pending = 0
+
+    def write(self, data: bytes) -> int:
+        written = self.writer.write(data)
+        self.pending += 1
+        if self.pending >= self.flush_items:
+            self.writer.flush(zstandard.FLUSH_BLOCK)
+            self.file.flush()
+            self.pending = 0
+        return written
+
+    def close(self) -> None:
+        self.writer.close()
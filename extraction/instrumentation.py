@@ -0,0 +1,103 @@
+"""Crawl metrics extension.
+
+Records per-host request latency and response size histograms, responses by
+status, items per listing page and parse time per page (from the
+``listing_page_parsed`` signal) in a registry for the run. When the spider
+closes the run is folded into the process-wide ``metrics.REGISTRY``, which is
+written to ``METRICS_DIR/crawl.prom``, and a JSON summary of the run (with
+the main Scrapy stats) is saved next to it. The API calls made by the
+enrichment stage are recorded in ``REGISTRY`` by the client and written to
+``api.prom`` at the same time, once per crawl.
+"""
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+
+from extraction.items import ItemDetails
+from extraction.signals import listing_page_parsed
+from metrics import (
+    COUNT_BUCKETS,
+    METRICS_DIR,
+    REGISTRY,
+    SIZE_BUCKETS,
+    MetricsRegistry,
+    write_prometheus,
+    write_run_summary,
+)
+
+PREFIX = "crawl_"
+API_PREFIX = "api_"
+SUMMARY_STATS = (
+    "finish_reason",
+    "elapsed_time_seconds",
+    "item_scraped_count",
+    "response_received_count",
+    "downloader/response_bytes",
+    "downloader/request_count",
+    "retry/count",
+)
+DESCRIPTIONS = {
+    "crawl_request_latency_seconds": "Time from sending a request to receiving its response headers.",
+    "crawl_response_bytes": "Response body size.",
+    "crawl_responses_total": "Responses received by HTTP status.",
+    "crawl_items_per_page": "Listings extracted from each listing page.",
+    "crawl_parse_seconds": "Time spent extracting listings from one page.",
+    "crawl_items_total": "Items scraped.",
+    "crawl_details_total": "Item details fetched by the enrichment stage.",
+}
+
+
+class CrawlMetrics:
+    def __init__(self, crawler, directory):
+        self.crawler = crawler
+        self.directory = directory
+        self.run = MetricsRegistry()
+        for name, text in DESCRIPTIONS.items():
+            self.run.describe(name, text)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("METRICS_ENABLED"):
+            raise NotConfigured
+        extension = cls(crawler, crawler.settings.get("METRICS_DIR") or METRICS_DIR)
+        crawler.signals.connect(extension.response_received, signal=signals.response_received)
+        crawler.signals.connect(extension.page_parsed, signal=listing_page_parsed)
+        crawler.signals.connect(extension.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def response_received(self, response, request, spider):
+        host = urlparse_cached(request).hostname or ""
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            self.run.observe("crawl_request_latency_seconds", latency, host=host)
+        self.run.observe("crawl_response_bytes", len(response.body), buckets=SIZE_BUCKETS, host=host)
+        self.run.inc("crawl_responses_total", host=host, status=response.status)
+
+    def page_parsed(self, response, item_count, spider, parse_seconds=None, layout=None, site=None):
+        self.run.observe("crawl_items_per_page", item_count, buckets=COUNT_BUCKETS, site=site, layout=layout)
+        if parse_seconds is not None:
+            self.run.observe("crawl_parse_seconds", parse_seconds, site=site, layout=layout)
+
+    def item_scraped(self, item, response, spider):
+        if isinstance(item, ItemDetails):
+            self.run.inc("crawl_details_total")
+            return
+        self.run.inc("crawl_items_total", site=getattr(item, "_site", None) or "")
+
+    def spider_closed(self, spider, reason):
+        stats = self.crawler.stats.get_stats() if self.crawler.stats is not None else {}
+        REGISTRY.merge(self.run)
+        write_prometheus("crawl", REGISTRY, PREFIX, self.directory)
+        write_prometheus("api", REGISTRY, API_PREFIX, self.directory)
+        write_run_summary(
+            "crawl",
+            self.run,
+            PREFIX,
+            extra={
+                "spider": spider.name,
+                "queries": [search.query for search in getattr(spider, "queries", [])],
+                "stats": {key: stats.get(key) for key in SUMMARY_STATS if key in stats},
+            },
+            directory=self.directory,
+        )
@@ -3,10 +3,119 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
+from dataclasses import dataclass, fields
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Optional
+
 import scrapy
+from itemadapter import ItemAdapter
+from itemadapter.adapter import AdapterInterface
+
+from sites import get_site
+
+
+@dataclass(slots=True)
+class ListingItem:
+    """One product card from a listing page.
+
+    A slotted dataclass rather than a dict: items take a fixed, small amount
+    of memory, and the price is kept as integer cents from the page markup
+    on, so nothing downstream parses a ``"1234,56"`` string again. Feed
+    exporters serialize it through ``ListingItemAdapter`` once the spider has
+    called ``register_adapters`` (``price_cents`` is written as a JSON
+    integer) and the pipelines read its attributes directly.
+    """
+
+    ml_item_id: Optional[str]
+    name: Optional[str]
+    seller: Optional[str]
+    price_cents: Optional[int]
+    permalink: Optional[str]
+    is_ad: bool
+    _search_query: Optional[str] = None
+    _site: Optional[str] = None
+    _source: Optional[str] = None
+
+    @property
+    def price(self) -> Optional[float]:
+        return None if self.price_cents is None else self.price_cents / 100
+
+    def to_record(self, scraped_at: str, default_query: str) -> Dict[str, object]:
+        """The normalized row ``transforms.data_transformation.normalize_record`` builds from a dict."""
+        search_query = self._search_query or default_query
+        site = get_site(self._site)
+        price_cents = self.price_cents
+        return {
+            "ml_item_id": self.ml_item_id,
+            "name": self.name,
+            "seller": self.seller,
+            "price": 0.0 if price_cents is None else price_cents / 100,
+            "permalink": self.permalink,
+            "is_ad": 1 if self.is_ad else 0,
+            "_search_query": search_query,
+            "_site": site.site_id,
+            "_source": self._source or f"{site.listing_base_url}/{search_query}",
+            "_scraped_at": scraped_at,
+            "scrap_date": scraped_at,
+        }
+
+
+class ListingItemAdapter(AdapterInterface):
+    """``ItemAdapter`` backend for ``ListingItem`` alone.
+
+    itemadapter's generic dataclass adapter calls ``dataclasses.fields()``
+    for every item it wraps and ``hasattr`` for every field it lists. Every
+    ``ListingItem`` has the same fields, all always set, so they are read
+    once here; fields cannot be deleted.
+    """
+
+    _FIELDS = {field.name: MappingProxyType(dict(field.metadata)) for field in fields(ListingItem)}
+
+    @classmethod
+    def is_item_class(cls, item_class: type) -> bool:
+        return item_class is ListingItem
+
+    @classmethod
+    def get_field_meta_from_class(cls, item_class: type, field_name: str) -> MappingProxyType:
+        return cls._FIELDS[field_name]
+
+    @classmethod
+    def get_field_names_from_class(cls, item_class: type) -> List[str]:
+        return list(cls._FIELDS)
+
+    def __getitem__(self, field_name: str):
+        if field_name in self._FIELDS:
+            return getattr(self.item, field_name)
+        raise KeyError(field_name)
+
+    def __setitem__(self, field_name: str, value) -> None:
+        if field_name not in self._FIELDS:
+            raise KeyError(f"{type(self.item).__name__} does not support field: {field_name}")
+        setattr(self.item, field_name, value)
+
+    def __delitem__(self, field_name: str) -> None:
+        raise KeyError(f"{type(self.item).__name__} fields cannot be deleted: {field_name}")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._FIELDS)
+
+    def __len__(self) -> int:
+        return len(self._FIELDS)
+
+
+def register_adapters() -> None:
+    """Let ``ItemAdapter`` use ``ListingItemAdapter``; called when the spider is set up."""
+    if ListingItemAdapter not in ItemAdapter.ADAPTER_CLASSES:
+        ItemAdapter.ADAPTER_CLASSES.appendleft(ListingItemAdapter)
+
 
+class ItemDetails(scrapy.Item):
+    """Details of one listing fetched by the enrichment stage (``storage.details``)."""
 
-class ColetaItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+    ml_item_id = scrapy.Field()
+    category_id = scrapy.Field()
+    sold_quantity = scrapy.Field()
+    condition = scrapy.Field()
+    free_shipping = scrapy.Field()
+    logistic_type = scrapy.Field()
+    attributes = scrapy.Field()
@@ -0,0 +1,170 @@
+"""Precompiled listing-page extractors.
+
+``MercadoLivreSpider.parse`` used to run ~8 CSS queries per product card, and
+parsel translated and compiled them again for every card. Here each field is a
+single ``lxml.etree.XPath`` compiled at import time. The layout is detected once
+per page to add the selectors only its markup uses; the previous unions stay in
+every layout as fallbacks.
+"""
+from typing import Callable, Dict, List, Optional
+
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+
+from extraction.items import ListingItem
+from sites import Site, get_site
+
+LAYOUT_POLY = "poly"
+LAYOUT_LEGACY = "legacy"
+
+_translator = HTMLTranslator()
+
+
+def _compile_css(css: str) -> etree.XPath:
+    return etree.XPath(_translator.css_to_xpath(css))
+
+
+# Case-insensitive match on aria-label; cssselect has no support for the `i` flag.
+_PROMOTED_LABEL = (
+    "descendant-or-self::*[contains("
+    "translate(@aria-label, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), "
+    "'promocionado')]"
+)
+
+_IS_POLY = etree.XPath(
+    "boolean(//*[contains(@class, 'poly-card') or contains(@class, 'poly-component__')])"
+)
+# Mercado Libre's "no hay publicaciones que coincidan" page.
+_NO_RESULTS = etree.XPath(
+    "boolean(//*[contains(@class, 'ui-search-rescue') or contains(@class, 'ui-search-empty')])"
+)
+_CARDS = _compile_css("li.ui-search-layout__item")
+_FALLBACK_CARDS = _compile_css("div.ui-search-result__wrapper, [data-testid='item']")
+
+# The selector chain the spider used before this layer, for either layout.
+# Every layout keeps all of them as fallbacks, so markup that moves between
+# layouts (or a page the detection gets wrong) still yields the same fields.
+_BASELINE_SELECTORS = {
+    "link": (
+        "a.ui-search-item__group__element::attr(href)",
+        "a.ui-search-link::attr(href)",
+        "a.poly-component__link::attr(href)",
+        "a::attr(href)",
+    ),
+    "name": (
+        "h2.ui-search-item__title::text",
+        "h2.ui-search-item__title span::text",
+        "a.poly-component__title::text",
+        "[data-testid='item-title']::text",
+    ),
+    "seller": (
+        "[data-testid='seller-info'] ::text",
+        "span.poly-component__seller::text",
+        "span.ui-search-official-store-label__text::text",
+    ),
+    "fraction": ("span.andes-money-amount__fraction::text",),
+    "cents": ("span.andes-money-amount__cents::text",),
+    "ad_markers": (
+        "[data-testid*='advertising']",
+        "[data-testid*='sponsored']",
+        "[data-testid='listing-type-highlight']::text",
+        "[data-testid='listing-highlight-label']::text",
+        ".ui-search-item__ad-badge::text",
+    ),
+}
+
+# Selectors each layout's markup actually uses, listed ahead of the fallbacks.
+# The poly "Promocionado" badge (ads-promotions) is new: the old chain missed it.
+_LAYOUT_SELECTORS = {
+    LAYOUT_POLY: {
+        "link": ("a.poly-component__link::attr(href)", "a.poly-component__title::attr(href)"),
+        "name": ("a.poly-component__title::text",),
+        "seller": ("span.poly-component__seller::text",),
+        "ad_markers": ("span.poly-component__ads-promotions::text",),
+    },
+    LAYOUT_LEGACY: {
+        "link": ("a.ui-search-item__group__element::attr(href)", "a.ui-search-link::attr(href)"),
+        "name": ("h2.ui-search-item__title::text", "h2.ui-search-item__title span::text"),
+        "seller": ("span.ui-search-official-store-label__text::text",),
+        "ad_markers": (".ui-search-item__ad-badge::text",),
+    },
+}
+
+
+def _with_fallbacks(primary: tuple, fallbacks: tuple) -> str:
+    return ", ".join(dict.fromkeys(primary + fallbacks))
+
+
+_FIELD_SELECTORS = {
+    layout: {
+        field: _with_fallbacks(selectors.get(field, ()), baseline)
+        for field, baseline in _BASELINE_SELECTORS.items()
+    }
+    for layout, selectors in _LAYOUT_SELECTORS.items()
+}
+
+EXTRACTORS: Dict[str, Dict[str, etree.XPath]] = {
+    layout: {field: _compile_css(css) for field, css in selectors.items()}
+    for layout, selectors in _FIELD_SELECTORS.items()
+}
+for _extractors in EXTRACTORS.values():
+    _extractors["promoted_label"] = etree.XPath(_PROMOTED_LABEL)
+
+
+def detect_layout(root) -> str:
+    return LAYOUT_POLY if _IS_POLY(root) else LAYOUT_LEGACY
+
+
+def is_empty_results(root) -> bool:
+    """Whether a listing page is the site's "no results" page rather than a block page."""
+    return _NO_RESULTS(root)
+
+
+def find_cards(root) -> list:
+    cards = _CARDS(root)
+    if not cards:
+        cards = _FALLBACK_CARDS(root)
+    return cards
+
+
+def _first(values: list) -> Optional[str]:
+    return str(values[0]) if values else None
+
+
+def _has_marker(values: list) -> bool:
+    return any(not isinstance(value, str) or value.strip() for value in values)
+
+
+def extract_card(
+    card,
+    extractors: Dict[str, etree.XPath],
+    urljoin: Callable[[str], str],
+    site: Site,
+) -> ListingItem:
+    link = _first(extractors["link"](card))
+    permalink = urljoin(link) if link else None
+    ml_item_id = site.item_id(link) if link else None
+
+    name = _first(extractors["name"](card))
+    name = name.strip() if name else None
+
+    seller = "".join(extractors["seller"](card)).strip() or None
+    if seller and seller.lower().startswith("por "):
+        seller = seller[4:].strip()
+
+    fraction = _first(extractors["fraction"](card))
+    price_cents = site.price_cents(fraction, _first(extractors["cents"](card))) if fraction else None
+
+    is_ad = _has_marker(extractors["ad_markers"](card)) or bool(extractors["promoted_label"](card))
+
+    return ListingItem(ml_item_id, name, seller, price_cents, permalink, is_ad)
+
+
+def parse_listing(
+    root, urljoin: Callable[[str], str], site: Optional[Site] = None
+) -> tuple[str, List[ListingItem]]:
+    """Return ``(layout, items)`` for a listing page's lxml root on ``site`` (default MLA)."""
+    site = site or get_site()
+    layout = detect_layout(root)
+    extractors = EXTRACTORS[layout]
+    return layout, [extract_card(card, extractors, urljoin, site) for card in find_cards(root)]
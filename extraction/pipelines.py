@@ -0,0 +1,204 @@
+# Define your item pipelines here
+#
+# See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+from twisted.internet.defer import succeed
+from twisted.internet.threads import deferToThread
+
+from alert_sinks import deliver_pending_at, load_sinks
+from config_utils import load_search_query
+from extraction.items import ItemDetails, ListingItem
+from storage.alerts import count_pending
+from storage.database import DB_PATH, connect, ensure_schema, write_batch, write_details
+from storage.parquet_store import PartitionedWriter
+from transforms.data_transformation import normalize_record
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(item, adapter, scraped_at: str, default_query: str) -> dict:
+    """Spider ``ListingItem``s build their row directly; other items go through ``normalize_record``."""
+    if adapter is None:
+        return item.to_record(scraped_at, default_query)
+    return normalize_record(adapter, scraped_at, default_query)
+
+
+class SQLiteBatchPipeline:
+    """Normalize items as they are scraped and flush them to SQLite in batches.
+
+    Replaces the feed -> ``transform_data`` round trip: memory stays bounded
+    by the batch size and rows reach the database while the crawl runs.
+    ``ItemDetails`` from the enrichment stage are buffered apart and written
+    after the listings of the same flush.
+
+    Price alerts go to the configured sinks in a worker thread, one delivery
+    at a time: after any flush while alerts are pending, and once more when
+    the spider closes.
+    """
+
+    def __init__(self, db_path: Path | str = DB_PATH, batch_size: int = 200):
+        self.db_path = Path(db_path)
+        self.batch_size = max(1, batch_size)
+        self.connection = None
+        self.buffer = []
+        self.details_buffer = []
+        self.seen_ids = set()
+        self.alert_sinks = []
+        self.alerts_pending = False
+        self.delivery = None
+        self.stats = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(
+            db_path=crawler.settings.get("SQLITE_DB_PATH") or DB_PATH,
+            batch_size=crawler.settings.getint("SQLITE_BATCH_SIZE", 200),
+        )
+        pipeline.stats = crawler.stats
+        return pipeline
+
+    def open_spider(self, spider):
+        self.connection = connect(self.db_path)
+        ensure_schema(self.connection)
+        self.scraped_at = datetime.now(timezone.utc).isoformat()
+        self.default_query = load_search_query()
+        self.alert_sinks = load_sinks()
+        # Alerts left over from an earlier run whose delivery failed.
+        self.alerts_pending = bool(self.alert_sinks) and count_pending(self.connection) > 0
+
+    def close_spider(self, spider):
+        self.flush()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if not self.alert_sinks:
+            return None
+        # Let a delivery in flight finish, then send whatever is still pending.
+        finished = self.delivery if self.delivery is not None else succeed(None)
+        finished.addCallback(lambda _: deferToThread(deliver_pending_at, self.db_path, self.alert_sinks))
+        finished.addCallbacks(self._delivered, self._delivery_failed)
+        return finished
+
+    def deliver_alerts(self):
+        """Start delivering pending alerts in a thread unless a delivery is already running."""
+        if self.delivery is not None or not self.alert_sinks:
+            return
+        self.delivery = deferToThread(deliver_pending_at, self.db_path, self.alert_sinks)
+        self.delivery.addCallbacks(self._delivered, self._delivery_failed)
+
+    def _delivered(self, still_pending):
+        self.delivery = None
+        self.alerts_pending = still_pending > 0
+        if self.stats is not None:
+            self.stats.set_value("sqlite/alerts_pending", still_pending)
+
+    def _delivery_failed(self, failure):
+        self.delivery = None
+        self.alerts_pending = True
+        logger.warning("Alert delivery failed: %s", failure.getErrorMessage())
+
+    def process_item(self, item, spider):
+        if isinstance(item, ItemDetails):
+            self.details_buffer.append(dict(item))
+            if len(self.details_buffer) >= self.batch_size:
+                self.flush()
+            return item
+
+        adapter = None if isinstance(item, ListingItem) else ItemAdapter(item)
+        ml_item_id = item.ml_item_id if adapter is None else adapter.get("ml_item_id")
+        if ml_item_id:
+            if ml_item_id in self.seen_ids:
+                # Already stored in this run; the item still reaches any feed.
+                if self.stats is not None:
+                    self.stats.inc_value("sqlite/duplicates")
+                return item
+            self.seen_ids.add(ml_item_id)
+
+        self.buffer.append(_normalize(item, adapter, self.scraped_at, self.default_query))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        return item
+
+    def flush(self):
+        if self.connection is None:
+            return
+        if self.buffer:
+            counts = write_batch(self.connection, self.buffer)
+            self.buffer = []
+            self.alerts_pending = self.alerts_pending or counts["alerts"] > 0
+            if self.alerts_pending:
+                self.deliver_alerts()
+            if self.stats is not None:
+                for key, value in counts.items():
+                    self.stats.inc_value(f"sqlite/{key}", value)
+        if self.details_buffer:
+            # After the listings, so the category lands on rows that already exist.
+            count = write_details(self.connection, self.details_buffer)
+            self.details_buffer = []
+            if self.stats is not None:
+                self.stats.inc_value("sqlite/details", count)
+
+
+class ParquetPipeline:
+    """Append every run to the partitioned Parquet store (``storage.parquet_store``).
+
+    Enabled by the ``PARQUET_STORE_DIR`` setting; items are normalized like
+    the SQLite pipeline and written as one row group per batch.
+    """
+
+    def __init__(self, root: Path | str, batch_size: int = 1000):
+        self.root = Path(root)
+        self.batch_size = max(1, batch_size)
+        self.writer = None
+        self.buffer = []
+        self.seen_ids = set()
+        self.stats = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        root = crawler.settings.get("PARQUET_STORE_DIR")
+        if not root:
+            raise NotConfigured("PARQUET_STORE_DIR is not set")
+        pipeline = cls(root, batch_size=crawler.settings.getint("PARQUET_BATCH_SIZE", 1000))
+        pipeline.stats = crawler.stats
+        return pipeline
+
+    def open_spider(self, spider):
+        self.writer = PartitionedWriter(self.root)
+        self.scraped_at = datetime.now(timezone.utc).isoformat()
+        self.default_query = load_search_query()
+
+    def close_spider(self, spider):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def process_item(self, item, spider):
+        if isinstance(item, ItemDetails):
+            return item
+        adapter = None if isinstance(item, ListingItem) else ItemAdapter(item)
+        ml_item_id = item.ml_item_id if adapter is None else adapter.get("ml_item_id")
+        if ml_item_id:
+            if ml_item_id in self.seen_ids:
+                return item
+            self.seen_ids.add(ml_item_id)
+
+        self.buffer.append(_normalize(item, adapter, self.scraped_at, self.default_query))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        return item
+
+    def flush(self):
+        if not self.buffer or self.writer is None:
+            return
+        self.writer.write(self.buffer)
+        if self.stats is not None:
+            self.stats.inc_value("parquet/rows", len(self.buffer))
+        self.buffer = []
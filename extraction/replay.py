@@ -0,0 +1,187 @@
+"""Record listing responses to a compressed archive and replay them offline.
+
+Record mode (``RECORD_ARCHIVE`` setting) stores every successful HTML response
+in a zip archive. Replay mode swaps the HTTP(S) download handlers for
+``ReplayDownloadHandler``, which serves responses from that archive with a
+configurable fake latency. Replay runs as a download handler rather than as a
+``process_request`` middleware so requests still go through the downloader
+slots, and concurrency, ``DOWNLOAD_DELAY`` and AutoThrottle behave as they do
+against the real site.
+"""
+import hashlib
+import json
+import random
+import threading
+import zipfile
+from pathlib import Path
+from time import time
+from typing import Dict, Iterator, Optional, Tuple
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse, Response
+from scrapy.responsetypes import responsetypes
+from twisted.internet.task import deferLater
+from w3lib.url import canonicalize_url
+
+
+def archive_key(url: str) -> str:
+    return hashlib.sha1(canonicalize_url(url).encode("utf-8")).hexdigest()
+
+
+class ResponseArchive:
+    """Zip archive holding ``<key>.json`` metadata and ``<key>.body`` entries."""
+
+    def __init__(self, path: Path | str, mode: str = "r") -> None:
+        self.path = Path(path)
+        if mode != "r":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._zip = zipfile.ZipFile(self.path, mode, compression=zipfile.ZIP_DEFLATED, compresslevel=9)
+        self._names = set(self._zip.namelist())
+        self._lock = threading.Lock()
+
+    def __contains__(self, url: str) -> bool:
+        return f"{archive_key(url)}.json" in self._names
+
+    def __len__(self) -> int:
+        return sum(1 for name in self._names if name.endswith(".json"))
+
+    def add(self, url: str, status: int, headers: Dict[str, str], body: bytes, **extra) -> bool:
+        key = archive_key(url)
+        if f"{key}.json" in self._names:
+            return False
+        meta = {"url": url, "status": status, "headers": headers, **extra}
+        with self._lock:
+            self._zip.writestr(f"{key}.json", json.dumps(meta, ensure_ascii=False))
+            self._zip.writestr(f"{key}.body", body)
+            self._names.update((f"{key}.json", f"{key}.body"))
+        return True
+
+    def get(self, url: str) -> Optional[Tuple[dict, bytes]]:
+        key = archive_key(url)
+        if f"{key}.json" not in self._names:
+            return None
+        with self._lock:
+            meta = json.loads(self._zip.read(f"{key}.json"))
+            body = self._zip.read(f"{key}.body")
+        return meta, body
+
+    def entries(self) -> Iterator[dict]:
+        for name in sorted(self._names):
+            if name.endswith(".json"):
+                yield json.loads(self._zip.read(name))
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+class RecordResponsesMiddleware:
+    """Downloader middleware that archives HTML responses when ``RECORD_ARCHIVE`` is set."""
+
+    def __init__(self, archive_path: Path | str) -> None:
+        self.archive_path = Path(archive_path)
+        self.archive: Optional[ResponseArchive] = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        archive_path = crawler.settings.get("RECORD_ARCHIVE")
+        if not archive_path:
+            raise NotConfigured
+        middleware = cls(archive_path)
+        middleware.stats = crawler.stats
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        self.archive = ResponseArchive(self.archive_path, mode="a")
+
+    def spider_closed(self, spider):
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+    def process_response(self, request, response, spider):
+        if self.archive is not None and response.status == 200 and isinstance(response, HtmlResponse):
+            headers = {
+                key.decode("latin-1"): value.decode("latin-1")
+                for key, value in response.headers.items()
+                if key.lower() == b"content-type"
+            }
+            if self.archive.add(
+                response.url,
+                response.status,
+                headers,
+                response.body,
+                search_query=request.meta.get("search_query"),
+            ):
+                self.stats.inc_value("replay/recorded")
+        return response
+
+
+class ReplayDownloadHandler:
+    """Serve every request from a ``ResponseArchive``; never touches the network."""
+
+    lazy = False
+
+    def __init__(self, archive_path: Path | str, latency: float = 0.0, jitter: float = 0.0, stats=None) -> None:
+        self.archive = ResponseArchive(archive_path)
+        self.latency = max(0.0, latency)
+        self.jitter = max(0.0, jitter)
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        archive_path = crawler.settings.get("REPLAY_ARCHIVE")
+        if not archive_path:
+            raise NotConfigured("REPLAY_ARCHIVE is not set")
+        return cls(
+            archive_path,
+            latency=crawler.settings.getfloat("REPLAY_LATENCY", 0.0),
+            jitter=crawler.settings.getfloat("REPLAY_LATENCY_JITTER", 0.0),
+            stats=crawler.stats,
+        )
+
+    def download_request(self, request, spider):
+        from twisted.internet import reactor
+
+        delay = self.latency
+        if self.jitter:
+            delay = max(0.0, random.uniform(delay - self.jitter, delay + self.jitter))
+        start_time = time()
+        return deferLater(reactor, delay, self._build_response, request, start_time)
+
+    def _build_response(self, request, start_time: float) -> Response:
+        request.meta["download_latency"] = time() - start_time
+        entry = self.archive.get(request.url)
+        if entry is None:
+            if self.stats is not None:
+                self.stats.inc_value("replay/missing")
+            return Response(request.url, status=404, request=request)
+
+        meta, body = entry
+        headers = meta.get("headers", {})
+        response_cls = responsetypes.from_args(headers=headers, url=meta["url"], body=body)
+        if self.stats is not None:
+            self.stats.inc_value("replay/served")
+        return response_cls(
+            url=meta["url"],
+            status=meta.get("status", 200),
+            headers=headers,
+            body=body,
+            request=request,
+        )
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+def replay_settings(archive_path: Path | str, latency: float = 0.0, jitter: float = 0.0) -> dict:
+    """Settings overrides that make a crawl run entirely from ``archive_path``."""
+    handler = "extraction.replay.ReplayDownloadHandler"
+    return {
+        "REPLAY_ARCHIVE": str(archive_path),
+        "REPLAY_LATENCY": latency,
+        "REPLAY_LATENCY_JITTER": jitter,
+        "DOWNLOAD_HANDLERS": {"http": handler, "https": handler},
+    }
@@ -21,7 +21,9 @@ USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36
 ROBOTSTXT_OBEY = False
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-#CONCURRENT_REQUESTS = 32
+# Each tracked query gets its own download slot (see DOWNLOAD_SLOTS in
+# MercadoLivreSpider.run_spider), so this is the budget shared by all of them.
+CONCURRENT_REQUESTS = 32
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
@@ -50,25 +52,45 @@ DEFAULT_REQUEST_HEADERS = {
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "coleta.middlewares.ColetaDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "extraction.replay.RecordResponsesMiddleware": 950,
+    "extraction.throttle.AdaptiveConcurrency": 970,
+    "extraction.distributed.SharedRateLimitMiddleware": 980,
+    "extraction.distributed.DistributedAckMiddleware": 990,
+}
+
+# Record listing responses into a compressed archive (extraction/replay.py).
+# Set it to a path such as "data/listings.zip" to enable record mode.
+RECORD_ARCHIVE = None
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+    "extraction.instrumentation.CrawlMetrics": 510,
+}
+
+# Crawl metrics (extraction/instrumentation.py): Prometheus text file
+# crawl.prom and a JSON summary per run under METRICS_DIR (None means
+# data/metrics).
+METRICS_ENABLED = True
+METRICS_DIR = None
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "coleta.pipelines.ColetaPipeline": 300,
-#}
-
-# Enable and configure the AutoThrottle extension (disabled by default)
+ITEM_PIPELINES = {
+    "extraction.pipelines.SQLiteBatchPipeline": 300,
+    "extraction.pipelines.ParquetPipeline": 310,
+}
+# Number of normalized items written to data/database.db per transaction
+SQLITE_BATCH_SIZE = 200
+# Root of the partitioned Parquet history; None disables ParquetPipeline
+# (run_spider sets it when "parquet" is enabled in config.json)
+PARQUET_STORE_DIR = None
+PARQUET_BATCH_SIZE = 1000
+
+# AutoThrottle is replaced by the adaptive concurrency controller below.
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-AUTOTHROTTLE_ENABLED = True
+AUTOTHROTTLE_ENABLED = False
 # The initial download delay
 AUTOTHROTTLE_START_DELAY = 0.5
 # The maximum download delay to be set in case of high latencies
@@ -79,8 +101,53 @@ AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
+# Adaptive per-domain concurrency (extraction/throttle.py). Each domain's
+# budget caps its requests in flight across all download slots; it starts at
+# "start", grows by one every ADAPTIVE_CONCURRENCY_WINDOW responses while
+# latency stays under "target_latency" (seconds), and is halved when more
+# than ADAPTIVE_CONCURRENCY_BLOCK_THRESHOLD of the window were 429/403
+# responses, captcha redirects or empty listing pages that do not say the
+# search has no results.
+ADAPTIVE_CONCURRENCY_ENABLED = True
+ADAPTIVE_CONCURRENCY_DOMAINS = {
+    "listado.mercadolibre.com.ar": {"start": 4, "min": 1, "max": 24, "target_latency": 1.5},
+    "api.mercadolibre.com": {"start": 4, "min": 1, "max": 16, "target_latency": 1.0},
+}
+ADAPTIVE_CONCURRENCY_WINDOW = 20
+ADAPTIVE_CONCURRENCY_BLOCK_THRESHOLD = 0.05
+ADAPTIVE_CONCURRENCY_MAX_DELAY = 10
+#ADAPTIVE_CONCURRENCY_DEBUG = False
+
 DOWNLOAD_DELAY = 0.25
 
+# Item details enrichment (extraction/spiders/mercadolivre.py): new or
+# changed listings not enriched in the last ENRICH_MAX_AGE_DAYS are looked up
+# ENRICH_BATCH_SIZE ids at a time (at most 20) in the items API. The calls
+# share one download slot capped at ENRICH_CONCURRENCY and run at
+# ENRICH_PRIORITY, below listing pages, so they only use spare capacity.
+# run_spider enables it when "enrich" is set in config.json.
+ENRICH_ENABLED = False
+ENRICH_BATCH_SIZE = 20
+ENRICH_CONCURRENCY = 2
+ENRICH_PRIORITY = -10
+ENRICH_MAX_AGE_DAYS = 7
+
+# Distributed crawl mode (extraction/distributed.py). Workers started with
+# "python -m extraction.distributed worker" share the request queue at
+# DISTRIBUTED_QUEUE_PATH (None outside that mode) and, together, send at most
+# DISTRIBUTED_DOMAIN_RATES requests per second to each listed domain.
+DISTRIBUTED_QUEUE_BACKEND = "extraction.distributed.SQLiteRequestQueue"
+DISTRIBUTED_QUEUE_PATH = None
+DISTRIBUTED_DOMAIN_RATES = {
+    "listado.mercadolibre.com.ar": 4.0,
+}
+# Seconds a worker waits on an empty queue before closing, and seconds
+# before a request claimed by a dead worker is handed out again.
+DISTRIBUTED_IDLE_TIMEOUT = 15
+DISTRIBUTED_LEASE = 300
+# Claims a request may time out before it is marked failed instead of requeued.
+DISTRIBUTED_MAX_ATTEMPTS = 3
+
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
 #HTTPCACHE_ENABLED = True
@@ -0,0 +1,8 @@
+# Custom signals sent by the mercadolivre spider.
+
+# Sent after a listing page has been parsed, with ``response`` and
+# ``item_count`` arguments, plus ``parse_seconds``, ``layout``, ``site`` and
+# ``empty_results`` for receivers that accept them. A page without items
+# usually means we were served a block or captcha page instead of results,
+# unless ``empty_results`` is set: the page said the search has no results.
+listing_page_parsed = object()
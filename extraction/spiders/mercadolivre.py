@@ -1,108 +1,297 @@
+import math
 import re
+import time
 from pathlib import Path
+from urllib.parse import urlparse
 
 import scrapy
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
 
-from config_utils import load_max_pages, load_search_query
+from config_utils import (
+    OUTPUT_JSON,
+    OUTPUT_JSONL,
+    PAGINATION_MODES,
+    PAGINATION_OFFSET,
+    SearchQuery,
+    load_enrich,
+    load_feed_compression,
+    load_pagination_mode,
+    load_parquet_export,
+    load_search_queries,
+    load_stop_early,
+)
+from extraction.feeds import feed_path, feed_settings
+from extraction.items import ItemDetails, register_adapters
+from extraction.parsers import is_empty_results, parse_listing
+from extraction.signals import listing_page_parsed
+from services.api_client import API_BASE
+from services.item_details import batches, details_from_payload, items_url
+from sites import DEFAULT_SITE, get_site
+from storage.parquet_store import PARQUET_DIR
+from storage.seen_index import SeenIndex, content_hash, recently_enriched
 
 DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+ENRICH_SLOT = "enrich"
+QUERY_META_KEYS = ("search_query", "site", "source_url", "max_pages", "page", "fanned_out", "download_slot")
+RESULTS_PER_PAGE = 50
+RESULT_TOTAL_SELECTOR = (
+    "span.ui-search-search-result__quantity-results::text, "
+    "[data-testid='search-results-quantity']::text"
+)
+
+
+def query_download_slot(query: str, site: str = DEFAULT_SITE) -> str:
+    return f"query:{site}:{query}"
+
+
+def listing_page_url(query: str, page: int, site: str = DEFAULT_SITE) -> str:
+    base_url = get_site(site).listing_base_url
+    if page <= 1:
+        return f"{base_url}/{query}"
+    offset = (page - 1) * RESULTS_PER_PAGE + 1
+    return f"{base_url}/{query}_Desde_{offset}_NoIndex_True"
+
+
+def parse_result_total(text: str | None) -> int | None:
+    if not text:
+        return None
+    digits = re.sub(r"\D", "", text)
+    return int(digits) if digits else None
+
+
+def query_download_slots(queries: list[SearchQuery]) -> dict[str, dict[str, int]]:
+    return {
+        query_download_slot(search.query, search.site): {"concurrency": search.concurrency}
+        for search in queries
+    }
+
+
+def site_throttle_settings(queries: list[SearchQuery], settings) -> dict:
+    """Add each crawled site's throttling profile and shared rate limit to ``settings``."""
+    sites = [get_site(site_id) for site_id in sorted({search.site for search in queries})]
+    return {
+        "ADAPTIVE_CONCURRENCY_DOMAINS": {
+            **settings.get("ADAPTIVE_CONCURRENCY_DOMAINS", {}),
+            **{site.listing_host: dict(site.throttle) for site in sites},
+        },
+        "DISTRIBUTED_DOMAIN_RATES": {
+            **settings.get("DISTRIBUTED_DOMAIN_RATES", {}),
+            **{site.listing_host: site.rate_limit for site in sites},
+        },
+    }
+
+
+def crawl_settings(
+    queries: list[SearchQuery],
+    output: str | None = None,
+    parquet: bool | None = None,
+    enrich: bool | None = None,
+) -> dict:
+    """Project settings for a crawl of ``queries``, with their download slots and outputs."""
+    parquet = load_parquet_export() if parquet is None else parquet
+    enrich = load_enrich() if enrich is None else enrich
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    project_settings = get_project_settings()
+    settings = {
+        **project_settings,
+        **site_throttle_settings(queries, project_settings),
+        "DOWNLOAD_SLOTS": {
+            **query_download_slots(queries),
+            ENRICH_SLOT: {"concurrency": project_settings.getint("ENRICH_CONCURRENCY", 2)},
+        },
+        "ENRICH_ENABLED": enrich,
+    }
+    if output in (OUTPUT_JSON, OUTPUT_JSONL):
+        # Batch mode: write the raw feed and let transform_data load it afterwards.
+        # Details need the SQLite pipeline, so enrichment stays off.
+        compression = load_feed_compression()
+        settings["ITEM_PIPELINES"] = {}
+        settings["ENRICH_ENABLED"] = False
+        settings["FEEDS"] = feed_settings(feed_path(DATA_DIR, output, compression), output, compression)
+    elif parquet:
+        settings["PARQUET_STORE_DIR"] = str(PARQUET_DIR)
+    return settings
+
 
 class MercadoLivreSpider(scrapy.Spider):
     name = "mercadolivre"
     allowed_domains = ["listado.mercadolibre.com.ar", "www.mercadolibre.com.ar"]
 
-    page_count = 1
-
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self,
+        *args,
+        queries: list[SearchQuery] | None = None,
+        pagination: str | None = None,
+        stop_early: bool | None = None,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
-        search_query = load_search_query()
-        self.start_urls = [f"https://listado.mercadolibre.com.ar/{search_query}"]
-        self.max_pages = load_max_pages()
-        self.page_count = 1
+        self.queries = list(queries) if queries else load_search_queries()
+        self.allowed_domains = sorted(
+            {domain for search in self.queries for domain in get_site(search.site).allowed_domains}
+        )
+        self.pagination = pagination if pagination in PAGINATION_MODES else load_pagination_mode()
+        self.stop_early = load_stop_early() if stop_early is None else stop_early
+        self.seen_index = SeenIndex(DATA_DIR / "database.db").load() if self.stop_early else None
+        self.enrich = False
+        self.enriched = set()
+        self.enrich_batch_size = 20
+        self.enrich_priority = -10
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # Feed exporters wrap every ListingItem in an ItemAdapter.
+        register_adapters()
+        settings = crawler.settings
+        if settings.getbool("ENRICH_ENABLED"):
+            spider.enrich = True
+            spider.enrich_batch_size = settings.getint("ENRICH_BATCH_SIZE", 20)
+            spider.enrich_priority = settings.getint("ENRICH_PRIORITY", -10)
+            # Listings enriched recently, or already queued in this run, are not looked up again.
+            spider.enriched = recently_enriched(DATA_DIR / "database.db", settings.getfloat("ENRICH_MAX_AGE_DAYS", 7))
+            if spider.seen_index is None:
+                spider.seen_index = SeenIndex(DATA_DIR / "database.db").load()
+            spider.allowed_domains = sorted({*spider.allowed_domains, urlparse(API_BASE).hostname})
+        return spider
+
+    def start_requests(self):
+        for search in self.queries:
+            url = listing_page_url(search.query, 1, search.site)
+            yield scrapy.Request(
+                url,
+                callback=self.parse,
+                meta={
+                    "search_query": search.query,
+                    "site": search.site,
+                    "source_url": url,
+                    "max_pages": search.max_pages,
+                    "page": 1,
+                    "download_slot": query_download_slot(search.query, search.site),
+                },
+            )
+
+    @staticmethod
+    def _query_meta(response, **overrides):
+        meta = {key: response.meta[key] for key in QUERY_META_KEYS if key in response.meta}
+        meta.update(overrides)
+        return meta
 
     def parse(self, response):
-        products = response.css("li.ui-search-layout__item")
-        if not products:
-            products = response.css("div.ui-search-result__wrapper, [data-testid='item']")
-
-        for product in products:
-            link = product.css(
-                "a.ui-search-item__group__element::attr(href), "
-                "a.ui-search-link::attr(href), "
-                "a.poly-component__link::attr(href), "
-                "a::attr(href)"
-            ).get()
-            permalink = response.urljoin(link) if link else None
-            ml_item_id = None
-            if link:
-                match = re.search(r"/MLA-?(\d+)", link)
-                if match:
-                    ml_item_id = f"MLA{match.group(1)}"
-
-            name = product.css(
-                "h2.ui-search-item__title::text, "
-                "h2.ui-search-item__title span::text, "
-                "a.poly-component__title::text, "
-                "[data-testid='item-title']::text"
-            ).get()
-            name = name.strip() if name else None
-
-            seller_texts = product.css(
-                "[data-testid='seller-info'] ::text, "
-                "span.poly-component__seller::text, "
-                "span.ui-search-official-store-label__text::text"
-            ).getall()
-            seller = "".join(seller_texts).strip() if seller_texts else None
-            if seller and seller.lower().startswith("por "):
-                seller = seller[4:].strip()
-
-            fraction = product.css("span.andes-money-amount__fraction::text").get()
-            cents = product.css("span.andes-money-amount__cents::text").get()
-            price_value = None
-            if fraction:
-                cents_value = cents.strip() if cents else "00"
-                cents_value = cents_value.zfill(2)
-                price_value = f"{fraction},{cents_value}"
-
-            ad_markers = product.css(
-                "[data-testid*='advertising'], "
-                "[aria-label*='Promocionado' i], "
-                "[data-testid*='sponsored'], "
-                "[data-testid='listing-type-highlight']::text, "
-                "[data-testid='listing-highlight-label']::text, "
-                ".ui-search-item__ad-badge::text"
-            ).getall()
-            ad_texts = [marker.strip() for marker in ad_markers if marker and marker.strip()]
-            is_ad = bool(ad_texts)
-
-            yield {
-                "ml_item_id": ml_item_id,
-                "name": name,
-                "seller": seller,
-                "price": price_value,
-                "permalink": permalink,
-                "is_ad": is_ad,
-            }
-
-        if self.page_count < self.max_pages:
-            next_page = response.css("a[rel='next']::attr(href), a[title='Siguiente']::attr(href)").get()
-            if next_page:
-                self.page_count += 1
-                yield response.follow(next_page, callback=self.parse)
-
-
-    def run_spider():
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        process = CrawlerProcess(settings={
-            **get_project_settings(),
-            "FEEDS": {
-                str(DATA_DIR / "data.json"): {
-                    "format": "json",
-                    "overwrite": True,
-                }
-            }
-        })
-        process.crawl(MercadoLivreSpider)
+        search_query = response.meta["search_query"]
+        source_url = response.meta["source_url"]
+        site = get_site(response.meta.get("site"))
+        new_items = 0
+        to_enrich = []
+        parse_start = time.perf_counter()
+        layout, items = parse_listing(response.selector.root, response.urljoin, site)
+        parse_seconds = time.perf_counter() - parse_start
+        self.crawler.stats.inc_value(f"mercadolivre/layout/{layout}")
+        empty_results = not items and is_empty_results(response.selector.root)
+        if empty_results:
+            self.crawler.stats.inc_value("mercadolivre/empty_results")
+        self.crawler.signals.send_catch_log(
+            listing_page_parsed,
+            response=response,
+            item_count=len(items),
+            parse_seconds=parse_seconds,
+            layout=layout,
+            site=site.site_id,
+            empty_results=empty_results,
+            spider=self,
+        )
+
+        for item in items:
+            if self.seen_index is not None:
+                digest = content_hash({
+                    "name": item.name,
+                    "seller": item.seller,
+                    "price": item.price or 0.0,
+                    "is_ad": int(item.is_ad),
+                })
+                is_new = self.seen_index.is_new_or_changed(item.ml_item_id, digest)
+                new_items += is_new
+                if self.enrich and is_new and item.ml_item_id and item.ml_item_id not in self.enriched:
+                    self.enriched.add(item.ml_item_id)
+                    to_enrich.append(item.ml_item_id)
+
+            item._search_query = search_query
+            item._site = site.site_id
+            item._source = source_url
+            yield item
+
+        yield from self._enrich_requests(to_enrich)
+
+        page = response.meta["page"]
+        if page >= response.meta["max_pages"] or response.meta.get("fanned_out"):
+            return
+        if self.stop_early and items and not new_items:
+            self.logger.info("Stopping %s at page %d: nothing new", response.meta["search_query"], page)
+            self.crawler.stats.inc_value("mercadolivre/stopped_early")
+            return
+
+        if self.pagination == PAGINATION_OFFSET and page == 1:
+            requests = list(self._fan_out_pages(response))
+            if requests:
+                yield from requests
+                return
+
+        next_page = response.css("a[rel='next']::attr(href), a[title='Siguiente']::attr(href)").get()
+        if next_page:
+            yield response.follow(
+                next_page,
+                callback=self.parse,
+                meta=self._query_meta(response, page=page + 1),
+            )
+
+    def _enrich_requests(self, item_ids):
+        """Items API lookups for ``item_ids``, below listing pages in priority and in their own slot."""
+        for batch in batches(item_ids, self.enrich_batch_size):
+            self.crawler.stats.inc_value("mercadolivre/enrich/requested", len(batch))
+            yield scrapy.Request(
+                items_url(batch),
+                callback=self.parse_details,
+                priority=self.enrich_priority,
+                meta={"download_slot": ENRICH_SLOT},
+            )
+
+    def parse_details(self, response):
+        details = details_from_payload(response.json())
+        self.crawler.stats.inc_value("mercadolivre/enrich/received", len(details))
+        for detail in details:
+            yield ItemDetails(**detail)
+
+    def _fan_out_pages(self, response):
+        """Schedule every remaining page of a query at once from the result total."""
+        total = parse_result_total(response.css(RESULT_TOTAL_SELECTOR).get())
+        if not total:
+            return
+        last_page = min(response.meta["max_pages"], math.ceil(total / RESULTS_PER_PAGE))
+        search_query = response.meta["search_query"]
+        site = response.meta.get("site", DEFAULT_SITE)
+        for page in range(2, last_page + 1):
+            yield scrapy.Request(
+                listing_page_url(search_query, page, site),
+                callback=self.parse,
+                meta=self._query_meta(response, page=page, fanned_out=True),
+            )
+
+
+    def run_spider(
+        queries: list[SearchQuery] | None = None,
+        pagination: str | None = None,
+        stop_early: bool | None = None,
+        output: str | None = None,
+        parquet: bool | None = None,
+        enrich: bool | None = None,
+    ):
+        queries = queries or load_search_queries()
+        process = CrawlerProcess(settings=crawl_settings(queries, output=output, parquet=parquet, enrich=enrich))
+        process.crawl(
+            MercadoLivreSpider,
+            queries=queries,
+            pagination=pagination,
+            stop_early=stop_early,
+        )
         process.start()
@@ -0,0 +1,228 @@
+"""Adaptive per-domain concurrency controller.
+
+Replaces AutoThrottle's fixed ``AUTOTHROTTLE_TARGET_CONCURRENCY``: each
+configured domain gets a concurrency budget that grows additively while
+latency stays under target and nothing looks blocked, and is halved (with a
+longer download delay) when 429/403 responses, captcha redirects or listing
+pages without results markup show up.
+
+The budget caps the requests in flight to the domain as a whole: it runs as
+a downloader middleware that counts the domain's requests between
+``process_request`` and their response or exception, and holds new ones back
+in arrival order once the budget is reached. The per-query downloader slots
+keep their own ``DOWNLOAD_SLOTS`` concurrency on top of that, and all of them
+get the domain's delay.
+"""
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Set, Tuple
+
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet.defer import Deferred
+
+from extraction.signals import listing_page_parsed
+
+logger = logging.getLogger(__name__)
+
+BLOCK_STATUSES = frozenset([403, 429])
+CAPTCHA_URL_MARKERS = ("captcha", "account-verification", "/gz/")
+# Request meta key set while a request holds one of its domain's in-flight places.
+IN_FLIGHT_META_KEY = "_adaptive_concurrency_domain"
+
+
+@dataclass
+class DomainState:
+    domain: str
+    concurrency: float
+    min_concurrency: int
+    max_concurrency: int
+    target_latency: float
+    delay: float
+    latency: float = 0.0
+    responses: int = 0
+    blocked: int = 0
+    active: int = 0
+    slots: Set[str] = field(default_factory=set)
+    waiting: Deque[Tuple[Deferred, object]] = field(default_factory=deque)
+
+    @property
+    def budget(self) -> int:
+        return max(self.min_concurrency, int(self.concurrency))
+
+
+class AdaptiveConcurrency:
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_CONCURRENCY_ENABLED"):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.debug = settings.getbool("ADAPTIVE_CONCURRENCY_DEBUG")
+        self.window = max(1, settings.getint("ADAPTIVE_CONCURRENCY_WINDOW", 20))
+        self.block_threshold = settings.getfloat("ADAPTIVE_CONCURRENCY_BLOCK_THRESHOLD", 0.05)
+        self.min_delay = settings.getfloat("DOWNLOAD_DELAY")
+        self.max_delay = settings.getfloat("ADAPTIVE_CONCURRENCY_MAX_DELAY", 10.0)
+        self.slot_caps = {
+            key: slot_settings["concurrency"]
+            for key, slot_settings in settings.getdict("DOWNLOAD_SLOTS").items()
+            if "concurrency" in slot_settings
+        }
+
+        self.domains: Dict[str, DomainState] = {}
+        for domain, profile in settings.getdict("ADAPTIVE_CONCURRENCY_DOMAINS").items():
+            self.domains[domain] = DomainState(
+                domain=domain,
+                concurrency=float(profile.get("start", 2)),
+                min_concurrency=int(profile.get("min", 1)),
+                max_concurrency=int(profile.get("max", 8)),
+                target_latency=float(profile.get("target_latency", 1.0)),
+                delay=self.min_delay,
+            )
+        if not self.domains:
+            raise NotConfigured("ADAPTIVE_CONCURRENCY_DOMAINS is empty")
+
+        crawler.signals.connect(self._spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self._spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(self._request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(self._response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(self._listing_page_parsed, signal=listing_page_parsed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _spider_opened(self, spider):
+        for state in self.domains.values():
+            self._publish(state)
+
+    def _spider_closed(self, spider):
+        for state in self.domains.values():
+            while state.waiting:
+                deferred, request = state.waiting.popleft()
+                deferred.errback(IgnoreRequest(f"Spider closed while waiting for {state.domain}"))
+
+    def _state_for(self, request):
+        return self.domains.get(urlparse_cached(request).hostname or "")
+
+    def process_request(self, request, spider):
+        """Let ``request`` through if its domain is under budget, else hold it back."""
+        state = self._state_for(request)
+        if state is None:
+            return None
+        if not state.waiting and state.active < state.budget:
+            self._acquire(state, request)
+            return None
+        deferred = Deferred()
+        state.waiting.append((deferred, request))
+        self.stats.inc_value(f"adaptive_concurrency/{state.domain}/held")
+        return deferred
+
+    def process_response(self, request, response, spider):
+        self._release(request)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._release(request)
+        return None
+
+    def _acquire(self, state: DomainState, request) -> None:
+        state.active += 1
+        request.meta[IN_FLIGHT_META_KEY] = state.domain
+
+    def _release(self, request) -> None:
+        state = self.domains.get(request.meta.pop(IN_FLIGHT_META_KEY, None))
+        if state is None:
+            return
+        state.active -= 1
+        self._drain(state)
+
+    def _drain(self, state: DomainState) -> None:
+        while state.waiting and state.active < state.budget:
+            deferred, request = state.waiting.popleft()
+            self._acquire(state, request)
+            deferred.callback(None)
+
+    def _request_reached_downloader(self, request, spider):
+        state = self._state_for(request)
+        if state is None:
+            return
+        slot_key = request.meta.get("download_slot")
+        if slot_key and slot_key not in state.slots:
+            state.slots.add(slot_key)
+        self._apply(state)
+
+    def _response_downloaded(self, response, request, spider):
+        state = self._state_for(request)
+        if state is None:
+            return
+
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            state.latency = latency if not state.responses else 0.8 * state.latency + 0.2 * latency
+        state.responses += 1
+        if response.status in BLOCK_STATUSES or any(marker in response.url for marker in CAPTCHA_URL_MARKERS):
+            self._record_block(state, spider)
+        elif state.responses >= self.window:
+            self._adjust(state, spider)
+
+    def _listing_page_parsed(self, response, item_count, spider, empty_results=False):
+        # A page saying the search has no results is legitimate; an empty page without it is not.
+        state = self._state_for(response.request) if response.request else None
+        if state is not None and not item_count and not empty_results:
+            self._record_block(state, spider)
+
+    def _record_block(self, state: DomainState, spider) -> None:
+        state.blocked += 1
+        self.stats.inc_value(f"adaptive_concurrency/{state.domain}/blocked")
+        # Do not wait for the window to fill up when we are clearly being blocked.
+        if state.responses >= self.window or state.blocked >= 3:
+            self._adjust(state, spider)
+
+    def _adjust(self, state: DomainState, spider) -> None:
+        block_rate = state.blocked / max(1, state.responses)
+        if block_rate > self.block_threshold:
+            state.concurrency = max(state.min_concurrency, state.concurrency / 2)
+            state.delay = min(self.max_delay, max(state.delay * 2, 1.0))
+            self.stats.inc_value(f"adaptive_concurrency/{state.domain}/backoffs")
+        elif state.latency > state.target_latency:
+            state.concurrency = max(state.min_concurrency, state.concurrency - 1)
+        else:
+            state.concurrency = min(state.max_concurrency, state.concurrency + 1)
+            state.delay = max(self.min_delay, state.delay / 2)
+
+        state.responses = 0
+        state.blocked = 0
+        self._apply(state)
+        self._drain(state)
+        self._publish(state)
+        if self.debug:
+            logger.info(
+                "%(domain)s | conc:%(concurrency)2d | delay:%(delay)5d ms | latency:%(latency)5d ms | block rate:%(rate).2f",
+                {
+                    "domain": state.domain,
+                    "concurrency": int(state.concurrency),
+                    "delay": state.delay * 1000,
+                    "latency": state.latency * 1000,
+                    "rate": block_rate,
+                },
+                extra={"spider": spider},
+            )
+
+    def _apply(self, state: DomainState) -> None:
+        """Cap each of the domain's slots at the budget and give them the domain delay."""
+        slots = self.crawler.engine.downloader.slots
+        for key in state.slots:
+            slot = slots.get(key)
+            if slot is not None:
+                slot.concurrency = min(self.slot_caps.get(key, state.budget), state.budget)
+                slot.delay = state.delay
+
+    def _publish(self, state: DomainState) -> None:
+        name = state.domain
+        self.stats.set_value(f"adaptive_concurrency/{name}/concurrency", state.budget)
+        self.stats.set_value(f"adaptive_concurrency/{name}/delay_ms", int(state.delay * 1000))
+        self.stats.set_value(f"adaptive_concurrency/{name}/latency_ms", int(state.latency * 1000))
@@ -0,0 +1,217 @@
+"""In-process counters and histograms for crawls, transforms and API calls.
+
+Metrics are recorded in a ``MetricsRegistry`` (``REGISTRY`` is the
+process-wide one) and exported as Prometheus text files under
+``data/metrics/`` (``<job>.prom``, readable by the node_exporter textfile
+collector) plus a JSON summary per run (``<job>-<timestamp>.json``, the
+latest ``SUMMARY_KEEP`` per job).
+Histograms use fixed buckets, so recording is a bisect and two additions.
+"""
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Optional, Sequence, Tuple
+
+METRICS_DIR = Path(__file__).resolve().parent / "data" / "metrics"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2e6, 5e6)
+COUNT_BUCKETS = (0, 1, 5, 10, 20, 30, 40, 48, 50, 60)
+# Run summaries kept per job; the scheduler writes one per crawl.
+SUMMARY_KEEP = 500
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Mapping[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(sorted(buckets))
+        # One count per bucket plus the +Inf overflow.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram") -> None:
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the ``fraction`` quantile (None past the last bucket)."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound != math.inf else None
+        return None
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.descriptions: Dict[str, str] = {}
+
+    def describe(self, name: str, text: str) -> None:
+        self.descriptions[name] = text
+
+    def inc(self, name: str, value: float = 1.0, **labels: object) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels: object) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: object) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def merge(self, other: "MetricsRegistry") -> None:
+        with self._lock:
+            for key, value in other.counters.items():
+                self.counters[key] = self.counters.get(key, 0.0) + value
+            for key, histogram in other.histograms.items():
+                target = self.histograms.get(key)
+                if target is None:
+                    target = self.histograms[key] = Histogram(histogram.buckets)
+                target.merge(histogram)
+            self.descriptions.update(other.descriptions)
+
+    def to_prometheus(self, prefix: str = "") -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(item for item in self.counters.items() if item[0][0].startswith(prefix))
+            histograms = sorted(
+                (item for item in self.histograms.items() if item[0][0].startswith(prefix)),
+                key=lambda item: item[0],
+            )
+            described = set()
+            for (name, labels), value in counters:
+                if name not in described:
+                    described.add(name)
+                    if name in self.descriptions:
+                        lines.append(f"# HELP {name} {self.descriptions[name]}")
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+            for (name, labels), histogram in histograms:
+                if name not in described:
+                    described.add(name)
+                    if name in self.descriptions:
+                        lines.append(f"# HELP {name} {self.descriptions[name]}")
+                    lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+                    cumulative += count
+                    bucket_labels = _format_labels(labels, ("le", _format_number(bound)))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, prefix: str = "") -> Dict[str, Dict[str, object]]:
+        """Counters and histogram count/sum/mean/p50/p90/p99, keyed ``name{labels}``."""
+        counters = {}
+        histograms = {}
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                if name.startswith(prefix):
+                    counters[f"{name}{_format_labels(labels)}"] = value
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                if not name.startswith(prefix):
+                    continue
+                histograms[f"{name}{_format_labels(labels)}"] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum / histogram.count if histogram.count else None,
+                    "p50": histogram.quantile(0.5),
+                    "p90": histogram.quantile(0.9),
+                    "p99": histogram.quantile(0.99),
+                }
+        return {"counters": counters, "histograms": histograms}
+
+
+REGISTRY = MetricsRegistry()
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temporary.write_text(text, encoding="utf-8")
+    os.replace(temporary, path)
+
+
+def write_prometheus(
+    job: str,
+    registry: MetricsRegistry = REGISTRY,
+    prefix: str = "",
+    directory: Path | str = METRICS_DIR,
+) -> Path:
+    path = Path(directory) / f"{job}.prom"
+    _write_atomic(path, registry.to_prometheus(prefix))
+    return path
+
+
+def write_run_summary(
+    job: str,
+    registry: MetricsRegistry = REGISTRY,
+    prefix: str = "",
+    extra: Optional[Mapping[str, object]] = None,
+    directory: Path | str = METRICS_DIR,
+    keep: int = SUMMARY_KEEP,
+) -> Path:
+    """Save a JSON summary of the run and delete all but the latest ``keep`` of ``job``."""
+    finished_at = datetime.now(timezone.utc)
+    summary = {"job": job, "finished_at": finished_at.isoformat(), **(extra or {}), **registry.summary(prefix)}
+    path = Path(directory) / f"{job}-{finished_at:%Y%m%d_%H%M%S}.json"
+    _write_atomic(path, json.dumps(summary, ensure_ascii=False, indent=2, default=str))
+    # The timestamps sort chronologically by name.
+    for old in sorted(Path(directory).glob(f"{job}-[0-9]*_[0-9]*.json"))[:-max(1, keep)]:
+        old.unlink(missing_ok=True)
+    return path
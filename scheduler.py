@@ -0,0 +1,188 @@
+"""Long-running crawl scheduler.
+
+Keeps every query in ``config.json`` (plus runs requested through
+``storage.jobs``, e.g. from ``search_ui.py``) fresh from one warm process:
+Scrapy and the Twisted reactor are imported once and each due job starts as a
+new crawler on a shared ``CrawlerRunner`` instead of a ``python crawl.py``
+subprocess. Jobs run most-stale first, at most ``--parallel`` at a time, and
+items go to SQLite through the item pipelines.
+
+Usage::
+
+    python scheduler.py run --parallel 2 --poll 15
+    python scheduler.py status
+    python scheduler.py request jarra-de-vidrio --max-pages 3
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Optional, Tuple
+
+from scrapy.crawler import Crawler, CrawlerRunner
+from scrapy.utils.log import configure_logging
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.reactor import install_reactor
+
+from config_utils import SearchQuery, format_search_query, load_search_queries
+from extraction.spiders.mercadolivre import MercadoLivreSpider, crawl_settings
+from sites import SITES, normalize_site
+from storage.jobs import JOBS_DB_PATH, Job, JobStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARALLEL = 2
+DEFAULT_POLL_INTERVAL_S = 15.0
+
+
+class CrawlScheduler:
+    """Start due jobs on ``runner`` and record their outcome in ``store``."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        runner: CrawlerRunner,
+        parallel: int = DEFAULT_PARALLEL,
+        parquet: Optional[bool] = None,
+    ) -> None:
+        self.store = store
+        self.runner = runner
+        self.parallel = max(1, parallel)
+        self.parquet = parquet
+        self.active: Dict[Tuple[str, str], Crawler] = {}
+
+    def sync_config(self) -> None:
+        """``config.json`` owns the schedule of the queries it lists."""
+        for search in load_search_queries():
+            self.store.upsert(
+                search.query,
+                search.interval_minutes * 60,
+                search.max_pages,
+                search.concurrency,
+                site=search.site,
+            )
+
+    def tick(self) -> None:
+        try:
+            self.store.heartbeat(os.getpid())
+            self.sync_config()
+            free = self.parallel - len(self.active)
+            if free > 0:
+                for job in self.store.due(limit=free):
+                    self.start(job)
+        except sqlite3.Error:
+            # The store may be locked by a client; try again on the next tick.
+            logger.exception("Scheduler tick failed")
+
+    def start(self, job: Job) -> None:
+        search = SearchQuery(job.query, job.max_pages, job.concurrency, site=job.site)
+        crawler = Crawler(MercadoLivreSpider, crawl_settings([search], parquet=self.parquet))
+        key = (job.site, job.query)
+        self.active[key] = crawler
+        self.store.mark_started(job.query, site=job.site)
+        logger.info("Starting %s on %s (%d pages)", job.query, job.site, job.max_pages)
+        deferred = self.runner.crawl(crawler, queries=[search])
+        deferred.addCallbacks(
+            lambda _: self._finished(key, crawler, None),
+            lambda failure: self._finished(key, crawler, failure.getErrorMessage()),
+        )
+
+    def _finished(self, key: Tuple[str, str], crawler: Crawler, error: Optional[str]) -> None:
+        self.active.pop(key, None)
+        site, query = key
+        items = 0
+        if crawler.stats is not None:
+            items = crawler.stats.get_value("item_scraped_count", 0)
+            reason = crawler.stats.get_value("finish_reason")
+            if error is None and reason not in (None, "finished"):
+                error = reason
+        self.store.mark_finished(query, items, error, site=site)
+        if error:
+            logger.warning("Crawl of %s failed: %s", query, error)
+        else:
+            logger.info("Finished %s: %d items", query, items)
+        # Hand the freed slot to the next due job without waiting for the poll.
+        self.tick()
+
+
+def run(parallel: int, poll_interval: float, db_path=JOBS_DB_PATH) -> None:
+    settings = get_project_settings()
+    install_reactor(settings["TWISTED_REACTOR"])
+    from twisted.internet import reactor
+    from twisted.internet.task import LoopingCall
+
+    configure_logging(settings)
+    store = JobStore(db_path)
+    store.reset_running()
+    runner = CrawlerRunner(settings)
+    scheduler = CrawlScheduler(store, runner, parallel=parallel)
+
+    loop = LoopingCall(scheduler.tick)
+    loop.start(poll_interval)
+    reactor.addSystemEventTrigger("before", "shutdown", runner.stop)
+    reactor.run()
+    store.close()
+
+
+def _format_duration(seconds: Optional[float]) -> str:
+    return f"{seconds:.1f}s" if seconds is not None else "—"
+
+
+def print_status(store: JobStore) -> None:
+    now = time.time()
+    state = "activo" if store.daemon_alive(now=now) else "detenido"
+    print(f"Programador: {state}")
+    for job in store.jobs():
+        staleness = job.staleness(now)
+        staleness_text = "ya" if staleness == float("inf") else f"{staleness:.2f}"
+        print(
+            f"{job.site:<4} {job.query:<30} {job.status:<8} antigüedad {staleness_text:>5}  "
+            f"última {_format_duration(job.last_duration_s):>8}  ítems {job.last_items or 0:>6}  "
+            f"ejecuciones {job.runs}"
+        )
+        if job.last_error:
+            print(f"{'':<35} error: {job.last_error}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Programador de rastreos recurrentes")
+    parser.add_argument("--db", default=JOBS_DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="ejecutar el programador")
+    run_parser.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL, help="rastreos simultáneos")
+    run_parser.add_argument("--poll", type=float, default=DEFAULT_POLL_INTERVAL_S, help="segundos entre revisiones")
+
+    commands.add_parser("status", help="estado de cada búsqueda")
+
+    request_parser = commands.add_parser("request", help="rastrear una búsqueda cuanto antes")
+    request_parser.add_argument("query")
+    request_parser.add_argument("--max-pages", type=int)
+    request_parser.add_argument("--site", choices=sorted(SITES))
+
+    remove_parser = commands.add_parser("remove", help="dejar de programar una búsqueda")
+    remove_parser.add_argument("query")
+    remove_parser.add_argument("--site", choices=sorted(SITES))
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args.parallel, args.poll, args.db)
+        return
+
+    store = JobStore(args.db)
+    try:
+        if args.command == "status":
+            print_status(store)
+        elif args.command == "request":
+            store.request_run(format_search_query(args.query), args.max_pages, site=normalize_site(args.site))
+        elif args.command == "remove" and not store.remove(
+            format_search_query(args.query), site=normalize_site(args.site)
+        ):
+            raise SystemExit(f"No hay una búsqueda programada llamada {args.query}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
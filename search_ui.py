@@ -4,6 +4,19 @@ import tkinter as tk
 from tkinter import messagebox
 
 from config_utils import load_max_pages, load_search_query, save_search_preferences
+from storage.jobs import JobStore
+
+
+def request_scheduled_run(query: str, max_pages: int) -> bool:
+    """Queue ``query`` on a running ``scheduler.py``; False when no daemon is up."""
+    store = JobStore()
+    try:
+        if not store.daemon_alive():
+            return False
+        store.request_run(query, max_pages)
+        return True
+    finally:
+        store.close()
 
 
 def main() -> None:
@@ -36,6 +49,13 @@ def main() -> None:
             return
         formatted, selected_pages = save_search_preferences(query, max_pages_var.get())
         max_pages_var.set(selected_pages)
+        if request_scheduled_run(formatted, selected_pages):
+            messagebox.showinfo(
+                "Búsqueda en cola",
+                "El programador rastreará la búsqueda en cuanto tenga un lugar libre."
+                " Consulta su estado con: python scheduler.py status",
+            )
+            return
         try:
             subprocess.run([sys.executable, "crawl.py"], check=True)
         except (FileNotFoundError, subprocess.CalledProcessError) as exc:
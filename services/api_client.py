@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
+
+import aiohttp
+
+from metrics import REGISTRY
+from services.cache import ResponseCache, cache_key
+
+API_BASE = os.environ.get("MERCADOLIBRE_API_BASE", "https://api.mercadolibre.com").rstrip("/")
+
+DEFAULT_MAX_CONCURRENCY = 10
+DEFAULT_RATE_PER_SEC = 20.0
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_TIMEOUT = 12.0
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+REQUEST_METRIC = "api_request_seconds"
+REGISTRY.describe(REQUEST_METRIC, "Duration of each API call attempt by endpoint and outcome.")
+
+T = TypeVar("T")
+
+
+class ApiError(Exception):
+    """El llamado no devolvió una respuesta válida tras agotar los reintentos."""
+
+    def __init__(self, url: str, status: Optional[int] = None, message: str = "") -> None:
+        super().__init__(f"{url}: {status or ''} {message}".strip())
+        self.url = url
+        self.status = status
+
+
+class TokenBucket:
+    """Limitador de tasa: ``rate`` llamados por segundo con ráfagas de hasta ``capacity``."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = max(rate, 0.001)
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class MercadoLibreClient:
+    """
+    Cliente asíncrono compartido para la API pública de Mercado Libre.
+
+    Reutiliza conexiones (pool de aiohttp), limita la concurrencia y la tasa de
+    llamados, y reintenta con backoff exponencial con jitter ante 429/5xx o
+    errores de red. ``base_url`` (o la variable de entorno
+    ``MERCADOLIBRE_API_BASE``) permite apuntarlo a un servidor local de prueba.
+    Con ``cache`` las respuestas de los llamados que indican ``cache_endpoint``
+    se guardan en disco y se revalidan por ETag al vencer.
+
+        async with MercadoLibreClient() as client:
+            data = await client.get_json("/categories/MLA1234/attributes")
+    """
+
+    def __init__(
+        self,
+        base_url: str = API_BASE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        rate_per_sec: float = DEFAULT_RATE_PER_SEC,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        timeout: float = DEFAULT_TIMEOUT,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+        cache: Optional[ResponseCache] = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_per_sec = rate_per_sec
+        self.max_retries = max(0, max_retries)
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.cache = cache
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket: Optional[TokenBucket] = None
+
+    async def __aenter__(self) -> "MercadoLibreClient":
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"Accept": "application/json"},
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._bucket = TokenBucket(self.rate_per_sec)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.flush)
+
+    def _url(self, path: str) -> str:
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(self.backoff_cap, float(retry_after))
+            except ValueError:
+                pass
+        # "Full jitter": espera aleatoria entre 0 y el tope exponencial.
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def get_json(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        cache_endpoint: Optional[str] = None,
+        refresh: bool = False,
+    ) -> Any:
+        if self._session is None or self._semaphore is None or self._bucket is None:
+            raise RuntimeError("MercadoLibreClient debe usarse con 'async with'")
+
+        cache = self.cache if cache_endpoint else None
+        key = cache_key(path, params)
+        entry = None
+        if cache is not None and not refresh:
+            # The cache is a blocking SQLite store: keep it off the event loop.
+            entry = await asyncio.to_thread(cache.get, cache_endpoint, key)
+            if entry is not None and entry.fresh:
+                cache.record(cache_endpoint, "hits")
+                return entry.body
+
+        headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else None
+        status, body, etag = await self._request(self._url(path), params, headers, cache_endpoint or "other")
+        if cache is None:
+            return body
+        if status == 304 and entry is not None:
+            cache.record(cache_endpoint, "revalidations")
+            await asyncio.to_thread(cache.refresh, cache_endpoint, key)
+            return entry.body
+        cache.record(cache_endpoint, "misses")
+        await asyncio.to_thread(cache.set, cache_endpoint, key, body, etag)
+        return body
+
+    async def _request(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        endpoint: str = "other",
+    ) -> tuple[int, Any, Optional[str]]:
+        last_status: Optional[int] = None
+        last_error = ""
+        for attempt in range(self.max_retries + 1):
+            await self._bucket.acquire()
+            retry_after = None
+            outcome = "error"
+            # Measured inside the semaphore: queueing for a slot is not call time.
+            async with self._semaphore:
+                start = time.perf_counter()
+                try:
+                    async with self._session.get(url, params=params, headers=headers) as resp:
+                        outcome = str(resp.status)
+                        if resp.status == 304:
+                            return resp.status, None, resp.headers.get("ETag")
+                        if resp.status < 400:
+                            return resp.status, await resp.json(content_type=None), resp.headers.get("ETag")
+                        last_status = resp.status
+                        retry_after = resp.headers.get("Retry-After")
+                        if resp.status not in RETRY_STATUSES:
+                            raise ApiError(url, resp.status)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                    last_error = repr(exc)
+                finally:
+                    REGISTRY.observe(REQUEST_METRIC, time.perf_counter() - start, endpoint=endpoint, outcome=outcome)
+            if attempt < self.max_retries:
+                REGISTRY.inc("api_retries_total", endpoint=endpoint)
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        raise ApiError(url, last_status, last_error)
+
+    async def map(
+        self,
+        func: Callable[[str], Awaitable[T]],
+        keys: Iterable[str],
+    ) -> Dict[str, T]:
+        """Ejecuta ``func`` para cada clave única en paralelo (acotado por el cliente)."""
+        unique = list(dict.fromkeys(key for key in keys if key))
+        results = await asyncio.gather(*(func(key) for key in unique))
+        return dict(zip(unique, results))
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Ejecuta una corrutina desde código sincrónico, haya o no un event loop activo."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # Ya hay un loop en este hilo (p. ej. el reactor asyncio de Scrapy).
+    result: List[Any] = []
+    error: List[BaseException] = []
+
+    def _target() -> None:
+        try:
+            result.append(asyncio.run(coro))
+        except BaseException as exc:  # pragma: no cover - re-raised below
+            error.append(exc)
+
+    thread = threading.Thread(target=_target)
+    thread.start()
+    thread.join()
+    if error:
+        raise error[0]
+    return result[0]
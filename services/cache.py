@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+CACHE_PATH = DATA_DIR / "api_cache.db"
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+DEFAULT_TTLS: Dict[str, float] = {
+    "category_attributes": 7 * DAY,
+    "domain_discovery": 1 * HOUR,
+    "items": 1 * DAY,
+}
+DEFAULT_TTL = 1 * HOUR
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS api_cache (
+    endpoint TEXT NOT NULL,
+    key TEXT NOT NULL,
+    body TEXT NOT NULL,
+    etag TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (endpoint, key)
+);
+CREATE INDEX IF NOT EXISTS idx_api_cache_last_access ON api_cache (last_access);
+-- Running total of api_cache.size, kept by the triggers below so eviction
+-- never has to SUM the whole table.
+CREATE TABLE IF NOT EXISTS api_cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO api_cache_size (id, total) SELECT 1, COALESCE(SUM(size), 0) FROM api_cache;
+CREATE TRIGGER IF NOT EXISTS api_cache_size_ai AFTER INSERT ON api_cache BEGIN
+    UPDATE api_cache_size SET total = total + new.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS api_cache_size_ad AFTER DELETE ON api_cache BEGIN
+    UPDATE api_cache_size SET total = total - old.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS api_cache_size_au AFTER UPDATE OF size ON api_cache BEGIN
+    UPDATE api_cache_size SET total = total + new.size - old.size WHERE id = 1;
+END;
+CREATE TABLE IF NOT EXISTS api_cache_stats (
+    endpoint TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    revalidations INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+@dataclass
+class CacheEntry:
+    body: Any
+    etag: Optional[str]
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > time.time()
+
+
+def cache_key(path: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    if not params:
+        return path
+    query = "&".join(f"{name}={params[name]}" for name in sorted(params))
+    return f"{path}?{query}"
+
+
+class ResponseCache:
+    """
+    Caché persistente en SQLite para respuestas de la API, compartida entre procesos.
+
+    Cada endpoint tiene su TTL; las entradas vencidas se conservan para poder
+    revalidarlas con ``If-None-Match`` (ETag). Cuando el tamaño total supera
+    ``max_bytes`` se descartan las entradas usadas hace más tiempo (LRU). Los
+    contadores de aciertos/fallos se acumulan en memoria y se guardan en la
+    misma base junto con la próxima escritura (o con ``flush``).
+
+    Usa una sola conexión por instancia, protegida por un lock, así que se
+    puede llamar desde varios hilos (p. ej. con ``asyncio.to_thread`` desde el
+    cliente asíncrono).
+    """
+
+    def __init__(
+        self,
+        path: Path | str = CACHE_PATH,
+        ttls: Optional[Mapping[str, float]] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.path = Path(path)
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending_stats: Counter = Counter()
+        self._connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+    def ttl(self, endpoint: str) -> float:
+        return self.ttls.get(endpoint, DEFAULT_TTL)
+
+    def get(self, endpoint: str, key: str) -> Optional[CacheEntry]:
+        """Devuelve la entrada (vigente o vencida) o None si no existe."""
+        with self._lock:
+            connection = self._connection
+            row = connection.execute(
+                "SELECT body, etag, expires_at FROM api_cache WHERE endpoint = ? AND key = ?",
+                (endpoint, key),
+            ).fetchone()
+            if row is None:
+                return None
+            with connection:
+                connection.execute(
+                    "UPDATE api_cache SET last_access = ? WHERE endpoint = ? AND key = ?",
+                    (time.time(), endpoint, key),
+                )
+            return CacheEntry(body=json.loads(row[0]), etag=row[1], expires_at=row[2])
+
+    def set(self, endpoint: str, key: str, body: Any, etag: Optional[str] = None) -> None:
+        payload = json.dumps(body, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            connection = self._connection
+            with connection:
+                connection.execute(
+                    """
+                    INSERT INTO api_cache (endpoint, key, body, etag, stored_at, expires_at, last_access, size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(endpoint, key) DO UPDATE SET
+                        body = excluded.body,
+                        etag = excluded.etag,
+                        stored_at = excluded.stored_at,
+                        expires_at = excluded.expires_at,
+                        last_access = excluded.last_access,
+                        size = excluded.size
+                    """,
+                    (endpoint, key, payload, etag, now, now + self.ttl(endpoint), now, len(payload)),
+                )
+                self._evict(connection)
+                self._write_stats(connection)
+
+    def refresh(self, endpoint: str, key: str) -> None:
+        """Extiende el TTL de una entrada tras un 304 Not Modified."""
+        now = time.time()
+        with self._lock:
+            connection = self._connection
+            with connection:
+                connection.execute(
+                    "UPDATE api_cache SET expires_at = ?, last_access = ? WHERE endpoint = ? AND key = ?",
+                    (now + self.ttl(endpoint), now, endpoint, key),
+                )
+                self._write_stats(connection)
+
+    def invalidate(self, endpoint: str, key: Optional[str] = None) -> None:
+        with self._lock:
+            connection = self._connection
+            with connection:
+                if key is None:
+                    connection.execute("DELETE FROM api_cache WHERE endpoint = ?", (endpoint,))
+                else:
+                    connection.execute("DELETE FROM api_cache WHERE endpoint = ? AND key = ?", (endpoint, key))
+
+    def record(self, endpoint: str, outcome: str) -> None:
+        """Incrementa el contador ``outcome`` (hits, misses o revalidations), en memoria."""
+        if outcome not in ("hits", "misses", "revalidations"):
+            raise ValueError(f"Contador desconocido: {outcome}")
+        with self._lock:
+            self._pending_stats[endpoint, outcome] += 1
+
+    def flush(self) -> None:
+        """Guarda los contadores acumulados por ``record``."""
+        with self._lock:
+            if self._pending_stats:
+                with self._connection:
+                    self._write_stats(self._connection)
+
+    def _write_stats(self, connection: sqlite3.Connection) -> None:
+        for (endpoint, outcome), count in self._pending_stats.items():
+            connection.execute(
+                f"""
+                INSERT INTO api_cache_stats (endpoint, {outcome}) VALUES (?, ?)
+                ON CONFLICT(endpoint) DO UPDATE SET {outcome} = {outcome} + excluded.{outcome}
+                """,
+                (endpoint, count),
+            )
+        self._pending_stats.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT endpoint, hits, misses, revalidations FROM api_cache_stats ORDER BY endpoint"
+            ).fetchall()
+        return {
+            endpoint: {"hits": hits, "misses": misses, "revalidations": revalidations}
+            for endpoint, hits, misses, revalidations in rows
+        }
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        total = connection.execute("SELECT total FROM api_cache_size WHERE id = 1").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        rows = connection.execute("SELECT endpoint, key, size FROM api_cache ORDER BY last_access")
+        victims = []
+        for endpoint, key, size in rows:
+            if excess <= 0:
+                break
+            victims.append((endpoint, key))
+            excess -= size
+        connection.executemany("DELETE FROM api_cache WHERE endpoint = ? AND key = ?", victims)
+
+
+_default_cache: Optional[ResponseCache] = None
+
+
+def get_default_cache() -> ResponseCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
@@ -1,41 +1,79 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
-import time
+import warnings
+from typing import Any, Dict, List, Optional
 
-import requests
+from services.api_client import (
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_RATE_PER_SEC,
+    MercadoLibreClient,
+    run_sync,
+)
+from services.cache import get_default_cache
 
-API_BASE = "https://api.mercadolibre.com/categories"
+CACHE_ENDPOINT = "category_attributes"
 
 
-def fetch_category_attributes(category_id: str, timeout: int = 12) -> List[Dict[str, Any]]:
+async def fetch_category_attributes_async(client: MercadoLibreClient, category_id: str) -> List[Dict[str, Any]]:
     """
-    Devuelve la lista de atributos de una categoría. Si falla, retorna [].
+    Versión asíncrona de ``fetch_category_attributes`` sobre un cliente compartido.
+    Usa la caché del cliente si tiene una.
     """
     if not category_id:
         return []
-    url = f"{API_BASE}/{category_id}/attributes"
     try:
-        resp = requests.get(url, timeout=timeout)
-        resp.raise_for_status()
-        data = resp.json()
-        return data if isinstance(data, list) else []
+        data = await client.get_json(f"/categories/{category_id}/attributes", cache_endpoint=CACHE_ENDPOINT)
     except Exception:
         return []
+    return data if isinstance(data, list) else []
 
 
-def fetch_many_categories_attributes(category_ids: List[str], delay_sec: float = 0.25) -> Dict[str, List[Dict[str, Any]]]:
+def fetch_category_attributes(category_id: str, timeout: int = 12, use_cache: bool = True) -> List[Dict[str, Any]]:
+    """
+    Devuelve la lista de atributos de una categoría. Si falla, retorna [].
+    Con ``use_cache`` la respuesta se sirve desde la caché en disco mientras esté vigente.
     """
-    Llama en serie a /categories/{id}/attributes con un pequeño delay para no abusar.
+    if not category_id:
+        return []
+
+    async def _fetch() -> List[Dict[str, Any]]:
+        cache = get_default_cache() if use_cache else None
+        async with MercadoLibreClient(timeout=timeout, cache=cache) as client:
+            return await fetch_category_attributes_async(client, category_id)
+
+    return run_sync(_fetch())
+
+
+def fetch_many_categories_attributes(
+    category_ids: List[str],
+    delay_sec: Optional[float] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    rate_per_sec: float = DEFAULT_RATE_PER_SEC,
+    use_cache: bool = True,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Llama en paralelo a /categories/{id}/attributes con un único pool de conexiones,
+    concurrencia acotada y límite de tasa.
     Devuelve {category_id: [atributos...]} para los IDs válidos.
+
+    ``delay_sec`` (pausa entre llamados de la versión en serie) está obsoleto: se
+    acepta por compatibilidad y se traduce a ``rate_per_sec = 1 / delay_sec``.
     """
-    out: Dict[str, List[Dict[str, Any]]] = {}
-    seen = set()
-    for cid in category_ids:
-        if not cid or cid in seen:
-            continue
-        seen.add(cid)
-        out[cid] = fetch_category_attributes(cid)
-        if delay_sec and delay_sec > 0:
-            time.sleep(delay_sec)
-    return out
\ No newline at end of file
+    if delay_sec is not None:
+        warnings.warn(
+            "delay_sec is deprecated; use rate_per_sec instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        if delay_sec > 0:
+            rate_per_sec = 1 / delay_sec
+
+    async def _fetch_all() -> Dict[str, List[Dict[str, Any]]]:
+        cache = get_default_cache() if use_cache else None
+        async with MercadoLibreClient(max_concurrency=max_concurrency, rate_per_sec=rate_per_sec, cache=cache) as client:
+            return await client.map(
+                lambda cid: fetch_category_attributes_async(client, cid),
+                category_ids,
+            )
+
+    return run_sync(_fetch_all())
@@ -1,25 +1,92 @@
 from __future__ import annotations
 from typing import Any, Dict, List
-import requests
 
-DEFAULT_SITE = "MLA"
+from services.api_client import (
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_RATE_PER_SEC,
+    MercadoLibreClient,
+    run_sync,
+)
+from services.cache import get_default_cache
+from sites import DEFAULT_SITE
+CACHE_ENDPOINT = "domain_discovery"
 
-def fetch_domain_discovery(query: str, limit: int = 5, site: str = DEFAULT_SITE) -> List[Dict[str, Any]]:
+
+def _results(data: Any) -> List[Dict[str, Any]]:
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        return data["results"]
+    return []
+
+
+async def fetch_domain_discovery_async(
+    client: MercadoLibreClient,
+    query: str,
+    limit: int = 5,
+    site: str = DEFAULT_SITE,
+    refresh: bool = False,
+) -> List[Dict[str, Any]]:
     """
-    Devuelve el cuerpo crudo (lista de dicts) del endpoint de Domain Discovery.
-    Si falla, retorna [] sin romper la UI.
+    Versión asíncrona de ``fetch_domain_discovery`` sobre un cliente compartido.
+    Usa la caché del cliente si tiene una; ``refresh`` la saltea.
     """
     if not query:
         return []
-    url = f"https://api.mercadolibre.com/sites/{site}/domain_discovery/search"
     try:
-        resp = requests.get(url, params={"q": query, "limit": int(limit)}, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        if isinstance(data, list):
-            return data
-        if isinstance(data, dict) and isinstance(data.get("results"), list):
-            return data["results"]
-        return []
+        data = await client.get_json(
+            f"/sites/{site}/domain_discovery/search",
+            params={"q": query, "limit": int(limit)},
+            cache_endpoint=CACHE_ENDPOINT,
+            refresh=refresh,
+        )
     except Exception:
-        return []
\ No newline at end of file
+        return []
+    return _results(data)
+
+
+def fetch_domain_discovery(
+    query: str,
+    limit: int = 5,
+    site: str = DEFAULT_SITE,
+    refresh: bool = False,
+    use_cache: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Devuelve el cuerpo crudo (lista de dicts) del endpoint de Domain Discovery.
+    Si falla, retorna [] sin romper la UI.
+    La respuesta se guarda en la caché en disco; ``refresh`` fuerza un llamado nuevo.
+    """
+    if not query:
+        return []
+
+    async def _fetch() -> List[Dict[str, Any]]:
+        cache = get_default_cache() if use_cache else None
+        async with MercadoLibreClient(timeout=10, cache=cache) as client:
+            return await fetch_domain_discovery_async(client, query, limit, site, refresh)
+
+    return run_sync(_fetch())
+
+
+def fetch_many_domain_discoveries(
+    queries: List[str],
+    limit: int = 5,
+    site: str = DEFAULT_SITE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    rate_per_sec: float = DEFAULT_RATE_PER_SEC,
+    use_cache: bool = True,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Domain Discovery para varias búsquedas en paralelo, con un único pool de conexiones.
+    Devuelve {query: [resultados...]}.
+    """
+
+    async def _fetch_all() -> Dict[str, List[Dict[str, Any]]]:
+        cache = get_default_cache() if use_cache else None
+        async with MercadoLibreClient(max_concurrency=max_concurrency, rate_per_sec=rate_per_sec, cache=cache) as client:
+            return await client.map(
+                lambda query: fetch_domain_discovery_async(client, query, limit, site),
+                queries,
+            )
+
+    return run_sync(_fetch_all())
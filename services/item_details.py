@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlencode
+
+from services.api_client import API_BASE, MercadoLibreClient, run_sync
+
+# The multiget endpoint accepts at most 20 ids per call.
+MAX_IDS_PER_CALL = 20
+ITEM_ATTRIBUTES = ("id", "category_id", "sold_quantity", "condition", "shipping", "attributes")
+
+
+def items_path(item_ids: Iterable[str]) -> str:
+    """Ruta de ``/items`` (multiget) para hasta ``MAX_IDS_PER_CALL`` publicaciones."""
+    query = urlencode({"ids": ",".join(item_ids), "attributes": ",".join(ITEM_ATTRIBUTES)})
+    return f"/items?{query}"
+
+
+def items_url(item_ids: Iterable[str], base_url: str = API_BASE) -> str:
+    return f"{base_url.rstrip('/')}{items_path(item_ids)}"
+
+
+def batches(item_ids: Iterable[str], size: int = MAX_IDS_PER_CALL) -> List[List[str]]:
+    unique = list(dict.fromkeys(item_id for item_id in item_ids if item_id))
+    size = max(1, min(size, MAX_IDS_PER_CALL))
+    return [unique[start:start + size] for start in range(0, len(unique), size)]
+
+
+def _attributes(body: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    attributes = body.get("attributes")
+    if not isinstance(attributes, list):
+        return {}
+    return {
+        str(attribute.get("id")): attribute.get("value_name")
+        for attribute in attributes
+        if isinstance(attribute, dict) and attribute.get("id")
+    }
+
+
+def details_from_payload(payload: Any) -> List[Dict[str, Any]]:
+    """
+    Convierte la respuesta del multiget (``[{"code": 200, "body": {...}}, ...]``)
+    en registros planos; se ignoran las publicaciones que no devolvieron 200.
+    """
+    if not isinstance(payload, list):
+        return []
+    details = []
+    for entry in payload:
+        if not isinstance(entry, dict) or entry.get("code") != 200 or not isinstance(entry.get("body"), dict):
+            continue
+        body = entry["body"]
+        shipping = body.get("shipping") if isinstance(body.get("shipping"), dict) else {}
+        details.append({
+            "ml_item_id": body.get("id"),
+            "category_id": body.get("category_id"),
+            "sold_quantity": body.get("sold_quantity"),
+            "condition": body.get("condition"),
+            "free_shipping": shipping.get("free_shipping"),
+            "logistic_type": shipping.get("logistic_type"),
+            "attributes": json.dumps(_attributes(body), ensure_ascii=False),
+        })
+    return [detail for detail in details if detail["ml_item_id"]]
+
+
+async def fetch_item_details_async(client: MercadoLibreClient, item_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Detalles de varias publicaciones en llamados de hasta 20 ids, en paralelo
+    dentro de los límites del cliente. Un lote que falla se omite.
+    """
+
+    async def _fetch(path: str) -> List[Dict[str, Any]]:
+        try:
+            return details_from_payload(await client.get_json(path))
+        except Exception:
+            return []
+
+    results = await client.map(_fetch, [items_path(batch) for batch in batches(item_ids)])
+    return [detail for details in results.values() for detail in details]
+
+
+def fetch_item_details(item_ids: List[str], max_concurrency: int = 2) -> List[Dict[str, Any]]:
+    """Versión sincrónica de ``fetch_item_details_async`` con su propio cliente."""
+    if not item_ids:
+        return []
+
+    async def _fetch() -> List[Dict[str, Any]]:
+        async with MercadoLibreClient(max_concurrency=max_concurrency) as client:
+            return await fetch_item_details_async(client, item_ids)
+
+    return run_sync(_fetch())
@@ -0,0 +1,80 @@
+"""Mercado Libre sites the crawler knows how to read.
+
+Each site has its own listing host, item id prefix, number format, currency
+and throttling profile. ``DEFAULT_SITE`` (Argentina) is used for queries and
+stored rows that do not name a site.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+DEFAULT_SITE = "MLA"
+
+
+@dataclass(frozen=True)
+class Site:
+    site_id: str
+    listing_host: str
+    domain: str
+    currency: str
+    thousands_separator: str = "."
+    decimal_separator: str = ","
+    # Requests per second to the listing host, summed over distributed workers.
+    rate_limit: float = 4.0
+    # Adaptive concurrency profile for the listing host (extraction/throttle.py).
+    throttle: Dict[str, float] = field(
+        default_factory=lambda: {"start": 4, "min": 1, "max": 24, "target_latency": 1.5}
+    )
+
+    @property
+    def listing_base_url(self) -> str:
+        return f"https://{self.listing_host}"
+
+    @property
+    def allowed_domains(self) -> list:
+        return [self.listing_host, f"www.{self.domain}"]
+
+    def item_id(self, link: str) -> Optional[str]:
+        match = _ITEM_ID_RES[self.site_id].search(link)
+        return f"{self.site_id}{match.group(1)}" if match else None
+
+    def price_cents(self, fraction: str, cents: Optional[str]) -> Optional[int]:
+        """Price in integer cents from the site's formatted parts (None if unreadable).
+
+        Card prices come split into an integer part with the site's thousands
+        separator and a separate cents element.
+        """
+        digits = fraction.strip().replace(self.thousands_separator, "")
+        cents_value = cents.strip() if cents else "00"
+        if not digits.isdigit() or not cents_value.isdigit():
+            return None
+        return int(digits) * 100 + int(cents_value.zfill(2)[:2])
+
+
+SITES: Dict[str, Site] = {
+    site.site_id: site
+    for site in (
+        Site("MLA", "listado.mercadolibre.com.ar", "mercadolibre.com.ar", "ARS"),
+        Site("MLB", "lista.mercadolivre.com.br", "mercadolivre.com.br", "BRL"),
+        Site("MLM", "listado.mercadolibre.com.mx", "mercadolibre.com.mx", "MXN", ",", "."),
+        Site("MLC", "listado.mercadolibre.cl", "mercadolibre.cl", "CLP", rate_limit=2.0),
+        Site("MCO", "listado.mercadolibre.com.co", "mercadolibre.com.co", "COP", rate_limit=2.0),
+        Site("MLU", "listado.mercadolibre.com.uy", "mercadolibre.com.uy", "UYU", rate_limit=2.0),
+        Site("MPE", "listado.mercadolibre.com.pe", "mercadolibre.com.pe", "PEN", ",", ".", rate_limit=2.0),
+    )
+}
+
+_ITEM_ID_RES = {site_id: re.compile(rf"/{site_id}-?(\d+)") for site_id in SITES}
+
+
+def normalize_site(value: object) -> str:
+    if isinstance(value, str) and value.strip().upper() in SITES:
+        return value.strip().upper()
+    return DEFAULT_SITE
+
+
+def get_site(site_id: object = DEFAULT_SITE) -> Site:
+    # Ids are nearly always canonical already; only normalize the rest.
+    site = SITES.get(site_id) if isinstance(site_id, str) else None
+    return site if site is not None else SITES[normalize_site(site_id)]
+
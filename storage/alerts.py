@@ -0,0 +1,298 @@
+"""Price drop and outlier alerts, detected as observations are written.
+
+Two rolling baselines are kept, both exponentially weighted so each
+observation updates them in O(1) without reading history:
+
+- per listing, the EWMA of its price: a new price at least
+  ``DROP_THRESHOLD`` below it (and below the previous price) is a
+  ``price_drop``;
+- per site and search query, the EW mean and variance of the log price: a
+  price more than ``OUTLIER_Z`` deviations away, once the query has
+  ``MIN_QUERY_OBSERVATIONS``, is a ``low_outlier`` or ``high_outlier``.
+
+Alerts are compared against the baselines as they were before the
+observation, stored in ``price_alerts`` in the same transaction, and handed
+to the configured sinks (``alert_sinks.py``) afterwards. Each sink that
+accepted an alert gets a row in ``price_alert_deliveries``, so a retry only
+goes to the sinks that failed; ``delivered_at`` stays empty until every
+sink accepted it.
+"""
+import math
+import sqlite3
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+ITEM_BASELINES_TABLE = "item_price_baselines"
+QUERY_BASELINES_TABLE = "query_price_baselines"
+ALERTS_TABLE = "price_alerts"
+DELIVERIES_TABLE = "price_alert_deliveries"
+
+PRICE_DROP = "price_drop"
+LOW_OUTLIER = "low_outlier"
+HIGH_OUTLIER = "high_outlier"
+
+# Weight of the newest observation: ~3 changes for a listing, ~50 listings for a query.
+ITEM_ALPHA = 0.3
+QUERY_ALPHA = 0.02
+DROP_THRESHOLD = 0.10
+OUTLIER_Z = 3.0
+MIN_QUERY_OBSERVATIONS = 30
+
+_LOOKUP_CHUNK = 500
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {ITEM_BASELINES_TABLE} (
+    ml_item_id TEXT PRIMARY KEY,
+    ewma REAL NOT NULL,
+    last_price REAL NOT NULL,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS {QUERY_BASELINES_TABLE} (
+    _site TEXT NOT NULL,
+    _search_query TEXT NOT NULL,
+    log_mean REAL NOT NULL,
+    log_var REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (_site, _search_query)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS {ALERTS_TABLE} (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    ml_item_id TEXT NOT NULL,
+    _site TEXT,
+    _search_query TEXT,
+    name TEXT,
+    permalink TEXT,
+    price REAL NOT NULL,
+    baseline REAL NOT NULL,
+    change REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    delivered_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_pending ON {ALERTS_TABLE} (id) WHERE delivered_at IS NULL;
+CREATE TABLE IF NOT EXISTS {DELIVERIES_TABLE} (
+    alert_id INTEGER NOT NULL,
+    sink TEXT NOT NULL,
+    sent_at TEXT NOT NULL,
+    PRIMARY KEY (alert_id, sink)
+) WITHOUT ROWID;
+"""
+
+ALERT_COLUMNS = (
+    "kind",
+    "ml_item_id",
+    "_site",
+    "_search_query",
+    "name",
+    "permalink",
+    "price",
+    "baseline",
+    "change",
+    "created_at",
+)
+
+_INSERT_ALERT = f"""
+INSERT INTO {ALERTS_TABLE} ({", ".join(ALERT_COLUMNS)})
+VALUES ({", ".join("?" for _ in ALERT_COLUMNS)})
+"""
+_UPSERT_ITEM_BASELINE = f"""
+INSERT OR REPLACE INTO {ITEM_BASELINES_TABLE} (ml_item_id, ewma, last_price, count) VALUES (?, ?, ?, ?)
+"""
+_UPSERT_QUERY_BASELINE = f"""
+INSERT OR REPLACE INTO {QUERY_BASELINES_TABLE} (_site, _search_query, log_mean, log_var, count)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+
+@dataclass
+class ItemBaseline:
+    ewma: float
+    last_price: float
+    count: int = 1
+
+    def update(self, price: float) -> None:
+        self.ewma += ITEM_ALPHA * (price - self.ewma)
+        self.last_price = price
+        self.count += 1
+
+
+@dataclass
+class QueryBaseline:
+    log_mean: float = 0.0
+    log_var: float = 0.0
+    count: int = 0
+
+    def z_score(self, log_price: float) -> Optional[float]:
+        if self.count < MIN_QUERY_OBSERVATIONS or self.log_var <= 0:
+            return None
+        return (log_price - self.log_mean) / math.sqrt(self.log_var)
+
+    def update(self, log_price: float) -> None:
+        # Plain running mean/variance until the exponential window fills up.
+        alpha = max(QUERY_ALPHA, 1 / (self.count + 1))
+        diff = log_price - self.log_mean
+        increment = alpha * diff
+        self.log_mean += increment
+        self.log_var = (1 - alpha) * (self.log_var + diff * increment)
+        self.count += 1
+
+
+def _price(record: Mapping[str, object]) -> Optional[float]:
+    price = record.get("price")
+    if price is None:
+        return None
+    price = float(price)
+    return price if price > 0 and not math.isnan(price) else None
+
+
+def _query_key(record: Mapping[str, object]) -> Tuple[str, str]:
+    ml_item_id = str(record.get("ml_item_id") or "")
+    return str(record.get("_site") or ml_item_id[:3]), str(record.get("_search_query") or "")
+
+
+def _load_item_baselines(connection: sqlite3.Connection, item_ids: List[str]) -> Dict[str, ItemBaseline]:
+    baselines = {}
+    for start in range(0, len(item_ids), _LOOKUP_CHUNK):
+        chunk = item_ids[start:start + _LOOKUP_CHUNK]
+        rows = connection.execute(
+            f"SELECT ml_item_id, ewma, last_price, count FROM {ITEM_BASELINES_TABLE} "
+            f"WHERE ml_item_id IN ({', '.join('?' for _ in chunk)})",
+            chunk,
+        )
+        baselines.update((ml_item_id, ItemBaseline(*values)) for ml_item_id, *values in rows)
+    return baselines
+
+
+def _load_query_baselines(
+    connection: sqlite3.Connection, keys: Iterable[Tuple[str, str]]
+) -> Dict[Tuple[str, str], QueryBaseline]:
+    baselines = {}
+    for key in keys:
+        row = connection.execute(
+            f"SELECT log_mean, log_var, count FROM {QUERY_BASELINES_TABLE} WHERE _site = ? AND _search_query = ?",
+            key,
+        ).fetchone()
+        baselines[key] = QueryBaseline(*row) if row else QueryBaseline()
+    return baselines
+
+
+def _alert(kind: str, record: Mapping[str, object], price: float, baseline: float) -> Dict[str, object]:
+    site, query = _query_key(record)
+    return {
+        "kind": kind,
+        "ml_item_id": record.get("ml_item_id"),
+        "_site": site,
+        "_search_query": query,
+        "name": record.get("name"),
+        "permalink": record.get("permalink"),
+        "price": price,
+        "baseline": baseline,
+        "change": price / baseline - 1 if baseline else 0.0,
+        "created_at": str(record.get("_scraped_at") or ""),
+    }
+
+
+def update_baselines(
+    connection: sqlite3.Connection, records: Iterable[Mapping[str, object]], emit: bool = True
+) -> List[Dict[str, object]]:
+    """Fold price observations into the baselines and store the alerts they raise.
+
+    ``records`` are normalized listings with ``_scraped_at`` set, in
+    observation order. Must run inside the caller's transaction. With
+    ``emit=False`` the baselines are only updated (used to seed them).
+    """
+    observations = []
+    for record in records:
+        price = _price(record)
+        if price is not None and record.get("ml_item_id"):
+            observations.append((record, price))
+    if not observations:
+        return []
+    items = _load_item_baselines(connection, list({str(record["ml_item_id"]) for record, _ in observations}))
+    queries = _load_query_baselines(connection, {_query_key(record) for record, _ in observations})
+
+    alerts: List[Dict[str, object]] = []
+    for record, price in observations:
+        ml_item_id = str(record["ml_item_id"])
+        query = queries[_query_key(record)]
+        log_price = math.log(price)
+        if emit:
+            item = items.get(ml_item_id)
+            if item is not None and price < item.last_price and price <= item.ewma * (1 - DROP_THRESHOLD):
+                alerts.append(_alert(PRICE_DROP, record, price, item.ewma))
+            z_score = query.z_score(log_price)
+            if z_score is not None and abs(z_score) >= OUTLIER_Z:
+                kind = LOW_OUTLIER if z_score < 0 else HIGH_OUTLIER
+                alerts.append(_alert(kind, record, price, math.exp(query.log_mean)))
+        if ml_item_id in items:
+            items[ml_item_id].update(price)
+        else:
+            items[ml_item_id] = ItemBaseline(ewma=price, last_price=price)
+        query.update(log_price)
+
+    connection.executemany(
+        _UPSERT_ITEM_BASELINE,
+        [(ml_item_id, item.ewma, item.last_price, item.count) for ml_item_id, item in items.items()],
+    )
+    connection.executemany(
+        _UPSERT_QUERY_BASELINE,
+        [(*key, query.log_mean, query.log_var, query.count) for key, query in queries.items()],
+    )
+    connection.executemany(_INSERT_ALERT, [[alert[column] for column in ALERT_COLUMNS] for alert in alerts])
+    return alerts
+
+
+def seed_baselines(connection: sqlite3.Connection, observations_table: str, chunk_size: int = 50000) -> int:
+    """Build the baselines from the stored price history without raising alerts."""
+    cursor = connection.execute(
+        f"SELECT ml_item_id, price, observed_at, _search_query FROM {observations_table} ORDER BY observed_at, id"
+    )
+    total = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return total
+        total += len(rows)
+        records = [
+            {"ml_item_id": ml_item_id, "price": price, "_scraped_at": observed_at, "_search_query": query}
+            for ml_item_id, price, observed_at, query in rows
+        ]
+        update_baselines(connection, records, emit=False)
+
+
+def pending_alerts(connection: sqlite3.Connection, sink: str, limit: int = 500) -> List[Dict[str, object]]:
+    """Undelivered alerts that ``sink`` has not accepted yet, oldest first."""
+    rows = connection.execute(
+        f"SELECT id, {', '.join(ALERT_COLUMNS)} FROM {ALERTS_TABLE} AS a "
+        f"WHERE delivered_at IS NULL AND NOT EXISTS ("
+        f"SELECT 1 FROM {DELIVERIES_TABLE} AS d WHERE d.alert_id = a.id AND d.sink = ?) "
+        f"ORDER BY id LIMIT ?",
+        (sink, limit),
+    )
+    return [dict(zip(("id", *ALERT_COLUMNS), row)) for row in rows]
+
+
+def count_pending(connection: sqlite3.Connection) -> int:
+    return connection.execute(f"SELECT COUNT(*) FROM {ALERTS_TABLE} WHERE delivered_at IS NULL").fetchone()[0]
+
+
+def mark_sent(connection: sqlite3.Connection, alert_ids: List[int], sink: str, sent_at: str) -> None:
+    with connection:
+        connection.executemany(
+            f"INSERT OR IGNORE INTO {DELIVERIES_TABLE} (alert_id, sink, sent_at) VALUES (?, ?, ?)",
+            [(alert_id, sink, sent_at) for alert_id in alert_ids],
+        )
+
+
+def mark_delivered(connection: sqlite3.Connection, sinks: List[str], delivered_at: str) -> int:
+    """Set ``delivered_at`` on pending alerts every one of ``sinks`` accepted; returns how many."""
+    if not sinks:
+        return 0
+    with connection:
+        cursor = connection.execute(
+            f"UPDATE {ALERTS_TABLE} SET delivered_at = ? WHERE delivered_at IS NULL AND ("
+            f"SELECT COUNT(*) FROM {DELIVERIES_TABLE} AS d "
+            f"WHERE d.alert_id = {ALERTS_TABLE}.id AND d.sink IN ({', '.join('?' for _ in sinks)})) = ?",
+            (delivered_at, *sinks, len(sinks)),
+        )
+    return cursor.rowcount
@@ -0,0 +1,338 @@
+import hashlib
+import math
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from storage import alerts, details, matching, rollups
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+DB_PATH = DATA_DIR / "database.db"
+
+ITEMS_TABLE = "mercadolivre_items"
+LEGACY_ITEMS_TABLE = "mercadolivre_items_legacy"
+OBSERVATIONS_TABLE = "price_observations"
+SEARCH_TABLE = "items_fts"
+
+ITEM_COLUMNS = (
+    "ml_item_id",
+    "name",
+    "seller",
+    "price",
+    "permalink",
+    "is_ad",
+    "_source",
+    "_search_query",
+    "_site",
+    "_scraped_at",
+    "scrap_date",
+)
+
+HASHED_FIELDS = ("name", "seller", "price", "is_ad")
+
+# SQLite caps the number of host parameters per statement.
+_LOOKUP_CHUNK = 500
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {ITEMS_TABLE} (
+    ml_item_id TEXT PRIMARY KEY,
+    name TEXT,
+    seller TEXT,
+    price REAL,
+    permalink TEXT,
+    is_ad INTEGER,
+    _source TEXT,
+    _search_query TEXT,
+    _site TEXT,
+    _scraped_at TEXT,
+    scrap_date TEXT,
+    first_seen_at TEXT,
+    content_hash TEXT,
+    category_id TEXT,
+    cluster_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_items_search_query ON {ITEMS_TABLE} (_search_query);
+CREATE INDEX IF NOT EXISTS idx_items_site ON {ITEMS_TABLE} (_site, _search_query);
+CREATE INDEX IF NOT EXISTS idx_items_cluster ON {ITEMS_TABLE} (cluster_id);
+
+CREATE TABLE IF NOT EXISTS {OBSERVATIONS_TABLE} (
+    id INTEGER PRIMARY KEY,
+    ml_item_id TEXT NOT NULL,
+    price REAL,
+    observed_at TEXT NOT NULL,
+    _search_query TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_observations_item_time ON {OBSERVATIONS_TABLE} (ml_item_id, observed_at);
+CREATE INDEX IF NOT EXISTS idx_observations_search_query ON {OBSERVATIONS_TABLE} (_search_query);
+"""
+
+# External-content FTS5 index over the items table, kept in sync by triggers.
+# remove_diacritics makes "termica" match "térmica".
+SEARCH_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    name, seller, _search_query,
+    content='{ITEMS_TABLE}', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON {ITEMS_TABLE} BEGIN
+    INSERT INTO {SEARCH_TABLE} (rowid, name, seller, _search_query)
+    VALUES (new.rowid, new.name, new.seller, new._search_query);
+END;
+CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON {ITEMS_TABLE} BEGIN
+    INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, name, seller, _search_query)
+    VALUES ('delete', old.rowid, old.name, old.seller, old._search_query);
+END;
+CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF name, seller, _search_query ON {ITEMS_TABLE} BEGIN
+    INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, name, seller, _search_query)
+    VALUES ('delete', old.rowid, old.name, old.seller, old._search_query);
+    INSERT INTO {SEARCH_TABLE} (rowid, name, seller, _search_query)
+    VALUES (new.rowid, new.name, new.seller, new._search_query);
+END;
+"""
+
+_UPSERT_ITEM = f"""
+INSERT INTO {ITEMS_TABLE} ({", ".join(ITEM_COLUMNS)}, first_seen_at, content_hash)
+VALUES ({", ".join("?" for _ in ITEM_COLUMNS)}, ?, ?)
+ON CONFLICT(ml_item_id) DO UPDATE SET
+    {", ".join(f"{column} = excluded.{column}" for column in ITEM_COLUMNS[1:] if column != "_search_query")},
+    _search_query = COALESCE({ITEMS_TABLE}._search_query, excluded._search_query),
+    content_hash = excluded.content_hash
+"""
+
+_INSERT_OBSERVATION = f"""
+INSERT INTO {OBSERVATIONS_TABLE} (ml_item_id, price, observed_at, _search_query)
+VALUES (?, ?, ?, ?)
+"""
+
+_TOUCH_ITEM = f"UPDATE {ITEMS_TABLE} SET _scraped_at = ?, scrap_date = ? WHERE ml_item_id = ?"
+
+_SET_CATEGORY = f"UPDATE {ITEMS_TABLE} SET category_id = ? WHERE ml_item_id = ?"
+
+_SET_CLUSTER = f"UPDATE {ITEMS_TABLE} SET cluster_id = ? WHERE ml_item_id = ?"
+
+# Columns filled after the listing is written, added to items tables that predate them.
+DERIVED_COLUMNS = ("category_id", "cluster_id")
+
+# Version of the tables derived from the stored listings (search index,
+# rollups, clusters, baselines), kept in PRAGMA user_version. Bump it and add
+# a step to _seed_derived_tables when they must be rebuilt.
+SCHEMA_VERSION = 2
+
+
+def _canonical(value: object) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ""
+        return f"{value:.2f}"
+    if isinstance(value, bool):
+        return str(int(value))
+    return str(value)
+
+
+def content_hash(record: Mapping[str, object]) -> str:
+    """Hash the listing fields that matter for change detection.
+
+    ``record`` must already be normalized (float price, integer ``is_ad``) so
+    the spider and the transform step agree on the digest.
+    """
+    payload = "\x1f".join(_canonical(record.get(field)) for field in HASHED_FIELDS)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def connect(db_path: Path | str = DB_PATH) -> sqlite3.Connection:
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(db_path), timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def _migrate_legacy_items(connection: sqlite3.Connection) -> None:
+    """Move a pre-normalization ``mercadolivre_items`` table out of the way."""
+    columns = {row[1]: row[5] for row in connection.execute(f"PRAGMA table_info({ITEMS_TABLE})")}
+    if not columns or columns.get("ml_item_id"):
+        return
+    legacy_name = LEGACY_ITEMS_TABLE
+    existing = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if legacy_name in existing:
+        legacy_name = f"{LEGACY_ITEMS_TABLE}_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}"
+    connection.execute(f"ALTER TABLE {ITEMS_TABLE} RENAME TO {legacy_name}")
+
+
+def _add_site_column(connection: sqlite3.Connection) -> None:
+    """Give items stored before multi-site support a ``_site`` taken from their id prefix."""
+    columns = {row[1] for row in connection.execute(f"PRAGMA table_info({ITEMS_TABLE})")}
+    if not columns or "_site" in columns:
+        return
+    connection.execute(f"ALTER TABLE {ITEMS_TABLE} ADD COLUMN _site TEXT")
+    connection.execute(f"UPDATE {ITEMS_TABLE} SET _site = substr(ml_item_id, 1, 3)")
+
+
+def _add_derived_columns(connection: sqlite3.Connection) -> None:
+    """Add the enrichment ``category_id`` and matching ``cluster_id`` to older items tables."""
+    columns = {row[1] for row in connection.execute(f"PRAGMA table_info({ITEMS_TABLE})")}
+    if not columns:
+        return
+    for column in DERIVED_COLUMNS:
+        if column not in columns:
+            connection.execute(f"ALTER TABLE {ITEMS_TABLE} ADD COLUMN {column} TEXT")
+
+
+def _is_empty(connection: sqlite3.Connection, table: str) -> bool:
+    return connection.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+
+
+def _seed_derived_tables(connection: sqlite3.Connection, version: int) -> None:
+    """Bring the derived tables from ``version`` up to ``SCHEMA_VERSION``.
+
+    Runs inside ensure_schema's transaction, so a failure leaves the version
+    unchanged and the seeding is retried on the next start.
+    """
+    if version < 1 and not _is_empty(connection, ITEMS_TABLE):
+        # Databases from before the version marker: fill whatever is still empty,
+        # including tables a failed seeding left behind.
+        connection.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+        if _is_empty(connection, matching.CLUSTERS_TABLE):
+            connection.execute(f"DELETE FROM {matching.BUCKETS_TABLE}")
+            matching.seed_clusters(connection, ITEMS_TABLE)
+        if _is_empty(connection, alerts.ITEM_BASELINES_TABLE):
+            connection.execute(f"DELETE FROM {alerts.QUERY_BASELINES_TABLE}")
+            alerts.seed_baselines(connection, OBSERVATIONS_TABLE)
+    if version < 2:
+        # Rollups are keyed by site since version 2.
+        if not rollups.migrate_legacy_rollups(connection, ITEMS_TABLE) and _is_empty(
+            connection, rollups.ROLLUPS_TABLE
+        ):
+            rollups.seed_rollups(connection, ITEMS_TABLE)
+
+
+def ensure_schema(connection: sqlite3.Connection) -> None:
+    """Create or migrate the tables, then seed derived tables in one transaction.
+
+    The DDL runs first (``executescript`` commits on its own); the seeding
+    and the ``user_version`` bump share an immediate transaction, so
+    concurrent processes seed once and a failure part-way rolls back.
+    """
+    with connection:
+        _migrate_legacy_items(connection)
+        _add_site_column(connection)
+        _add_derived_columns(connection)
+        rollups.prepare_site_migration(connection)
+    for script in (SCHEMA, SEARCH_SCHEMA, rollups.SCHEMA, details.SCHEMA, matching.SCHEMA, alerts.SCHEMA):
+        connection.executescript(script)
+
+    if connection.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            _seed_derived_tables(connection, version)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    except BaseException:
+        connection.rollback()
+        raise
+    connection.commit()
+
+
+def _stored_state(
+    connection: sqlite3.Connection, item_ids: List[str]
+) -> Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]]:
+    """Map each known item id to its ``(content_hash, last seen at, search query)``."""
+    state: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {}
+    for start in range(0, len(item_ids), _LOOKUP_CHUNK):
+        chunk = item_ids[start:start + _LOOKUP_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows = connection.execute(
+            f"SELECT ml_item_id, content_hash, _scraped_at, _search_query FROM {ITEMS_TABLE} "
+            f"WHERE ml_item_id IN ({placeholders})",
+            chunk,
+        )
+        state.update((ml_item_id, (digest, seen_at, query)) for ml_item_id, digest, seen_at, query in rows)
+    return state
+
+
+def write_batch(connection: sqlite3.Connection, records: Iterable[Mapping[str, object]]) -> Dict[str, int]:
+    """Upsert a batch of normalized listings in a single transaction.
+
+    New or changed listings are upserted into the items table, get a row
+    in ``price_observations``, are matched to a product cluster and update
+    the price baselines, which may raise alerts (``storage.alerts``);
+    unchanged ones only have their last-seen time refreshed. Listings not
+    yet seen on the current day are also folded into the daily price
+    rollups. Records without ``ml_item_id`` cannot be keyed and are skipped.
+
+    A listing belongs to the first query that found it: later sightings
+    under another query keep its ``_search_query`` on the items table, in
+    the rollups and in the query baselines, so it does not move between
+    query summaries from run to run. ``price_observations`` still records
+    the query of each observation.
+    """
+    batch: Dict[str, Mapping[str, object]] = {}
+    for record in records:
+        ml_item_id = record.get("ml_item_id")
+        if isinstance(ml_item_id, str) and ml_item_id:
+            # Within a batch too, the first query to find a listing keeps it.
+            batch.setdefault(ml_item_id, record)
+
+    counts = {"changed": 0, "unchanged": 0, "alerts": 0}
+    if not batch:
+        return counts
+
+    now = datetime.now(timezone.utc).isoformat()
+    upserts = []
+    changed = []
+    observations = []
+    touches = []
+    sightings = []
+    stored = _stored_state(connection, list(batch))
+    for ml_item_id, record in batch.items():
+        digest = content_hash(record)
+        seen_at = record.get("_scraped_at") or now
+        stored_hash, last_seen_at, first_query = stored.get(ml_item_id, (None, None, None))
+        observed_query = record.get("_search_query")
+        if first_query and first_query != observed_query:
+            record = {**record, "_search_query": first_query}
+        if not last_seen_at or str(last_seen_at)[:10] != str(seen_at)[:10]:
+            sightings.append({**record, "_scraped_at": seen_at})
+        if stored_hash == digest:
+            touches.append((seen_at, seen_at, ml_item_id))
+            continue
+        values = [record.get(column) for column in ITEM_COLUMNS]
+        values[ITEM_COLUMNS.index("_scraped_at")] = seen_at
+        upserts.append((*values, seen_at, digest))
+        changed.append({**record, "_scraped_at": seen_at})
+        observations.append((ml_item_id, record.get("price"), seen_at, observed_query))
+
+    with connection:
+        connection.executemany(_UPSERT_ITEM, upserts)
+        connection.executemany(_INSERT_OBSERVATION, observations)
+        connection.executemany(_TOUCH_ITEM, touches)
+        clusters = matching.assign_clusters(connection, changed)
+        connection.executemany(_SET_CLUSTER, [(cluster_id, ml_item_id) for ml_item_id, cluster_id in clusters.items()])
+        rollups.update_rollups(connection, sightings)
+        raised = alerts.update_baselines(connection, changed)
+
+    counts["changed"] = len(upserts)
+    counts["unchanged"] = len(touches)
+    counts["alerts"] = len(raised)
+    return counts
+
+
+def write_details(connection: sqlite3.Connection, records: Iterable[Mapping[str, object]]) -> int:
+    """Store enrichment results and copy each listing's category onto the items table."""
+    records = [record for record in records if record.get("ml_item_id")]
+    if not records:
+        return 0
+    enriched_at = datetime.now(timezone.utc).isoformat()
+    with connection:
+        count = details.upsert_details(connection, records, enriched_at)
+        connection.executemany(
+            _SET_CATEGORY,
+            [(record["category_id"], record["ml_item_id"]) for record in records if record.get("category_id")],
+        )
+    return count
@@ -0,0 +1,59 @@
+"""Item details from the public items API (category, sales, condition, shipping).
+
+Filled by the spider's optional enrichment stage, one row per listing with
+the time it was last enriched so later runs can skip fresh ones. The
+category is also copied onto the items table, where the dashboard filters
+on it.
+"""
+import sqlite3
+from typing import Iterable, Mapping
+
+DETAILS_TABLE = "item_details"
+
+DETAIL_COLUMNS = (
+    "ml_item_id",
+    "category_id",
+    "sold_quantity",
+    "condition",
+    "free_shipping",
+    "logistic_type",
+    "attributes",
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {DETAILS_TABLE} (
+    ml_item_id TEXT PRIMARY KEY,
+    category_id TEXT,
+    sold_quantity INTEGER,
+    condition TEXT,
+    free_shipping INTEGER,
+    logistic_type TEXT,
+    attributes TEXT,
+    enriched_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_details_enriched_at ON {DETAILS_TABLE} (enriched_at);
+"""
+
+_UPSERT_DETAILS = f"""
+INSERT OR REPLACE INTO {DETAILS_TABLE} ({", ".join(DETAIL_COLUMNS)}, enriched_at)
+VALUES ({", ".join("?" for _ in DETAIL_COLUMNS)}, ?)
+"""
+
+
+def upsert_details(connection: sqlite3.Connection, records: Iterable[Mapping[str, object]], enriched_at: str) -> int:
+    """Store one details row per record. Must run inside the caller's transaction."""
+    rows = []
+    for record in records:
+        if not record.get("ml_item_id"):
+            continue
+        values = [record.get(column) for column in DETAIL_COLUMNS]
+        free_shipping = record.get("free_shipping")
+        values[DETAIL_COLUMNS.index("free_shipping")] = None if free_shipping is None else int(bool(free_shipping))
+        rows.append((*values, enriched_at))
+    connection.executemany(_UPSERT_DETAILS, rows)
+    return len(rows)
+
+
+def enriched_since(connection: sqlite3.Connection, since: str) -> set:
+    rows = connection.execute(f"SELECT ml_item_id FROM {DETAILS_TABLE} WHERE enriched_at >= ?", (since,))
+    return {row[0] for row in rows}
@@ -0,0 +1,214 @@
+"""Recurring crawl jobs shared by the scheduler daemon and its clients.
+
+Each job is a search query refreshed every ``interval_s`` seconds. A job's
+staleness is the time since it last finished divided by its interval, so
+1.0 means "due now"; jobs never run, or explicitly requested, go first.
+The store is a small SQLite database so the UI can enqueue runs and read
+status while the daemon is working.
+"""
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from sites import DEFAULT_SITE
+from storage.database import DATA_DIR, connect
+
+JOBS_DB_PATH = DATA_DIR / "scheduler.db"
+DEFAULT_INTERVAL_S = 3600
+# A daemon whose last heartbeat is older than this is considered gone.
+HEARTBEAT_MAX_AGE_S = 90
+# Staleness given to jobs that were never run or were requested by a client.
+REQUESTED_STALENESS = float("inf")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_jobs (
+    site TEXT NOT NULL DEFAULT 'MLA',
+    query TEXT NOT NULL,
+    interval_s REAL NOT NULL,
+    max_pages INTEGER NOT NULL,
+    concurrency INTEGER NOT NULL DEFAULT 2,
+    requested_at REAL,
+    status TEXT NOT NULL DEFAULT 'idle',
+    last_started_at REAL,
+    last_finished_at REAL,
+    last_duration_s REAL,
+    last_items INTEGER,
+    last_error TEXT,
+    runs INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (site, query)
+);
+CREATE TABLE IF NOT EXISTS scheduler_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    pid INTEGER,
+    heartbeat_at REAL
+);
+"""
+
+STATUS_IDLE = "idle"
+STATUS_RUNNING = "running"
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+
+@dataclass
+class Job:
+    site: str
+    query: str
+    interval_s: float
+    max_pages: int
+    concurrency: int = 2
+    requested_at: Optional[float] = None
+    status: str = STATUS_IDLE
+    last_started_at: Optional[float] = None
+    last_finished_at: Optional[float] = None
+    last_duration_s: Optional[float] = None
+    last_items: Optional[int] = None
+    last_error: Optional[str] = None
+    runs: int = 0
+
+    def staleness(self, now: float) -> float:
+        if self.requested_at is not None or self.last_finished_at is None:
+            return REQUESTED_STALENESS
+        return (now - self.last_finished_at) / max(self.interval_s, 1.0)
+
+
+_JOB_COLUMNS = ", ".join(Job.__dataclass_fields__)
+
+
+class JobStore:
+    def __init__(self, db_path: Path | str = JOBS_DB_PATH) -> None:
+        self.db_path = Path(db_path)
+        self.connection = connect(self.db_path)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self._migrate_single_site_jobs()
+            self.connection.executescript(SCHEMA)
+
+    def _migrate_single_site_jobs(self) -> None:
+        """Rebuild a ``crawl_jobs`` table keyed on the query alone; its jobs are all MLA."""
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(crawl_jobs)")]
+        if not columns or "site" in columns:
+            return
+        self.connection.execute("ALTER TABLE crawl_jobs RENAME TO crawl_jobs_single_site")
+        self.connection.executescript(SCHEMA)
+        copied = ", ".join(columns)
+        self.connection.execute(f"INSERT INTO crawl_jobs ({copied}) SELECT {copied} FROM crawl_jobs_single_site")
+        self.connection.execute("DROP TABLE crawl_jobs_single_site")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def upsert(
+        self,
+        query: str,
+        interval_s: float,
+        max_pages: int,
+        concurrency: int = 2,
+        site: str = DEFAULT_SITE,
+    ) -> None:
+        """Add a job or change its schedule, keeping its run history."""
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO crawl_jobs (site, query, interval_s, max_pages, concurrency) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(site, query) DO UPDATE SET
+                    interval_s = excluded.interval_s,
+                    max_pages = excluded.max_pages,
+                    concurrency = excluded.concurrency
+                """,
+                (site, query, interval_s, max_pages, concurrency),
+            )
+
+    def remove(self, query: str, site: str = DEFAULT_SITE) -> bool:
+        with self.connection:
+            cursor = self.connection.execute("DELETE FROM crawl_jobs WHERE site = ? AND query = ?", (site, query))
+        return cursor.rowcount > 0
+
+    def request_run(
+        self,
+        query: str,
+        max_pages: Optional[int] = None,
+        interval_s: float = DEFAULT_INTERVAL_S,
+        site: str = DEFAULT_SITE,
+    ) -> None:
+        """Ask the daemon to run ``query`` as soon as a slot is free (creating the job if needed)."""
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO crawl_jobs (site, query, interval_s, max_pages, requested_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(site, query) DO UPDATE SET
+                    requested_at = excluded.requested_at,
+                    max_pages = COALESCE(?, crawl_jobs.max_pages)
+                """,
+                (site, query, interval_s, max_pages or 1, now, max_pages),
+            )
+
+    def jobs(self) -> List[Job]:
+        rows = self.connection.execute(f"SELECT {_JOB_COLUMNS} FROM crawl_jobs ORDER BY site, query")
+        return [Job(**dict(row)) for row in rows]
+
+    def due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[Job]:
+        """Idle jobs whose staleness reached 1.0, most stale first."""
+        now = time.time() if now is None else now
+        ready = [
+            job
+            for job in self.jobs()
+            if job.status != STATUS_RUNNING and job.staleness(now) >= 1.0
+        ]
+        ready.sort(key=lambda job: job.staleness(now), reverse=True)
+        return ready[:limit] if limit is not None else ready
+
+    def mark_started(self, query: str, site: str = DEFAULT_SITE, now: Optional[float] = None) -> None:
+        with self.connection:
+            self.connection.execute(
+                """
+                UPDATE crawl_jobs SET status = ?, last_started_at = ?, requested_at = NULL
+                WHERE site = ? AND query = ?
+                """,
+                (STATUS_RUNNING, time.time() if now is None else now, site, query),
+            )
+
+    def mark_finished(
+        self,
+        query: str,
+        items: int,
+        error: Optional[str] = None,
+        site: str = DEFAULT_SITE,
+        now: Optional[float] = None,
+    ) -> None:
+        now = time.time() if now is None else now
+        with self.connection:
+            self.connection.execute(
+                """
+                UPDATE crawl_jobs SET
+                    status = ?,
+                    last_finished_at = ?,
+                    last_duration_s = ? - last_started_at,
+                    last_items = ?,
+                    last_error = ?,
+                    runs = runs + 1
+                WHERE site = ? AND query = ?
+                """,
+                (STATUS_ERROR if error else STATUS_OK, now, now, items, error, site, query),
+            )
+
+    def reset_running(self) -> None:
+        """Jobs left ``running`` by a daemon that died are runnable again."""
+        with self.connection:
+            self.connection.execute("UPDATE crawl_jobs SET status = ? WHERE status = ?", (STATUS_IDLE, STATUS_RUNNING))
+
+    def heartbeat(self, pid: int, now: Optional[float] = None) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO scheduler_state (id, pid, heartbeat_at) VALUES (1, ?, ?)",
+                (pid, time.time() if now is None else now),
+            )
+
+    def daemon_alive(self, max_age_s: float = HEARTBEAT_MAX_AGE_S, now: Optional[float] = None) -> bool:
+        row = self.connection.execute("SELECT heartbeat_at FROM scheduler_state WHERE id = 1").fetchone()
+        if row is None or row["heartbeat_at"] is None:
+            return False
+        return (time.time() if now is None else now) - row["heartbeat_at"] <= max_age_s
@@ -0,0 +1,250 @@
+"""Product clusters: listings of the same product across sellers, ids and runs.
+
+Titles are normalized (lowercase, no accents, stopwords and sales words
+dropped, "1.5 l" -> "1.5l") and turned into a set of tokens. Each set gets a
+MinHash signature of ``NUM_PERM`` values, computed for a whole batch at once
+with numpy, split into ``BANDS`` bands of ``ROWS`` values. Listings sharing a
+band (LSH) are candidates; a listing joins the candidate cluster whose
+representative signature agrees on at least ``MATCH_THRESHOLD`` of the values
+(estimated Jaccard similarity of the titles) and otherwise starts its own
+cluster, named after its ``ml_item_id``.
+
+Band keys and representative signatures are kept in SQLite, so new listings
+are matched against every earlier run in a handful of indexed lookups per
+batch, and each listing's ``cluster_id`` is stored on the items table.
+Clusters never span sites.
+"""
+import argparse
+import re
+import sqlite3
+import time
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+CLUSTERS_TABLE = "product_clusters"
+BUCKETS_TABLE = "product_buckets"
+
+NUM_PERM = 60
+BANDS = 20
+ROWS = NUM_PERM // BANDS
+MATCH_THRESHOLD = 0.6
+# Listings per signature matrix; bounds memory at roughly 50 MB.
+SIGNATURE_CHUNK = 5000
+_LOOKUP_CHUNK = 500
+
+_PRIME = np.uint64((1 << 61) - 1)
+_RANDOM = np.random.RandomState(20240501)
+_PERM_A = _RANDOM.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _RANDOM.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_BAND_MULTIPLIERS = _RANDOM.randint(1, 1 << 62, size=ROWS, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+_BAND_SALTS = _RANDOM.randint(1, 1 << 62, size=BANDS, dtype=np.int64).astype(np.uint64)
+
+STOPWORDS = frozenset(
+    "a al ao com con da de del do dos e el em en la las los no o os p para por pra sin un una x y".split()
+)
+# Sales wording that sellers add to the same product.
+NOISE_WORDS = frozenset(
+    "envio gratis frete gratis oferta promo promocion promocao original nuevo nueva novo nova "
+    "garantia full lancamento".split()
+)
+UNITS = {
+    "l": "l", "lt": "l", "lts": "l", "litro": "l", "litros": "l",
+    "ml": "ml", "cc": "ml", "g": "g", "gr": "g", "grs": "g", "kg": "kg",
+    "mm": "mm", "cm": "cm", "m": "m", "w": "w", "v": "v", "gb": "gb", "tb": "tb", "mah": "mah",
+    "pulgada": "pol", "pulgadas": "pol", "pol": "pol",
+}
+_UNIT_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*([a-z]+)\b")
+_NON_WORD_RE = re.compile(r"[^a-z0-9.,]+")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {CLUSTERS_TABLE} (
+    cluster_id TEXT PRIMARY KEY,
+    _site TEXT,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS {BUCKETS_TABLE} (
+    bucket INTEGER PRIMARY KEY,
+    cluster_id TEXT NOT NULL
+);
+"""
+
+_INSERT_CLUSTER = f"INSERT OR IGNORE INTO {CLUSTERS_TABLE} (cluster_id, _site, signature) VALUES (?, ?, ?)"
+_INSERT_BUCKET = f"INSERT OR IGNORE INTO {BUCKETS_TABLE} (bucket, cluster_id) VALUES (?, ?)"
+
+
+def _join_unit(match: "re.Match[str]") -> str:
+    unit = UNITS.get(match.group(2))
+    return match.group(1).replace(",", ".") + unit if unit else match.group(0)
+
+
+def normalize_title(title: object) -> str:
+    if not isinstance(title, str):
+        return ""
+    text = unicodedata.normalize("NFKD", title.lower()).encode("ascii", "ignore").decode("ascii")
+    text = _UNIT_RE.sub(_join_unit, _NON_WORD_RE.sub(" ", text))
+    tokens = (token.strip(".,") for token in text.split())
+    return " ".join(token for token in tokens if token and token not in STOPWORDS and token not in NOISE_WORDS)
+
+
+def title_tokens(title: object) -> List[int]:
+    """Distinct 32-bit token hashes of the normalized title (stable across processes)."""
+    return sorted({zlib.crc32(token.encode("utf-8")) for token in normalize_title(title).split()})
+
+
+def signatures(token_sets: Sequence[Sequence[int]]) -> np.ndarray:
+    """MinHash signatures, one ``NUM_PERM`` row per non-empty token set."""
+    lengths = np.fromiter((len(tokens) for tokens in token_sets), dtype=np.int64, count=len(token_sets))
+    if not len(lengths) or not lengths.all():
+        raise ValueError("every token set must be non-empty")
+    values = np.fromiter((value for tokens in token_sets for value in tokens), dtype=np.uint64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    hashed = (_PERM_A[:, None] * values[None, :] + _PERM_B[:, None]) % _PRIME
+    return np.minimum.reduceat(hashed, starts, axis=1).T.astype(np.uint32)
+
+
+def band_keys(signature_rows: np.ndarray, sites: Sequence[str]) -> np.ndarray:
+    """One signed 64-bit bucket key per listing and band, salted with the site."""
+    bands = signature_rows.astype(np.uint64).reshape(len(signature_rows), BANDS, ROWS)
+    keys = (bands * _BAND_MULTIPLIERS).sum(axis=2, dtype=np.uint64) ^ _BAND_SALTS
+    site_salts = np.fromiter((zlib.crc32(site.encode("utf-8")) for site in sites), dtype=np.uint64, count=len(sites))
+    return (keys ^ (site_salts[:, None] << np.uint64(32))).view(np.int64)
+
+
+def _lookup(connection: sqlite3.Connection, sql: str, keys: List) -> list:
+    rows = []
+    for start in range(0, len(keys), _LOOKUP_CHUNK):
+        chunk = keys[start:start + _LOOKUP_CHUNK]
+        rows.extend(connection.execute(sql.format(", ".join("?" for _ in chunk)), chunk))
+    return rows
+
+
+def assign_clusters(
+    connection: sqlite3.Connection,
+    records: Iterable[Mapping[str, object]],
+    threshold: float = MATCH_THRESHOLD,
+) -> Dict[str, str]:
+    """Match listings against the stored clusters and each other; returns ``{ml_item_id: cluster_id}``.
+
+    Does not touch the items table and must run inside the caller's
+    transaction. Listings whose title has no usable words get a cluster of
+    their own that nothing else can join.
+    """
+    assignments: Dict[str, str] = {}
+    pending = []
+    for record in records:
+        ml_item_id = record.get("ml_item_id")
+        if not isinstance(ml_item_id, str) or not ml_item_id:
+            continue
+        tokens = title_tokens(record.get("name"))
+        if tokens:
+            pending.append((ml_item_id, str(record.get("_site") or ml_item_id[:3]), tokens))
+        else:
+            assignments[ml_item_id] = ml_item_id
+
+    for start in range(0, len(pending), SIGNATURE_CHUNK):
+        chunk = pending[start:start + SIGNATURE_CHUNK]
+        assignments.update(_assign_chunk(connection, chunk, threshold))
+    return assignments
+
+
+def _assign_chunk(connection: sqlite3.Connection, chunk: list, threshold: float) -> Dict[str, str]:
+    rows = signatures([tokens for _, _, tokens in chunk])
+    keys = band_keys(rows, [site for _, site, _ in chunk]).tolist()
+
+    unique_keys = list({key for item_keys in keys for key in item_keys})
+    buckets: Dict[int, str] = dict(
+        _lookup(connection, f"SELECT bucket, cluster_id FROM {BUCKETS_TABLE} WHERE bucket IN ({{}})", unique_keys)
+    )
+    known = list(set(buckets.values()))
+    representatives: Dict[str, np.ndarray] = {
+        cluster_id: np.frombuffer(signature, dtype=np.uint32)
+        for cluster_id, signature in _lookup(
+            connection, f"SELECT cluster_id, signature FROM {CLUSTERS_TABLE} WHERE cluster_id IN ({{}})", known
+        )
+    }
+
+    assignments: Dict[str, str] = {}
+    new_clusters = []
+    new_buckets = []
+    for (ml_item_id, site, _), row, item_keys in zip(chunk, rows, keys):
+        best: Optional[str] = None
+        best_similarity = threshold
+        for cluster_id in {buckets[key] for key in item_keys if key in buckets}:
+            representative = representatives.get(cluster_id)
+            if representative is None:
+                continue
+            similarity = float(np.count_nonzero(representative == row)) / NUM_PERM
+            if similarity >= best_similarity:
+                best, best_similarity = cluster_id, similarity
+        if best is None:
+            best = ml_item_id
+            if best not in representatives:
+                representatives[best] = row
+                new_clusters.append((best, site, row.tobytes()))
+        assignments[ml_item_id] = best
+        for key in item_keys:
+            if key not in buckets:
+                buckets[key] = best
+                new_buckets.append((key, best))
+
+    connection.executemany(_INSERT_CLUSTER, new_clusters)
+    connection.executemany(_INSERT_BUCKET, new_buckets)
+    return assignments
+
+
+def seed_clusters(connection: sqlite3.Connection, items_table: str, chunk_size: int = 50000) -> int:
+    """Cluster every stored listing in rowid order; returns the number of listings.
+
+    Must run inside the caller's transaction, on empty cluster tables.
+    """
+    last_rowid = 0
+    total = 0
+    while True:
+        batch = connection.execute(
+            f"SELECT rowid, ml_item_id, name, _site FROM {items_table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, chunk_size),
+        ).fetchall()
+        if not batch:
+            return total
+        last_rowid = batch[-1][0]
+        total += len(batch)
+        records = [{"ml_item_id": item_id, "name": name, "_site": site} for _, item_id, name, site in batch]
+        assignments = assign_clusters(connection, records)
+        connection.executemany(
+            f"UPDATE {items_table} SET cluster_id = ? WHERE ml_item_id = ?",
+            [(cluster_id, ml_item_id) for ml_item_id, cluster_id in assignments.items()],
+        )
+
+
+def rebuild_clusters(connection: sqlite3.Connection, items_table: str) -> int:
+    """Recluster every stored listing from scratch (e.g. after changing the threshold)."""
+    with connection:
+        connection.execute(f"DELETE FROM {CLUSTERS_TABLE}")
+        connection.execute(f"DELETE FROM {BUCKETS_TABLE}")
+        return seed_clusters(connection, items_table)
+
+
+def main() -> None:
+    from storage.database import DB_PATH, ITEMS_TABLE, connect, ensure_schema
+
+    parser = argparse.ArgumentParser(description="Reagrupar todas las publicaciones de data/database.db en productos")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    args = parser.parse_args()
+
+    connection = connect(args.db)
+    try:
+        ensure_schema(connection)
+        start = time.perf_counter()
+        items = rebuild_clusters(connection, ITEMS_TABLE)
+        clusters = connection.execute(f"SELECT COUNT(DISTINCT cluster_id) FROM {ITEMS_TABLE}").fetchone()[0]
+    finally:
+        connection.close()
+    print(f"{items} publicaciones en {clusters} productos ({time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Partitioned Parquet history of every crawl, next to the SQLite database.
+
+Layout (hive partitioning, one file per run and partition)::
+
+    data/parquet/_search_query=<query>/day=<YYYY-MM-DD>/part-<run_id>.parquet
+
+Columns use compact types: dictionary-encoded seller/source/site, float32 price,
+bool ``is_ad`` and a UTC timestamp. Readers pass query/day filters down to
+pyarrow so only the matching partitions and row groups are read.
+"""
+import os
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from storage.database import DATA_DIR
+
+PARQUET_DIR = DATA_DIR / "parquet"
+PARTITION_COLUMNS = ("_search_query", "day")
+
+SCHEMA = pa.schema(
+    [
+        ("ml_item_id", pa.string()),
+        ("name", pa.string()),
+        ("seller", pa.dictionary(pa.int32(), pa.string())),
+        ("price", pa.float32()),
+        ("permalink", pa.string()),
+        ("is_ad", pa.bool_()),
+        ("_source", pa.dictionary(pa.int32(), pa.string())),
+        ("_site", pa.dictionary(pa.int32(), pa.string())),
+        ("_scraped_at", pa.timestamp("ms", tz="UTC")),
+    ]
+)
+PARTITIONING = ds.partitioning(
+    pa.schema([("_search_query", pa.string()), ("day", pa.string())]),
+    flavor="hive",
+)
+
+
+def _timestamp(value: object) -> Optional[datetime]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    parsed = datetime.fromisoformat(str(value))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _partition_key(record: Mapping[str, object]) -> Tuple[str, str]:
+    seen_at = _timestamp(record.get("_scraped_at")) or datetime.now(timezone.utc)
+    return str(record.get("_search_query") or ""), seen_at.date().isoformat()
+
+
+def records_to_table(records: Sequence[Mapping[str, object]]) -> pa.Table:
+    """Build a table in the store schema from normalized item records."""
+    columns: Dict[str, list] = {name: [] for name in SCHEMA.names}
+    for record in records:
+        for name in SCHEMA.names:
+            value = record.get(name)
+            if name == "_scraped_at":
+                value = _timestamp(value)
+            elif name == "is_ad":
+                value = None if value is None else bool(value)
+            columns[name].append(value)
+    return pa.table(
+        {name: pa.array(columns[name], type=SCHEMA.field(name).type) for name in SCHEMA.names},
+        schema=SCHEMA,
+    )
+
+
+def partition_path(root: Path, search_query: str, day: str) -> Path:
+    # Hive partition values are URI-decoded by pyarrow when read back.
+    return root / f"_search_query={quote(search_query, safe='')}" / f"day={day}"
+
+
+def _run_id() -> str:
+    # The pid keeps files apart when several distributed workers share the store.
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%fZ}-{os.getpid()}"
+
+
+class PartitionedWriter:
+    """Stream record batches of one run into per-partition Parquet files.
+
+    One ``ParquetWriter`` stays open per (query, day) partition, so each run
+    adds a single file per partition with one row group per ``write`` call.
+    """
+
+    def __init__(self, root: Path | str = PARQUET_DIR, run_id: Optional[str] = None) -> None:
+        self.root = Path(root)
+        self.run_id = run_id or _run_id()
+        self.writers: Dict[Tuple[str, str], pq.ParquetWriter] = {}
+        self.rows_written = 0
+
+    def write(self, records: Iterable[Mapping[str, object]]) -> None:
+        partitions: Dict[Tuple[str, str], List[Mapping[str, object]]] = {}
+        for record in records:
+            partitions.setdefault(_partition_key(record), []).append(record)
+        for key, rows in partitions.items():
+            writer = self.writers.get(key)
+            if writer is None:
+                path = partition_path(self.root, *key)
+                path.mkdir(parents=True, exist_ok=True)
+                writer = pq.ParquetWriter(path / f"part-{self.run_id}.parquet", SCHEMA, compression="zstd")
+                self.writers[key] = writer
+            writer.write_table(records_to_table(rows))
+            self.rows_written += len(rows)
+
+    def close(self) -> None:
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+def write_run(records: Sequence[Mapping[str, object]], root: Path | str = PARQUET_DIR) -> int:
+    """Write one run's records as new partition files; returns the row count."""
+    writer = PartitionedWriter(root)
+    try:
+        writer.write(records)
+    finally:
+        writer.close()
+    return writer.rows_written
+
+
+def dataset(root: Path | str = PARQUET_DIR) -> Optional[ds.Dataset]:
+    root = Path(root)
+    if not root.exists() or not any(root.rglob("*.parquet")):
+        return None
+    # pyarrow skips "_"-prefixed paths by default, which would hide "_search_query=" directories.
+    return ds.dataset(
+        root,
+        format="parquet",
+        schema=_dataset_schema(),
+        partitioning=PARTITIONING,
+        ignore_prefixes=["."],
+    )
+
+
+def _dataset_schema() -> pa.Schema:
+    schema = SCHEMA
+    for name in PARTITION_COLUMNS:
+        schema = schema.append(pa.field(name, pa.string()))
+    return schema
+
+
+def build_filter(
+    search_queries: Optional[Sequence[str]] = None,
+    since: Optional[date | str] = None,
+    until: Optional[date | str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> Optional[ds.Expression]:
+    expression = None
+
+    def _and(condition: ds.Expression) -> None:
+        nonlocal expression
+        expression = condition if expression is None else expression & condition
+
+    if search_queries:
+        _and(ds.field("_search_query").isin(list(search_queries)))
+    if since is not None:
+        _and(ds.field("day") >= str(since))
+    if until is not None:
+        _and(ds.field("day") <= str(until))
+    if min_price is not None:
+        _and(ds.field("price") >= min_price)
+    if max_price is not None:
+        _and(ds.field("price") <= max_price)
+    return expression
+
+
+def read_history(
+    root: Path | str = PARQUET_DIR,
+    search_queries: Optional[Sequence[str]] = None,
+    since: Optional[date | str] = None,
+    until: Optional[date | str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """Load matching rows with partition pruning and predicate pushdown.
+
+    Dictionary columns come back as pandas categoricals.
+    """
+    source = dataset(root)
+    if source is None:
+        return pd.DataFrame(columns=list(columns) if columns else _dataset_schema().names)
+    table = source.to_table(
+        columns=list(columns) if columns else None,
+        filter=build_filter(search_queries, since, until, min_price, max_price),
+    )
+    frame = table.to_pandas()
+    for name in PARTITION_COLUMNS:
+        if name in frame.columns:
+            frame[name] = frame[name].astype("category")
+    return frame
+
+
+def latest_mtime_ns(root: Path | str = PARQUET_DIR) -> int:
+    """Newest file time in the store; changes whenever a run adds a file."""
+    root = Path(root)
+    if not root.exists():
+        return 0
+    return max((path.stat().st_mtime_ns for path in root.rglob("*.parquet")), default=0)
@@ -0,0 +1,306 @@
+"""Read-side data access for the dashboard.
+
+Filters become parameterized SQL, results are paged with LIMIT/OFFSET and the
+metrics are computed by SQLite, so a Streamlit rerun never pulls the whole
+items table into pandas. Results are memoized until another connection
+commits to the database (``PRAGMA data_version``), so reruns while nothing
+is being written do not touch SQLite at all.
+"""
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Hashable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from storage.database import DB_PATH, ITEMS_TABLE, SEARCH_TABLE
+from storage.rollups import ROLLUPS_TABLE, load_trend, rollup_queries
+from storage.search import RANK_EXPRESSION, build_match_query, has_search_index
+
+HIDDEN_COLUMNS = frozenset(["content_hash"])
+SEARCHABLE_COLUMNS = ("name", "seller", "_search_query")
+DEFAULT_RESULT_CACHE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class ItemFilters:
+    search_term: str = ""
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    category_id: Optional[str] = None
+    site: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ItemsSummary:
+    count: int
+    mean_price: Optional[float]
+    min_price: Optional[float]
+    max_price: Optional[float]
+    # Distinct product clusters and the mean of their mean prices, so a
+    # product listed by many sellers counts once (None without clusters).
+    products: Optional[int] = None
+    product_mean_price: Optional[float] = None
+
+
+class ConnectionPool:
+    """A fixed-size pool of read-only SQLite connections shareable across threads."""
+
+    def __init__(self, db_path: Path | str, size: int = 4) -> None:
+        self.db_path = Path(db_path)
+        self._connections: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(size):
+            self._connections.put(self._open())
+
+    def _open(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            f"file:{self.db_path.as_posix()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            timeout=30,
+        )
+        return connection
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connections.get()
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+
+    def close(self) -> None:
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+
+class ItemsRepository:
+    def __init__(
+        self,
+        db_path: Path | str = DB_PATH,
+        pool_size: int = 4,
+        cache_size: int = DEFAULT_RESULT_CACHE_SIZE,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.pool = ConnectionPool(self.db_path, pool_size)
+        # data_version only moves for commits made by *other* connections, so
+        # a dedicated connection that never writes sees every crawl batch.
+        self._watcher = self.pool._open()
+        self._lock = threading.Lock()
+        self._data_version: Optional[int] = None
+        self._version = 0
+        self._results: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._cache_size = cache_size
+        self.columns: List[str] = []
+        self.full_text = False
+        self.has_rollups = False
+        self.version()
+
+    def _load_schema(self) -> None:
+        with self.pool.connection() as connection:
+            rows = connection.execute(f"PRAGMA table_info({ITEMS_TABLE})").fetchall()
+            self.full_text = has_search_index(connection)
+            # Rollups without _site are migrated by the next ensure_schema; skip them until then.
+            self.has_rollups = any(
+                row[1] == "_site" for row in connection.execute(f"PRAGMA table_info({ROLLUPS_TABLE})")
+            )
+        self.columns = [row[1] for row in rows]
+
+    def version(self) -> int:
+        """Return a counter that changes whenever the database was written to."""
+        with self._lock:
+            data_version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self._version += 1
+                self._results.clear()
+                self._load_schema()
+            return self._version
+
+    def _cached(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        version = self.version()
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        value = compute()
+        with self._lock:
+            # Do not keep a result computed across a concurrent write.
+            if self._version == version:
+                self._results[key] = value
+                while len(self._results) > self._cache_size:
+                    self._results.popitem(last=False)
+        return value
+
+    def close(self) -> None:
+        self._watcher.close()
+        self.pool.close()
+
+    @classmethod
+    def open(cls, db_path: Path | str = DB_PATH) -> Optional["ItemsRepository"]:
+        """Return a repository, or None when there is no items table to read."""
+        if not Path(db_path).exists():
+            return None
+        try:
+            repository = cls(db_path)
+        except sqlite3.Error:
+            return None
+        if not repository.columns:
+            repository.close()
+            return None
+        return repository
+
+    def _where(self, filters: ItemFilters, joined: bool = False) -> Tuple[str, list]:
+        """WHERE clause for ``filters``; ``joined`` when the query already joins the search index."""
+        clauses = []
+        params: list = []
+        match = build_match_query(filters.search_term) if self.full_text else None
+        if match is not None:
+            if joined:
+                clauses.append(f"{SEARCH_TABLE} MATCH ?")
+            else:
+                clauses.append(f"rowid IN (SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ?)")
+            params.append(match)
+        elif filters.search_term:
+            searchable = [column for column in SEARCHABLE_COLUMNS if column in self.columns]
+            if searchable:
+                clauses.append("(" + " OR ".join(f"{column} LIKE ?" for column in searchable) + ")")
+                params.extend([f"%{filters.search_term}%"] * len(searchable))
+        if filters.min_price is not None:
+            clauses.append("COALESCE(price, 0) >= ?")
+            params.append(filters.min_price)
+        if filters.max_price is not None:
+            clauses.append("COALESCE(price, 0) <= ?")
+            params.append(filters.max_price)
+        if filters.category_id and "category_id" in self.columns:
+            clauses.append("category_id = ?")
+            params.append(filters.category_id)
+        if filters.site and "_site" in self.columns:
+            clauses.append("_site = ?")
+            params.append(filters.site)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _visible_columns(self, table: str = "") -> str:
+        prefix = f"{table}." if table else ""
+        return ", ".join(f'{prefix}"{column}"' for column in self.columns if column not in HIDDEN_COLUMNS)
+
+    def is_empty(self) -> bool:
+        return self._cached("is_empty", self._is_empty)
+
+    def _is_empty(self) -> bool:
+        with self.pool.connection() as connection:
+            return connection.execute(f"SELECT 1 FROM {ITEMS_TABLE} LIMIT 1").fetchone() is None
+
+    def sites(self) -> List[str]:
+        if "_site" not in self.columns:
+            return []
+        return self._cached("sites", self._sites)
+
+    def _sites(self) -> List[str]:
+        with self.pool.connection() as connection:
+            rows = connection.execute(f"SELECT DISTINCT _site FROM {ITEMS_TABLE} WHERE _site IS NOT NULL ORDER BY 1")
+            return [row[0] for row in rows]
+
+    def price_bounds(self) -> Tuple[float, float]:
+        return self._cached("price_bounds", self._price_bounds)
+
+    def _price_bounds(self) -> Tuple[float, float]:
+        with self.pool.connection() as connection:
+            low, high = connection.execute(f"SELECT MIN(price), MAX(price) FROM {ITEMS_TABLE}").fetchone()
+        return float(low or 0.0), float(high or 0.0)
+
+    def summary(self, filters: ItemFilters = ItemFilters()) -> ItemsSummary:
+        return self._cached(("summary", filters), lambda: self._summary(filters))
+
+    def _summary(self, filters: ItemFilters) -> ItemsSummary:
+        where, params = self._where(filters)
+        with self.pool.connection() as connection:
+            count, mean, low, high = connection.execute(
+                f"SELECT COUNT(*), AVG(price), MIN(price), MAX(price) FROM {ITEMS_TABLE}{where}",
+                params,
+            ).fetchone()
+            products = product_mean = None
+            if "cluster_id" in self.columns:
+                products, product_mean = connection.execute(
+                    f"SELECT COUNT(*), AVG(cluster_price) FROM ("
+                    f"SELECT AVG(price) AS cluster_price FROM {ITEMS_TABLE}{where} "
+                    f"GROUP BY COALESCE(cluster_id, ml_item_id))",
+                    params,
+                ).fetchone()
+        return ItemsSummary(
+            count=count,
+            mean_price=mean,
+            min_price=low,
+            max_price=high,
+            products=products,
+            product_mean_price=product_mean,
+        )
+
+    def page(self, filters: ItemFilters, limit: int, offset: int = 0) -> pd.DataFrame:
+        """Return one page of items; the frame is shared between callers, copy before mutating."""
+        return self._cached(
+            ("page", filters, int(limit), int(offset)),
+            lambda: self._page(filters, int(limit), int(offset)),
+        )
+
+    def _page(self, filters: ItemFilters, limit: int, offset: int) -> pd.DataFrame:
+        order = "_scraped_at DESC, rowid" if "_scraped_at" in self.columns else "rowid"
+        match = build_match_query(filters.search_term) if self.full_text else None
+        if match is None:
+            where, params = self._where(filters)
+            sql = f"SELECT {self._visible_columns()} FROM {ITEMS_TABLE}{where} ORDER BY {order} LIMIT ? OFFSET ?"
+        else:
+            # Join the index once and rank in the same pass, best text matches first.
+            where, params = self._where(filters, joined=True)
+            order = order.replace("rowid", f"{ITEMS_TABLE}.rowid")
+            sql = (
+                f"SELECT {self._visible_columns(ITEMS_TABLE)} FROM {ITEMS_TABLE} "
+                f"JOIN {SEARCH_TABLE} ON {SEARCH_TABLE}.rowid = {ITEMS_TABLE}.rowid{where} "
+                f"ORDER BY {RANK_EXPRESSION}, {order} LIMIT ? OFFSET ?"
+            )
+        with self.pool.connection() as connection:
+            return pd.read_sql_query(sql, connection, params=[*params, limit, offset])
+
+    def last_rowid(self) -> int:
+        return self._cached("last_rowid", self._last_rowid)
+
+    def _last_rowid(self) -> int:
+        with self.pool.connection() as connection:
+            return connection.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {ITEMS_TABLE}").fetchone()[0]
+
+    def rows_since(self, rowid: int, limit: int = 500) -> pd.DataFrame:
+        """Items inserted after ``rowid`` (upserts keep their rowid), newest first."""
+        return self._cached(("rows_since", int(rowid), int(limit)), lambda: self._rows_since(int(rowid), int(limit)))
+
+    def _rows_since(self, rowid: int, limit: int) -> pd.DataFrame:
+        sql = (
+            f"SELECT {self._visible_columns()} FROM {ITEMS_TABLE} "
+            f"WHERE rowid > ? ORDER BY rowid DESC LIMIT ?"
+        )
+        with self.pool.connection() as connection:
+            return pd.read_sql_query(sql, connection, params=[rowid, limit])
+
+    def trend_queries(self, site: Optional[str] = None) -> List[str]:
+        if not self.has_rollups:
+            return []
+        return self._cached(("trend_queries", site), lambda: self._trend_queries(site))
+
+    def _trend_queries(self, site: Optional[str]) -> List[str]:
+        with self.pool.connection() as connection:
+            return rollup_queries(connection, site=site)
+
+    def trend(
+        self, search_query: Optional[str] = None, since: Optional[str] = None, site: Optional[str] = None
+    ) -> pd.DataFrame:
+        """Daily price aggregates from the rollups table (empty if the database predates it)."""
+        if not self.has_rollups:
+            return pd.DataFrame()
+        return self._cached(("trend", search_query, since, site), lambda: self._trend(search_query, since, site))
+
+    def _trend(self, search_query: Optional[str], since: Optional[str], site: Optional[str]) -> pd.DataFrame:
+        with self.pool.connection() as connection:
+            return load_trend(connection, search_query=search_query, since=since, site=site)
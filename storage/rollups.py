@@ -0,0 +1,323 @@
+"""Materialized price aggregates per site, search query, seller and day.
+
+Every listing seen on a given day contributes once to the row for its
+``(_site, _search_query, seller, day)``: count, ad count, price sum/min/max and a
+log-bucket quantile sketch. All of these merge by addition, so rows are
+updated in place as batches arrive and any set of rows (e.g. every seller
+of a query over a month) can be combined without going back to the raw
+observations. Rows of different sites are never combined: their prices are
+in different currencies.
+"""
+import json
+import math
+import sqlite3
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import pandas as pd
+
+ROLLUPS_TABLE = "price_rollups"
+# Rollups from before the _site column, renamed while ensure_schema migrates them.
+LEGACY_ROLLUPS_TABLE = "price_rollups_v1"
+
+# Quantiles are reported within ±1% of the true value.
+SKETCH_RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# Bucket for zero, negative or missing-but-present prices.
+_ZERO_BUCKET = "z"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {ROLLUPS_TABLE} (
+    _site TEXT NOT NULL,
+    _search_query TEXT NOT NULL,
+    seller TEXT NOT NULL,
+    day TEXT NOT NULL,
+    item_count INTEGER NOT NULL,
+    ad_count INTEGER NOT NULL,
+    price_count INTEGER NOT NULL,
+    price_sum REAL NOT NULL,
+    price_min REAL,
+    price_max REAL,
+    sketch TEXT NOT NULL,
+    PRIMARY KEY (_site, _search_query, seller, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_rollups_day ON {ROLLUPS_TABLE} (day);
+"""
+
+_SELECT_ROLLUP = f"""
+SELECT item_count, ad_count, price_count, price_sum, price_min, price_max, sketch
+FROM {ROLLUPS_TABLE} WHERE _site = ? AND _search_query = ? AND seller = ? AND day = ?
+"""
+
+_UPSERT_ROLLUP = f"""
+INSERT OR REPLACE INTO {ROLLUPS_TABLE}
+    (_site, _search_query, seller, day, item_count, ad_count, price_count, price_sum, price_min, price_max, sketch)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+@dataclass
+class Rollup:
+    """Mergeable aggregate of the listings seen for one key."""
+
+    item_count: int = 0
+    ad_count: int = 0
+    price_count: int = 0
+    price_sum: float = 0.0
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    sketch: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, price: Optional[float], is_ad: bool) -> None:
+        self.item_count += 1
+        self.ad_count += int(bool(is_ad))
+        if price is None or (isinstance(price, float) and math.isnan(price)):
+            return
+        price = float(price)
+        self.price_count += 1
+        self.price_sum += price
+        self.price_min = price if self.price_min is None else min(self.price_min, price)
+        self.price_max = price if self.price_max is None else max(self.price_max, price)
+        bucket = _bucket(price)
+        self.sketch[bucket] = self.sketch.get(bucket, 0) + 1
+
+    def merge(self, other: "Rollup") -> None:
+        self.item_count += other.item_count
+        self.ad_count += other.ad_count
+        self.price_count += other.price_count
+        self.price_sum += other.price_sum
+        if other.price_min is not None:
+            self.price_min = other.price_min if self.price_min is None else min(self.price_min, other.price_min)
+        if other.price_max is not None:
+            self.price_max = other.price_max if self.price_max is None else max(self.price_max, other.price_max)
+        for bucket, count in other.sketch.items():
+            self.sketch[bucket] = self.sketch.get(bucket, 0) + count
+
+    @property
+    def mean_price(self) -> Optional[float]:
+        return self.price_sum / self.price_count if self.price_count else None
+
+    @property
+    def ad_share(self) -> Optional[float]:
+        return self.ad_count / self.item_count if self.item_count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate price quantile, clamped to the exact min/max."""
+        if not self.price_count:
+            return None
+        rank = q * (self.price_count - 1)
+        seen = 0
+        for bucket in sorted(self.sketch, key=_bucket_order):
+            seen += self.sketch[bucket]
+            if seen > rank:
+                value = _bucket_value(bucket)
+                return min(max(value, self.price_min), self.price_max)
+        return self.price_max
+
+    @classmethod
+    def from_row(cls, row: Tuple) -> "Rollup":
+        item_count, ad_count, price_count, price_sum, price_min, price_max, sketch = row
+        return cls(item_count, ad_count, price_count, price_sum, price_min, price_max, json.loads(sketch))
+
+    def to_row(self) -> Tuple:
+        sketch = json.dumps(self.sketch, separators=(",", ":"), sort_keys=True)
+        return (
+            self.item_count,
+            self.ad_count,
+            self.price_count,
+            self.price_sum,
+            self.price_min,
+            self.price_max,
+            sketch,
+        )
+
+
+def _bucket(price: float) -> str:
+    if price <= 0:
+        return _ZERO_BUCKET
+    return str(math.ceil(math.log(price) / _LOG_GAMMA))
+
+
+def _bucket_order(bucket: str) -> float:
+    return -math.inf if bucket == _ZERO_BUCKET else int(bucket)
+
+
+def _bucket_value(bucket: str) -> float:
+    if bucket == _ZERO_BUCKET:
+        return 0.0
+    return 2 * _GAMMA ** int(bucket) / (_GAMMA + 1)
+
+
+def _key(record: Mapping[str, object]) -> Tuple[str, str, str, str]:
+    seen_at = str(record.get("_scraped_at") or "")
+    return (
+        str(record.get("_site") or str(record.get("ml_item_id") or "")[:3]),
+        str(record.get("_search_query") or ""),
+        str(record.get("seller") or ""),
+        seen_at[:10],
+    )
+
+
+def update_rollups(connection: sqlite3.Connection, records: Iterable[Mapping[str, object]]) -> int:
+    """Fold listing sightings into the rollups; returns the number of rows touched.
+
+    Callers pass each listing at most once per day (``write_batch`` skips
+    listings already seen earlier the same day). Must run inside the
+    caller's transaction.
+    """
+    deltas: Dict[Tuple[str, str, str, str], Rollup] = defaultdict(Rollup)
+    for record in records:
+        deltas[_key(record)].add(record.get("price"), bool(record.get("is_ad")))
+
+    for key, delta in deltas.items():
+        row = connection.execute(_SELECT_ROLLUP, key).fetchone()
+        rollup = Rollup.from_row(row) if row else Rollup()
+        rollup.merge(delta)
+        connection.execute(_UPSERT_ROLLUP, (*key, *rollup.to_row()))
+    return len(deltas)
+
+
+def seed_rollups(
+    connection: sqlite3.Connection, items_table: str, search_queries: Optional[List[str]] = None
+) -> int:
+    """Backfill from the current items table, one sighting per listing on its last-seen day.
+
+    With ``search_queries`` only the listings of those queries are folded in.
+    """
+    sql = f"SELECT ml_item_id, _site, _search_query, seller, price, is_ad, _scraped_at FROM {items_table}"
+    params: list = []
+    if search_queries is not None:
+        if not search_queries:
+            return 0
+        sql += f" WHERE _search_query IN ({', '.join('?' for _ in search_queries)})"
+        params = list(search_queries)
+    rows = connection.execute(sql, params)
+    records = (
+        {
+            "ml_item_id": ml_item_id,
+            "_site": site,
+            "_search_query": query,
+            "seller": seller,
+            "price": price,
+            "is_ad": is_ad,
+            "_scraped_at": seen_at,
+        }
+        for ml_item_id, site, query, seller, price, is_ad, seen_at in rows
+    )
+    return update_rollups(connection, records)
+
+
+def prepare_site_migration(connection: sqlite3.Connection) -> None:
+    """Rename rollups keyed without ``_site`` out of the way so SCHEMA can recreate the table.
+
+    DDL step of ensure_schema; ``migrate_legacy_rollups`` moves the rows over.
+    """
+    columns = {row[1] for row in connection.execute(f"PRAGMA table_info({ROLLUPS_TABLE})")}
+    if not columns or "_site" in columns:
+        return
+    connection.execute("DROP INDEX IF EXISTS idx_rollups_day")
+    connection.execute(f"ALTER TABLE {ROLLUPS_TABLE} RENAME TO {LEGACY_ROLLUPS_TABLE}")
+
+
+def migrate_legacy_rollups(connection: sqlite3.Connection, items_table: str) -> bool:
+    """Rebuild rollups from before the ``_site`` column; False if there were none.
+
+    Queries whose listings all belong to one site keep their daily history
+    under that site. Rows of queries crawled on several sites mixed
+    currencies and cannot be split, so those queries are reseeded from the
+    items table. Must run inside the caller's transaction.
+    """
+    exists = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (LEGACY_ROLLUPS_TABLE,)
+    ).fetchone()
+    if not exists:
+        return False
+    site = "COALESCE(_site, substr(ml_item_id, 1, 3))"
+    query_sites = f"""
+        SELECT _search_query, MIN({site}) AS _site, COUNT(DISTINCT {site}) AS sites
+        FROM {items_table} GROUP BY _search_query
+    """
+    connection.execute(f"""
+        INSERT INTO {ROLLUPS_TABLE}
+            (_site, _search_query, seller, day, item_count, ad_count, price_count, price_sum, price_min, price_max, sketch)
+        SELECT q._site, r._search_query, r.seller, r.day, r.item_count, r.ad_count, r.price_count, r.price_sum,
+               r.price_min, r.price_max, r.sketch
+        FROM {LEGACY_ROLLUPS_TABLE} AS r JOIN ({query_sites}) AS q ON q._search_query = r._search_query
+        WHERE q.sites = 1
+    """)
+    mixed = [row[0] for row in connection.execute(f"SELECT _search_query FROM ({query_sites}) WHERE sites > 1")]
+    seed_rollups(connection, items_table, mixed)
+    connection.execute(f"DROP TABLE {LEGACY_ROLLUPS_TABLE}")
+    return True
+
+
+def load_trend(
+    connection: sqlite3.Connection,
+    search_query: Optional[str] = None,
+    seller: Optional[str] = None,
+    since: Optional[str] = None,
+    site: Optional[str] = None,
+    quantiles: Tuple[float, ...] = (0.1, 0.5, 0.9),
+) -> pd.DataFrame:
+    """Per-day aggregates merged over every matching query/seller row.
+
+    Pass ``site`` whenever several sites are stored; merging across sites
+    mixes currencies.
+    """
+    clauses: List[str] = []
+    params: list = []
+    if site is not None:
+        clauses.append("_site = ?")
+        params.append(site)
+    if search_query is not None:
+        clauses.append("_search_query = ?")
+        params.append(search_query)
+    if seller is not None:
+        clauses.append("seller = ?")
+        params.append(seller)
+    if since is not None:
+        clauses.append("day >= ?")
+        params.append(since)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    rows = connection.execute(
+        f"SELECT day, item_count, ad_count, price_count, price_sum, price_min, price_max, sketch "
+        f"FROM {ROLLUPS_TABLE}{where} ORDER BY day",
+        params,
+    )
+
+    days: Dict[str, Rollup] = {}
+    for day, *values in rows:
+        rollup = Rollup.from_row(tuple(values))
+        if day in days:
+            days[day].merge(rollup)
+        else:
+            days[day] = rollup
+
+    records = []
+    for day, rollup in days.items():
+        record = {
+            "day": day,
+            "items": rollup.item_count,
+            "mean_price": rollup.mean_price,
+            "min_price": rollup.price_min,
+            "max_price": rollup.price_max,
+            "ad_share": rollup.ad_share,
+        }
+        for q in quantiles:
+            record[f"p{round(q * 100)}"] = rollup.quantile(q)
+        records.append(record)
+    columns = ["day", "items", "mean_price", "min_price", "max_price", "ad_share"]
+    columns += [f"p{round(q * 100)}" for q in quantiles]
+    return pd.DataFrame.from_records(records, columns=columns)
+
+
+def rollup_queries(connection: sqlite3.Connection, site: Optional[str] = None) -> List[str]:
+    if site is None:
+        rows = connection.execute(f"SELECT DISTINCT _search_query FROM {ROLLUPS_TABLE} ORDER BY 1")
+    else:
+        rows = connection.execute(
+            f"SELECT DISTINCT _search_query FROM {ROLLUPS_TABLE} WHERE _site = ? ORDER BY 1", (site,)
+        )
+    return [row[0] for row in rows]
@@ -0,0 +1,96 @@
+"""Full-text search over listing titles, sellers and search queries.
+
+Usage::
+
+    python -m storage.search "jarra termica" [--limit 20] [--query jarra-de-vidrio]
+"""
+import argparse
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from storage.database import DB_PATH, ITEMS_TABLE, SEARCH_TABLE
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# bm25 column weights for (name, seller, _search_query).
+RANK_EXPRESSION = f"bm25({SEARCH_TABLE}, 10.0, 2.0, 1.0)"
+
+
+def _stem(token: str) -> str:
+    """Very light Spanish plural stripping so "jarras" also finds "jarra"."""
+    if len(token) > 4 and token.endswith("es"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def build_match_query(text: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    tokens = [_stem(token.lower()) for token in TOKEN_RE.findall(text or "")]
+    tokens = [token.replace('"', "") for token in tokens if token]
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def has_search_index(connection: sqlite3.Connection) -> bool:
+    row = connection.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)).fetchone()
+    return row is not None
+
+
+def search_items(
+    connection: sqlite3.Connection,
+    text: str,
+    limit: int = 20,
+    offset: int = 0,
+    search_query: Optional[str] = None,
+) -> List[Tuple]:
+    """Return ``(ml_item_id, name, seller, price, permalink)`` rows, best match first."""
+    match = build_match_query(text)
+    if match is None:
+        return []
+    sql = (
+        f"SELECT i.ml_item_id, i.name, i.seller, i.price, i.permalink "
+        f"FROM {SEARCH_TABLE} JOIN {ITEMS_TABLE} AS i ON i.rowid = {SEARCH_TABLE}.rowid "
+        f"WHERE {SEARCH_TABLE} MATCH ?"
+    )
+    params: list = [match]
+    if search_query:
+        sql += " AND i._search_query = ?"
+        params.append(search_query)
+    sql += f" ORDER BY {RANK_EXPRESSION} LIMIT ? OFFSET ?"
+    params.extend([limit, offset])
+    return connection.execute(sql, params).fetchall()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Buscar publicaciones en data/database.db")
+    parser.add_argument("text", help="texto a buscar en título, vendedor y búsqueda")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--query", help="limitar a una búsqueda (_search_query)")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(f"file:{args.db.as_posix()}?mode=ro", uri=True)
+    try:
+        if not has_search_index(connection):
+            raise SystemExit("La base no tiene índice de búsqueda; ejecuta un rastreo primero.")
+        start = time.perf_counter()
+        rows = search_items(connection, args.text, limit=args.limit, search_query=args.query)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    finally:
+        connection.close()
+
+    for ml_item_id, name, seller, price, permalink in rows:
+        price_text = f"{price:,.2f}" if price is not None else "—"
+        print(f"{ml_item_id or '-':<15} {price_text:>14}  {name or ''}  [{seller or '-'}]")
+        if permalink:
+            print(f"{'':<15} {'':>14}  {permalink}")
+    print(f"{len(rows)} resultados en {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Set
+
+from storage.database import DB_PATH, ITEMS_TABLE, content_hash
+from storage.details import enriched_since
+
+__all__ = ["SeenIndex", "content_hash", "recently_enriched"]
+
+
+class SeenIndex:
+    """In-memory ``ml_item_id`` -> content hash view of the items table.
+
+    Used by the spider to tell whether a listing page brought anything new;
+    the write path compares hashes per batch in ``storage.database``.
+    """
+
+    def __init__(self, db_path: Path | str = DB_PATH) -> None:
+        self.db_path = Path(db_path)
+        self._hashes: Dict[str, str] = {}
+
+    def load(self) -> "SeenIndex":
+        self._hashes = {}
+        if not self.db_path.exists():
+            return self
+        connection = sqlite3.connect(str(self.db_path))
+        try:
+            rows = connection.execute(
+                f"SELECT ml_item_id, content_hash FROM {ITEMS_TABLE} WHERE content_hash IS NOT NULL"
+            )
+            self._hashes = dict(rows)
+        except sqlite3.OperationalError:
+            pass  # no normalized items table yet
+        finally:
+            connection.close()
+        return self
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def is_new_or_changed(self, ml_item_id: str | None, digest: str) -> bool:
+        if not ml_item_id:
+            return True
+        return self._hashes.get(ml_item_id) != digest
+
+
+def recently_enriched(db_path: Path | str = DB_PATH, max_age_days: float = 7) -> Set[str]:
+    """Ids of the listings whose details were fetched in the last ``max_age_days``."""
+    db_path = Path(db_path)
+    if not db_path.exists():
+        return set()
+    since = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).isoformat()
+    connection = sqlite3.connect(str(db_path))
+    try:
+        return enriched_since(connection, since)
+    except sqlite3.OperationalError:
+        return set()  # no details table yet
+    finally:
+        connection.close()
@@ -0,0 +1,99 @@
+"""Per-layout listing extraction against the saved fixtures.
+
+Run with ``python -m unittest discover tests``.
+"""
+import json
+import unittest
+from pathlib import Path
+
+from parsel import Selector
+
+from extraction.parsers import LAYOUT_LEGACY, LAYOUT_POLY, parse_listing
+
+FIXTURES_DIR = Path(__file__).resolve().parents[1] / "benchmarks" / "fixtures"
+BASE_URL = "https://listado.mercadolibre.com.ar"
+
+
+def _urljoin(link: str) -> str:
+    return link if link.startswith("http") else BASE_URL + link
+
+
+def _parse(html: str):
+    return parse_listing(Selector(text=html).root, _urljoin)
+
+
+def _rows(items) -> list:
+    return [
+        {
+            "ml_item_id": item.ml_item_id,
+            "name": item.name,
+            "seller": item.seller,
+            "price_cents": item.price_cents,
+            "permalink": item.permalink,
+            "is_ad": item.is_ad,
+        }
+        for item in items
+    ]
+
+
+class FixtureLayoutTests(unittest.TestCase):
+    def assert_matches_fixture(self, name: str, layout: str) -> None:
+        expected = json.loads((FIXTURES_DIR / f"{name}.expected.json").read_text(encoding="utf-8"))
+        parsed_layout, items = _parse((FIXTURES_DIR / f"{name}.html").read_text(encoding="utf-8"))
+        self.assertEqual(parsed_layout, layout)
+        self.assertEqual(expected["layout"], layout)
+        self.assertEqual(_rows(items), expected["items"])
+
+    def test_legacy_fixture(self):
+        self.assert_matches_fixture("listing_legacy", LAYOUT_LEGACY)
+
+    def test_poly_fixture(self):
+        self.assert_matches_fixture("listing_poly", LAYOUT_POLY)
+
+
+class LayoutFallbackTests(unittest.TestCase):
+    LEGACY_CARD = (
+        '<li class="ui-search-layout__item">'
+        '<a class="ui-search-link" href="https://articulo.mercadolibre.com.ar/MLA-123-jarra-_JM">'
+        '<h2 class="ui-search-item__title">Jarra</h2></a>'
+        '<span class="ui-search-official-store-label__text">Por Tienda Oficial</span>'
+        '<span class="andes-money-amount__fraction">1.234</span>'
+        '<span class="andes-money-amount__cents">50</span>'
+        '<span class="ui-search-item__ad-badge">Publicidad</span></li>'
+    )
+    POLY_CARD = (
+        '<li class="ui-search-layout__item"><div class="poly-card">'
+        '<span class="poly-component__ads-promotions">Promocionado</span>'
+        '<a class="poly-component__title" href="https://articulo.mercadolibre.com.ar/MLA-456-vaso-_JM">Vaso</a>'
+        '<span class="poly-component__seller">Por Tienda Vaso</span>'
+        '<span class="andes-money-amount__fraction">99</span></div></li>'
+    )
+
+    def test_legacy_card_on_a_poly_page_keeps_its_fields(self):
+        layout, items = _parse(f"<ol>{self.POLY_CARD}{self.LEGACY_CARD}</ol>")
+        self.assertEqual(layout, LAYOUT_POLY)
+        legacy = items[1]
+        self.assertEqual(legacy.ml_item_id, "MLA123")
+        self.assertEqual(legacy.name, "Jarra")
+        self.assertEqual(legacy.seller, "Tienda Oficial")
+        self.assertEqual(legacy.price_cents, 123450)
+        self.assertTrue(legacy.is_ad)
+
+    def test_poly_card_fields(self):
+        layout, items = _parse(f"<ol>{self.POLY_CARD}</ol>")
+        self.assertEqual(layout, LAYOUT_POLY)
+        (item,) = items
+        self.assertEqual(
+            (item.ml_item_id, item.name, item.seller, item.price_cents), ("MLA456", "Vaso", "Tienda Vaso", 9900)
+        )
+        # The ads-promotions badge is read on poly pages only.
+        self.assertTrue(item.is_ad)
+
+    def test_unmarked_card_is_not_an_ad(self):
+        card = self.LEGACY_CARD.replace('<span class="ui-search-item__ad-badge">Publicidad</span>', "")
+        _, (item,) = _parse(f"<ol>{card}</ol>")
+        self.assertFalse(item.is_ad)
+
+
+if __name__ == "__main__":
+    unittest.main()
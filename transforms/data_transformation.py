@@ -1,24 +1,107 @@
-import sqlite3
+import io
+import json
+import re
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, TextIO
 
+import numpy as np
 import pandas as pd
-
-from config_utils import load_search_query
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+from alert_sinks import deliver_pending, load_sinks
+from config_utils import load_parquet_export, load_search_query
+from metrics import REGISTRY, write_prometheus, write_run_summary
+from sites import DEFAULT_SITE, get_site
+from storage.alerts import count_pending
+from storage.database import connect, ensure_schema, write_batch
+from storage.parquet_store import PARQUET_DIR, read_history, write_run
 
 DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+TRUTHY_VALUES = frozenset(["true", "1", "yes", "si", "sí"])
+# Rows normalized and written per step of transform_data.
+CHUNK_SIZE = 250_000
+JSON_LINES_SUFFIXES = (".jsonl", ".jsonl.zst")
+TEXT_COLUMNS = ("ml_item_id", "name", "seller", "permalink", "_source", "_search_query", "_site")
+ARROW_STRING = pd.ArrowDtype(pa.string())
+# "1.234,56" once the thousands separators are removed. ASCII classes only, so
+# Python's re and Arrow's RE2 accept exactly the same strings.
+_PRICE_PATTERN = r"^[ \t\n\r\f]*-?[0-9]+(,[0-9]*)?[ \t\n\r\f]*$"
+_PRICE_RE = re.compile(_PRICE_PATTERN)
+STAGE_METRIC = "transform_stage_seconds"
+REGISTRY.describe(STAGE_METRIC, "Time spent in each transform_data stage, per chunk.")
+
+
+def is_json_lines(path: Path | str) -> bool:
+    return str(path).endswith(JSON_LINES_SUFFIXES)
+
+
+def _resolve_path(path_to_data: Path | str) -> Path:
+    data_path = Path(path_to_data)
+    if not data_path.is_absolute():
+        data_path = DATA_DIR / data_path.name
+    return data_path
+
+
+def _open_lines(path: Path) -> TextIO:
+    if path.name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path.name} requires the zstandard package (pip install zstandard)")
+        raw = zstandard.ZstdDecompressor().stream_reader(path.open("rb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+
+def iter_json_lines(path_to_data: Path | str, chunk_size: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Stream a JSON Lines feed (plain or ``.zst``) as DataFrames of at most ``chunk_size`` rows.
+
+    Lines that do not parse, such as the last one of a killed crawl, are
+    skipped, so partial feeds load everything that was fully written.
+    """
+    data_path = _resolve_path(path_to_data)
+    if not data_path.exists():
+        return
+    records: List[Dict[str, object]] = []
+    skipped = 0
+    with _open_lines(data_path) as lines:
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            if len(records) >= chunk_size:
+                yield pd.DataFrame.from_records(records)
+                records = []
+    if records:
+        yield pd.DataFrame.from_records(records)
+    if skipped:
+        print(f"Skipped {skipped} unreadable lines in {data_path.name}")
 
 
 def read_data(path_to_data: Path | str = "") -> pd.DataFrame:
+    if path_to_data and Path(path_to_data).is_dir():
+        # A partitioned Parquet store, e.g. data/parquet.
+        return read_history(path_to_data)
+    if path_to_data and is_json_lines(path_to_data):
+        chunks = list(iter_json_lines(path_to_data))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
     if not path_to_data:
         json_files = sorted(DATA_DIR.glob("*.json"))
         if not json_files:
             return pd.DataFrame()
         data_path = json_files[-1]
     else:
-        data_path = Path(path_to_data)
-        if not data_path.is_absolute():
-            data_path = DATA_DIR / data_path.name
+        data_path = _resolve_path(path_to_data)
 
     try:
         return pd.read_json(data_path)
@@ -27,87 +110,270 @@ def read_data(path_to_data: Path | str = "") -> pd.DataFrame:
         return pd.DataFrame()
 
 
-def add_columns(df: pd.DataFrame) -> pd.DataFrame:
-    search_query = load_search_query()
-    scraped_at = datetime.now(timezone.utc).isoformat()
-
-    df["_source"] = f"https://listado.mercadolibre.com.ar/{search_query}"
-    df["_search_query"] = search_query
-    df["_scraped_at"] = scraped_at
-    df["scrap_date"] = scraped_at
+def parse_price(value: object) -> float | None:
+    """Parse a single listing price such as ``"1.234,56"`` into a float.
+
+    Only digits with ``.`` thousands separators and an optional ``,`` decimal
+    part are prices; anything else (``"1e5"``, ``"inf"``, ``"+5"``) is None,
+    as it is NaN in ``parse_prices``.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    digits = str(value).replace(".", "")
+    if not _PRICE_RE.match(digits):
+        return None
+    return float(digits.replace(",", "."))
+
+
+def normalize_is_ad_value(value: object) -> int:
+    return int(str(value).lower() in TRUTHY_VALUES)
+
+
+def normalize_record(
+    item: Mapping[str, object],
+    scraped_at: str,
+    default_query: str,
+) -> Dict[str, object]:
+    """Per-item equivalent of ``transform_frame``."""
+    record = dict(item)
+    if "price_cents" in record:
+        # Feeds written from ``ListingItem`` carry integer cents.
+        cents = record.pop("price_cents")
+        record.setdefault("price", None if cents is None else cents / 100)
+
+    search_query = record.get("_search_query") or default_query
+    record["_search_query"] = search_query
+    site = get_site(record.get("_site"))
+    record["_site"] = site.site_id
+    record["_source"] = record.get("_source") or f"{site.listing_base_url}/{search_query}"
+    record["_scraped_at"] = scraped_at
+    record["scrap_date"] = scraped_at
+
+    price = record.get("price")
+    record["price"] = 0.0 if pd.isna(price) else parse_price(price)
+    is_ad = record.get("is_ad")
+    record["is_ad"] = normalize_is_ad_value(0 if is_ad is None else is_ad)
+    if "reviews_rating_number" in record and record["reviews_rating_number"] is None:
+        record["reviews_rating_number"] = "0"
+    if "reviews_amount" in record:
+        reviews_amount = record["reviews_amount"]
+        record["reviews_amount"] = str("(0)" if reviews_amount is None else reviews_amount).strip("()")
+
+    return record
+
+
+def _arrow_strings(values: pd.Series) -> pa.Array | None:
+    """View a column as an Arrow string array, or None if it holds non-text values."""
+    if isinstance(values.dtype, pd.ArrowDtype) and pa.types.is_string(values.dtype.pyarrow_dtype):
+        return pa.array(values)
+    try:
+        return pa.array(values.to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+
+
+def parse_prices(prices: pd.Series) -> pd.Series:
+    """Vectorized ``parse_price`` for a whole column, straight to float64.
+
+    Missing prices become 0.0 and unparseable ones NaN, as ``normalize_record``
+    turns them into 0.0 and None.
+    """
+    if pd.api.types.is_numeric_dtype(prices) and not pd.api.types.is_bool_dtype(prices):
+        return prices.astype("float64").fillna(0.0)
+
+    text = _arrow_strings(prices)
+    if text is None:
+        # Mixed numbers and strings: parse each distinct value once.
+        return _map_unique(prices, lambda value: 0.0 if value is None else parse_price(value)).astype("float64")
+
+    digits = pc.replace_substring(text, ".", "")
+    valid = pc.match_substring_regex(digits, _PRICE_PATTERN)
+    decimal = pc.replace_substring(pc.utf8_trim_whitespace(digits), ",", ".")
+    values = pc.cast(pc.if_else(valid, decimal, pa.scalar(None, pa.string())), pa.float64())
+    values = pc.if_else(pc.is_null(text), pa.scalar(0.0), values)
+    return pd.Series(values.to_numpy(zero_copy_only=False), index=prices.index, name=prices.name)
+
+
+def _map_unique(values: pd.Series, func) -> pd.Series:
+    """Apply ``func`` once per distinct value instead of once per row."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    mapped = np.array([func(value) for value in uniques], dtype=object)
+    result = np.where(codes >= 0, mapped[np.maximum(codes, 0)] if len(mapped) else None, func(None))
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def _fill_blank(values: pd.Series, default) -> pd.Series:
+    """``values`` with missing and empty strings replaced by ``default``."""
+    return values.mask(values.eq("").fillna(False)).fillna(default)
+
+
+def parse_is_ad(values: pd.Series) -> pd.Series:
+    """Vectorized ``normalize_is_ad_value`` returning a native bool column."""
+    if pd.api.types.is_bool_dtype(values):
+        return values.fillna(False).astype(bool)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0).eq(1)
+
+    text = _arrow_strings(values)
+    if text is None:
+        # Mixed bools and strings: normalize each distinct value once.
+        return _map_unique(values, lambda value: bool(normalize_is_ad_value(value))).astype(bool)
+    flags = pc.fill_null(pc.is_in(pc.utf8_lower(text), value_set=pa.array(sorted(TRUTHY_VALUES))), False)
+    return pd.Series(flags.to_numpy(zero_copy_only=False), index=values.index, name=values.name)
+
+
+def transform_frame(df: pd.DataFrame, search_query: str, scraped_at: str) -> pd.DataFrame:
+    """Normalize a raw feed chunk: fill the query/site/source columns, parse prices.
+
+    Each column is converted once: text columns to Arrow-backed strings,
+    ``price`` to float64 and ``is_ad`` to bool. Untouched columns are shared
+    with ``df``, not copied.
+    """
+    columns: Dict[str, pd.Series] = {name: df[name] for name in df.columns}
+    index = df.index
+
+    for name in TEXT_COLUMNS:
+        if name in columns:
+            columns[name] = columns[name].astype(ARROW_STRING)
+
+    # Empty strings count as missing, as in normalize_record's ``or``.
+    queries = columns.get("_search_query")
+    queries = (
+        pd.Series(search_query, index=index, dtype=ARROW_STRING)
+        if queries is None
+        else _fill_blank(queries, search_query)
+    )
+    columns["_search_query"] = queries
+    sites = columns.get("_site")
+    sites = (
+        pd.Series(DEFAULT_SITE, index=index, dtype=ARROW_STRING)
+        if sites is None
+        else _map_unique(sites, lambda site: get_site(site).site_id).astype(ARROW_STRING)
+    )
+    columns["_site"] = sites
+    base_urls = _map_unique(sites, lambda site: get_site(site).listing_base_url).astype(ARROW_STRING)
+    default_source = base_urls + "/" + queries
+    sources = columns.get("_source")
+    columns["_source"] = default_source if sources is None else _fill_blank(sources, default_source)
+    columns["_scraped_at"] = pd.Series(scraped_at, index=index, dtype=ARROW_STRING)
+    columns["scrap_date"] = columns["_scraped_at"]
+
+    if "price_cents" in columns:
+        # Feeds written from ``ListingItem`` carry integer cents.
+        cents = columns.pop("price_cents")
+        if "price" not in columns:
+            columns["price"] = pd.to_numeric(cents, errors="coerce") / 100
+    if "price" in columns:
+        columns["price"] = parse_prices(columns["price"])
+    if "is_ad" in columns:
+        columns["is_ad"] = parse_is_ad(columns["is_ad"])
+    if "reviews_rating_number" in columns:
+        columns["reviews_rating_number"] = columns["reviews_rating_number"].fillna("0")
+    if "reviews_amount" in columns:
+        columns["reviews_amount"] = (
+            columns["reviews_amount"].fillna("(0)").astype(ARROW_STRING).str.strip("()")
+        )
 
-    return df
+    return pd.DataFrame(columns, index=index, copy=False)
 
 
-def fill_nulls(df: pd.DataFrame) -> pd.DataFrame:
-    if "price" in df.columns:
-        df["price"] = df["price"].fillna("0")
-    if "reviews_rating_number" in df.columns:
-        df["reviews_rating_number"] = df["reviews_rating_number"].fillna("0")
-    if "reviews_amount" in df.columns:
-        df["reviews_amount"] = df["reviews_amount"].fillna("(0)")
-    if "is_ad" in df.columns:
-        df["is_ad"] = df["is_ad"].fillna(0)
+def iter_chunks(df: pd.DataFrame, chunk_size: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
 
-    return df
 
+def frame_records(df: pd.DataFrame) -> List[Dict[str, object]]:
+    """Rows as plain Python dicts; missing values (NaN, NA) become None."""
+    names = list(df.columns)
+    values = [df[name].to_numpy(dtype=object, na_value=None).tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*values)]
 
-def standardize_strings(df: pd.DataFrame) -> pd.DataFrame:
-    if "price" in df.columns:
-        df["price"] = df["price"].astype(str).str.replace(".", "", regex=False)
-    if "reviews_amount" in df.columns:
-        df["reviews_amount"] = df["reviews_amount"].astype(str).str.strip("()")
 
-    return df
+def save_to_sqlite3(df: pd.DataFrame) -> None:
+    """Upsert the batch into the normalized items / price history tables."""
+    if df.empty:
+        return
 
+    with REGISTRY.timer(STAGE_METRIC, stage="save_to_sqlite3"):
+        connection = connect(DATA_DIR / "database.db")
+        try:
+            ensure_schema(connection)
+            counts = write_batch(connection, frame_records(df))
+            # Also retries alerts a failed delivery left pending.
+            sinks = load_sinks()
+            if sinks and (counts["alerts"] or count_pending(connection)):
+                deliver_pending(connection, sinks)
+        finally:
+            connection.close()
+    REGISTRY.inc("transform_alerts_total", counts.pop("alerts"))
+    for result, count in counts.items():
+        REGISTRY.inc("transform_rows_written_total", count, result=result)
+
+
+def save_to_parquet(df: pd.DataFrame) -> None:
+    """Append the batch to the partitioned Parquet history."""
+    if df.empty:
+        return
+    with REGISTRY.timer(STAGE_METRIC, stage="save_to_parquet"):
+        write_run(frame_records(df), PARQUET_DIR)
 
-def normalize_is_ad(df: pd.DataFrame) -> pd.DataFrame:
-    if "is_ad" in df.columns:
-        df["is_ad"] = (
-            df["is_ad"]
-            .astype(str)
-            .str.lower()
-            .isin(["true", "1", "yes", "si", "sí"])
-            .astype(int)
-        )
 
-    return df
+def _drop_seen(chunk: pd.DataFrame, seen_ids: set) -> pd.DataFrame:
+    """Drop rows whose ``ml_item_id`` appeared earlier in this chunk or in previous ones."""
+    if "ml_item_id" not in chunk.columns:
+        return chunk.drop_duplicates()
+    chunk = chunk.drop_duplicates(subset=["ml_item_id"])
+    ids = chunk["ml_item_id"]
+    chunk = chunk[~ids.isin(seen_ids) | ids.isna()]
+    seen_ids.update(chunk["ml_item_id"].dropna())
+    return chunk
 
 
-def price_to_float(df: pd.DataFrame) -> pd.DataFrame:
-    if "price" in df.columns:
-        df["price"] = pd.to_numeric(
-            df["price"].astype(str).str.replace(",", ".", regex=False), errors="coerce"
-        )
-
-    return df
+def _feed_chunks(path_to_data: Path | str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    if is_json_lines(path_to_data):
+        # Streamed: memory is bounded by chunk_size whatever the feed size.
+        yield from iter_json_lines(path_to_data, chunk_size)
+        return
+    df = read_data(path_to_data)
+    if not df.empty:
+        yield from iter_chunks(df, chunk_size)
 
 
-def save_to_sqlite3(df: pd.DataFrame) -> None:
-    with sqlite3.connect(str(DATA_DIR / "database.db")) as connection:
-        df.to_sql("mercadolivre_items", connection, if_exists="replace", index=False)
+def _timed_chunks(chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Yield ``chunks``, recording the time spent reading each one."""
+    while True:
+        with REGISTRY.timer(STAGE_METRIC, stage="read"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        REGISTRY.inc("transform_rows_read_total", len(chunk))
+        yield chunk
 
 
-def transform_data(path_to_data: Path | str = "") -> None:
+def transform_data(path_to_data: Path | str = "", chunk_size: int = CHUNK_SIZE) -> None:
     if not path_to_data:
         path_to_data = DATA_DIR / "data.json"
 
-    df = read_data(path_to_data)
-    if df.empty:
-        return
-
-    if "ml_item_id" in df.columns:
-        df = df.drop_duplicates(subset=["ml_item_id"])
-    else:
-        df = df.drop_duplicates()
-
-    df = add_columns(df)
-    df = fill_nulls(df)
-    df = normalize_is_ad(df)
-    df = standardize_strings(df)
-    df = price_to_float(df)
-
-    save_to_sqlite3(df)
+    search_query = load_search_query()
+    scraped_at = datetime.now(timezone.utc).isoformat()
+    parquet = load_parquet_export()
+    seen_ids: set = set()
+    with REGISTRY.timer(STAGE_METRIC, stage="total"):
+        for chunk in _timed_chunks(_feed_chunks(path_to_data, chunk_size)):
+            with REGISTRY.timer(STAGE_METRIC, stage="drop_seen"):
+                chunk = _drop_seen(chunk, seen_ids)
+            if chunk.empty:
+                continue
+            with REGISTRY.timer(STAGE_METRIC, stage="transform_frame"):
+                chunk = transform_frame(chunk, search_query, scraped_at)
+            save_to_sqlite3(chunk)
+            if parquet:
+                save_to_parquet(chunk)
+
+    write_prometheus("transform", prefix="transform_")
+    write_run_summary("transform", prefix="transform_", extra={"feed": str(path_to_data)})
 
 
 if __name__ == "__main__":